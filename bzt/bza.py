@@ -5,12 +5,13 @@ it may become separate library in the future. Things like imports and logging sh
 import base64
 import json
 import logging
+import zlib
 from collections import OrderedDict
 
 import requests
 
 from bzt import TaurusNetworkError, ManualShutdown, VERSION, TaurusException
-from bzt.six import string_types
+from bzt.six import string_types, binary_type
 from bzt.six import text_type
 from bzt.six import urlencode
 from bzt.utils import to_json, MultiPartForm
@@ -86,7 +87,10 @@ class BZAObject(dict):
             data = to_json(data)
             headers["Content-Type"] = "application/json"
 
-        self.log.debug("Request: %s %s %s", log_method, url, data[:self.logger_limit] if data else None)
+        if isinstance(data, (binary_type, text_type)):
+            self.log.debug("Request: %s %s %s", log_method, url, data[:self.logger_limit])
+        else:
+            self.log.debug("Request: %s %s %s", log_method, url, data)
 
         response = self.http_request(method=log_method, url=url, data=data, headers=headers, timeout=self.timeout)
 
@@ -654,19 +658,28 @@ class Session(BZAObject):
         data = {"signature": self.data_signature, "testId": self['testId'], "sessionId": self['id']}
         self._request(url, data)
 
-    def send_kpi_data(self, data, is_check_response=True, submit_target=None):
+    def send_kpi_data(self, data, is_check_response=True, submit_target=None, compress=False):
         """
         Sends online data
 
         :type submit_target: str
         :param is_check_response:
         :type data: str
+        :param compress: send gzip-compressed body
         """
         submit_target = self.kpi_target if submit_target is None else submit_target
         url = self.data_address + "/submit.php?session_id=%s&signature=%s&test_id=%s&user_id=%s"
         url %= self['id'], self.data_signature, self['testId'], self['userId']
         url += "&pq=0&target=%s&update=1" % submit_target
         hdr = {"Content-Type": "application/json"}
+        if compress:
+            if isinstance(data, text_type):
+                data = data.encode("utf-8")
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip
+            compressed = compressor.compress(data) + compressor.flush()
+            self.log.debug("Compressed KPI data: %s => %s bytes", len(data), len(compressed))
+            data = compressed
+            hdr["Content-Encoding"] = "gzip"
         response = self._request(url, data, headers=hdr)
 
         if response and 'response_code' in response and response['response_code'] != 200:
@@ -688,19 +701,22 @@ class Session(BZAObject):
             self.notify_monitoring_file(file_name)
             self.monitoring_upload_notified = True
 
-    def upload_file(self, filename, contents=None):
+    def upload_file(self, filename, contents=None, path=None):
         """
-        Upload single artifact
+        Upload single artifact, file given by path (or by filename if no contents) is streamed from disk
 
         :type filename: str
         :type contents: str
+        :param path: path of file to upload under `filename` name
         :raise TaurusNetworkError:
         """
         body = MultiPartForm()  # TODO: can we migrate off it, and use something native to requests lib?
         # maybe http://stackoverflow.com/questions/12385179/how-to-send-a-multipart-form-data-with-requests-in-python
 
-        if contents is None:
-            body.add_file('file', filename)
+        if path is not None:
+            body.add_file_by_path('file', path, filename)
+        elif contents is None:
+            body.add_file_by_path('file', filename)
         else:
             body.add_file_as_string('file', filename, contents)
 
@@ -710,7 +726,7 @@ class Session(BZAObject):
         if master_id:
             url += '&masterId={}'.format(master_id)
         hdr = {"Content-Type": str(body.get_content_type())}
-        response = self._request(url, body.form_as_bytes(), headers=hdr)
+        response = self._request(url, body.form_as_stream(), headers=hdr)
         if not response['result']:
             raise TaurusNetworkError("Upload failed: %s" % response)
 
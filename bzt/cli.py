@@ -177,6 +177,9 @@ class CLI(object):
             overrider = ConfigOverrider(self.log)
             overrider.apply_overrides(self.options.option, self.engine.config)
 
+        if self.options.recheck_tools:
+            self.engine.config.get(SETTINGS)["recheck-tools"] = True
+
         if self.__is_verbose():
             CLI.console_handler.setLevel(logging.DEBUG)
         self.engine.create_artifacts_dir(configs, merged_config)
@@ -609,6 +612,8 @@ def get_option_parser():
                       help="Prints all logging messages to console")
     parser.add_option('-n', '--no-system-configs', action='store_true',
                       help="Skip system and user config files")
+    parser.add_option('--recheck-tools', action='store_true',
+                      help="Verify required tools again instead of using recorded checks")
     return parser
 
 
@@ -47,7 +47,7 @@ from bzt.requests_model import RequestParser
 from bzt.six import numeric_types, string_types, text_type, PY2, UserDict, parse, reraise
 from bzt.utils import PIPE, shell_exec, get_full_path, ExceptionalDownloader, get_uniq_name, HTTPClient
 from bzt.utils import load_class, to_json, BetterDict, ensure_is_dict, dehumanize_time, is_windows, is_linux
-from bzt.utils import str_representer, Environment, RequiredTool
+from bzt.utils import str_representer, Environment, RequiredTool, FileReader, FileWatcher, ToolChecksCache
 
 TAURUS_ARTIFACTS_DIR = "TAURUS_ARTIFACTS_DIR"
 
@@ -199,6 +199,8 @@ class Engine(object):
         self.unify_config()
         interval = self.config.get(SETTINGS).get("check-interval", self.check_interval)
         self.check_interval = dehumanize_time(interval)
+        self.__prepare_file_watcher()
+        self.__prepare_tool_checks_cache()
 
         try:
             self.__prepare_aggregator()
@@ -211,6 +213,23 @@ class Engine(object):
             self.stopping_reason = exc
             raise
 
+    def __prepare_file_watcher(self):
+        if FileReader.watcher:
+            FileReader.watcher.close()
+            FileReader.watcher = None
+
+        if self.config.get(SETTINGS).get("file-events", False):
+            FileReader.watcher = FileWatcher(self.log)
+
+    def __prepare_tool_checks_cache(self):
+        settings = self.config.get(SETTINGS)
+        cache_file = settings.get("tool-checks-cache", None)
+        if cache_file:
+            RequiredTool.checks_cache = ToolChecksCache(cache_file, self.log)
+        else:
+            RequiredTool.checks_cache = None
+        RequiredTool.recheck = settings.get("recheck-tools", False)
+
     def _startup(self):
         modules = self.services + [self.aggregator] + self.reporters + [self.provisioning]  # order matters
         for module in modules:
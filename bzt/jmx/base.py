@@ -17,6 +17,7 @@ limitations under the License.
 """
 import logging
 import os
+import re
 import traceback
 
 from cssselect import GenericTranslator
@@ -79,9 +80,25 @@ class JMX(object):
     THR_GROUP_SEL = TEST_PLAN_SEL + ">hashTree[type=tg]"
     THR_TIMER = "kg.apc.jmeter.timers.VariableThroughputTimer"
     SET_VAR_ACTION = "kg.apc.jmeter.control.sampler.SetVariablesAction"
+    INDEXED_ATTRS = ("testclass", "testname")
+    XPATH_CACHE = {}  # compiled expressions by css selector
+    XPATH_CACHE_LIMIT = 1000
+    # selectors served by index: 'Tag', '[attr]', '[attr=value]', 'Tag[attr=value]'
+    INDEXED_SEL = re.compile(r"^(?P<tag>[A-Za-z_][\w-]*)?"
+                             r"(?:\[(?P<attr>%s)(?:=(?P<value>'[^'\\]*'|\"[^\"\\]*\"|[\w-]+))?\])?$"
+                             % "|".join(INDEXED_ATTRS))
+    INDEX_XPATHS = {
+        "tag": etree.XPath("descendant-or-self::*[name() = $value]"),
+        "testclass": etree.XPath("descendant-or-self::*[@testclass = $value]"),
+        "testname": etree.XPath("descendant-or-self::*[@testname = $value]"),
+        ("testclass", None): etree.XPath("descendant-or-self::*[@testclass]"),
+        ("testname", None): etree.XPath("descendant-or-self::*[@testname]"),
+    }
 
     def __init__(self, original=None, test_plan_name="BZT Generated Test Plan"):
         self.log = logging.getLogger(self.__class__.__name__)
+        self.index = None
+        self.stale_keys = set()
         if original:
             self.load(original)
         else:
@@ -107,6 +124,7 @@ class JMX(object):
         :param original: JMX file path
         :raise TaurusInternalException: in case of XML parsing error
         """
+        self.index = None
         try:
             self.tree = etree.ElementTree()
             self.tree.parse(original)
@@ -121,10 +139,92 @@ class JMX(object):
         :type selector: str
         :return:
         """
-        expression = GenericTranslator().css_to_xpath(selector)
-        nodes = self.tree.xpath(expression)
+        if self.index is not None:
+            match = self.INDEXED_SEL.match(selector)
+            if match and (match.group("tag") or match.group("attr")):
+                return self.__get_indexed(match.group("tag"), match.group("attr"), match.group("value"))
+
+        if selector not in self.XPATH_CACHE:
+            if len(self.XPATH_CACHE) >= self.XPATH_CACHE_LIMIT:
+                self.XPATH_CACHE.clear()
+            self.XPATH_CACHE[selector] = etree.XPath(GenericTranslator().css_to_xpath(selector))
+        nodes = self.XPATH_CACHE[selector](self.tree)
         return nodes
 
+    def build_index(self):
+        """
+        Index elements by tag, testclass and testname in one pass,
+        so simple selectors don't need whole tree traversal.
+        Index follows changes made with JMX methods (append(), remove(), set_enabled(), set_text()),
+        use invalidate() for other changes.
+        """
+        self.index = {}
+        self.stale_keys = set()
+        for elem in self.tree.iter():
+            for key in self.__get_index_keys(elem):
+                self.index.setdefault(key, []).append(elem)
+
+    def invalidate(self, node):
+        """
+        Forget indexed elements of node subtree, they are looked up again when requested
+
+        :param node: Element that was added, removed or changed
+        """
+        if self.index is None:
+            return
+
+        for elem in node.iter():
+            for key in self.__get_index_keys(elem):
+                self.index.pop(key, None)
+                self.stale_keys.add(key)
+
+    def __get_index_keys(self, elem):
+        if not isinstance(elem.tag, string_types):  # comments and processing instructions
+            return []
+
+        keys = [("tag", elem.tag)]
+        for attr in self.INDEXED_ATTRS:
+            value = elem.get(attr)
+            if value is not None:
+                keys.append((attr, None))
+                keys.append((attr, value))
+        return keys
+
+    def __lookup(self, key):
+        if key in self.stale_keys:
+            kind, value = key
+            if value is None:
+                self.index[key] = self.INDEX_XPATHS[key](self.tree)
+            else:
+                self.index[key] = self.INDEX_XPATHS[kind](self.tree, value=value)
+            self.stale_keys.discard(key)
+
+        nodes = self.index.get(key, [])
+        attached = [elem for elem in nodes if self.__is_attached(elem)]  # could be removed with plain etree calls
+        if len(attached) != len(nodes):
+            self.index[key] = attached
+        return attached
+
+    def __is_attached(self, elem):
+        root = self.tree.getroot()
+        while elem is not None:
+            if elem is root:
+                return True
+            elem = elem.getparent()
+        return False
+
+    def __get_indexed(self, tag, attr, value):
+        if value and value[0] in ("'", '"'):
+            value = value[1:-1]
+
+        if not attr:
+            return list(self.__lookup(("tag", tag)))
+
+        nodes = self.__lookup((attr, value))
+        if tag:
+            nodes = [node for node in nodes if node.tag == tag]
+        return list(nodes)
+
     def append(self, selector, node):
         """
         Add node to container specified by selector. If multiple nodes will
@@ -140,6 +240,18 @@ class JMX(object):
             raise TaurusInternalException(msg % selector)
 
         container[0].append(node)
+        self.invalidate(node)
+
+    def remove(self, node):
+        """
+        Remove node from its parent
+
+        :param node: Element instance to remove
+        """
+        parent = node.getparent()
+        if parent is not None:
+            parent.remove(node)
+        self.invalidate(node)
 
     def save(self, filename):
         """
@@ -237,6 +349,24 @@ class JMX(object):
 
         return JMX.__jtl_writer(filename, "KPI Writer", flags)
 
+    @staticmethod
+    def new_binary_kpi_listener(filename, script):
+        """
+        Generates JSR223 listener writing basic KPI data in Taurus binary format
+
+        :param filename: records file, strings table is written next to it
+        :param script: path to writer script
+        :return:
+        """
+        element = etree.Element("JSR223Listener", guiclass="TestBeanGUI", testclass="JSR223Listener",
+                                testname="KPI Writer")
+        element.append(JMX._string_prop("filename", script))
+        element.append(JMX._string_prop("script", ''))
+        element.append(JMX._string_prop("parameters", filename))
+        element.append(JMX._string_prop("scriptLanguage", "groovy"))
+        element.append(JMX._string_prop("cacheKey", "true"))
+        return element
+
     @staticmethod
     def new_xml_listener(filename, is_full, user_flags):
         """
@@ -1226,6 +1356,7 @@ class JMX(object):
         self.log.debug("Enable %s elements %s: %s", state, sel, items)
         for item in items:
             item.set("enabled", 'true' if state else 'false')
+            self.invalidate(item)
 
     def set_text(self, sel, text):
         """
@@ -1238,6 +1369,7 @@ class JMX(object):
         res = 0
         for item in items:
             item.text = text_type(text)
+            self.invalidate(item)
             res += 1
 
         return res
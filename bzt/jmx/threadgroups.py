@@ -187,6 +187,8 @@ class ThreadGroupHandler(object):
     def convert(self, source, target_gtype, load, concurrency):
         """
         Convert a thread group to ThreadGroup/ConcurrencyThreadGroup for applying of load
+
+        :return: new group element, None if group wasn't converted
         """
         msg = "Converting %s (%s) to %s and apply load parameters"
         self.log.debug(msg, source.gtype, source.get_testname(), target_gtype)
@@ -227,3 +229,4 @@ class ThreadGroupHandler(object):
             return
 
         source.element.getparent().replace(source.element, new_group_element)
+        return new_group_element
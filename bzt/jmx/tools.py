@@ -129,7 +129,11 @@ class LoadSettingsProcessor(object):
             target_list = zip(groups, concurrency_list)
 
         for group, concurrency in target_list:
-            self.tg_handler.convert(source=group, target_gtype=self.tg, load=self.load, concurrency=concurrency)
+            jmx.invalidate(group.element)
+            new_element = self.tg_handler.convert(source=group, target_gtype=self.tg, load=self.load,
+                                                  concurrency=concurrency)
+            if new_element is not None:
+                jmx.invalidate(new_element)
 
         if self.load.throughput:
             self._add_shaper(jmx)
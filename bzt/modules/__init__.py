@@ -141,7 +141,7 @@ class SubprocessedExecutor(ReportableExecutor, FileLister, SelfDiagnosable, Widg
 
     def _check_tools(self, tools):
         for tool in tools:
-            if not tool.check_if_installed():
+            if not tool.is_installed():
                 self.log.info("Installing %s...", tool.tool_name)
                 tool.install()
 
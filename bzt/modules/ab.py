@@ -136,7 +136,7 @@ class ApacheBenchmarkExecutor(ScenarioExecutor, WidgetProvider, HavingInstallabl
 
     def install_required_tools(self):
         self.tool = self._get_tool(ApacheBenchmark, config=self.settings)
-        if not self.tool.check_if_installed():
+        if not self.tool.is_installed():
             self.tool.install()
 
     def get_error_diagnostics(self):
@@ -19,17 +19,23 @@ import collections
 import copy
 import logging
 import math
+import multiprocessing
+import time
+import traceback
+import weakref
 from abc import abstractmethod
 from collections import Counter
+from fractions import Fraction
 
 import fuzzyset
+import numpy
 from yaml import SafeDumper
 from yaml.representer import SafeRepresenter
 
 from bzt import TaurusInternalException, TaurusConfigError
 from bzt.engine import Aggregator
 from bzt.six import iteritems, PY3, text_type
-from bzt.utils import dehumanize_time, JSONConvertible
+from bzt.utils import dehumanize_time, JSONConvertible, is_windows
 from hdrpy import HdrHistogram, RecordedIterator
 
 log = logging.getLogger('aggregator')
@@ -93,7 +99,115 @@ class SinglePassIterator(RecordedIterator):
         return has
 
 
+class IncrementalStats(object):
+    """
+    Percentiles and stdev of histogram that only grows by merging other histograms into it.
+    Percentile ranks and moments are updated from merged deltas, full recalculation
+    is done only when some percentile moves to another bucket.
+
+    Stdev is calculated the same way as in SinglePassIterator, from bucket median values.
+    """
+
+    def __init__(self, percentiles):
+        self.perc_levels = sorted(set(percentiles))
+        self.ranks = None  # perc level => (bucket index, count of values up to this bucket)
+        self.moments = (0, 0)  # sums of bucket median values and their squares, multiplied by counts
+
+    def copy(self):
+        new = IncrementalStats(())
+        new.perc_levels = self.perc_levels
+        new.ranks = None if self.ranks is None else dict(self.ranks)
+        new.moments = self.moments
+        return new
+
+    def update(self, histogram, delta):
+        """
+        Account delta that was just added into histogram
+
+        :type histogram: HdrHistogram
+        :type delta: HdrHistogram
+        """
+        if self.ranks is None or delta.unit_magnitude != histogram.unit_magnitude \
+                or delta.sub_bucket_count != histogram.sub_bucket_count:
+            self.ranks = None
+            return
+
+        indexes = numpy.flatnonzero(delta.counts)
+        counts = delta.counts[indexes]
+        self.moments = self.__add_moments(self.moments, histogram, indexes, counts)
+
+        moved = []
+        for level, (index, count) in iteritems(self.ranks):
+            count += int(counts[indexes <= index].sum())
+            self.ranks[level] = (index, count)
+            prev_count = count - int(histogram.counts[index])
+            if not self.__reached(count, histogram.total_count, level) \
+                    or self.__reached(prev_count, histogram.total_count, level):
+                moved.append(level)
+
+        if moved:
+            self.__find_ranks(histogram, moved)
+
+    def get_percentiles_dict(self, histogram):
+        self.__validate(histogram)
+        return {level: histogram.get_value_from_index(index) for level, (index, _) in iteritems(self.ranks)}
+
+    def get_stdev(self, histogram, mean):
+        self.__validate(histogram)
+        mean = Fraction(mean)
+        sum_val, sum_sqr = self.moments
+        dev_total = sum_sqr - 2 * mean * sum_val + mean * mean * histogram.total_count
+        return math.sqrt(dev_total / histogram.total_count)
+
+    def __validate(self, histogram):
+        if self.ranks is None:
+            indexes = numpy.flatnonzero(histogram.counts)
+            self.moments = self.__add_moments((0, 0), histogram, indexes, histogram.counts[indexes])
+            self.ranks = {}
+            self.__find_ranks(histogram, self.perc_levels)
+
+    def __find_ranks(self, histogram, levels):
+        cumulative = numpy.cumsum(histogram.counts)
+        cumulative_perc = (100.0 * cumulative) / histogram.total_count
+        for level in levels:
+            index = int(numpy.argmax((cumulative > 0) & (cumulative_perc >= level)))
+            self.ranks[level] = (index, int(cumulative[index]))
+
+    @staticmethod
+    def __reached(count, total, level):
+        return count > 0 and (100.0 * count) / total >= level
+
+    @staticmethod
+    def __add_moments(moments, histogram, indexes, counts):
+        medians = IncrementalStats.__get_bucket_medians(histogram, indexes).tolist()
+        counts = counts.tolist()
+        sum_val = sum(median * count for median, count in zip(medians, counts))
+        sum_sqr = sum(median * median * count for median, count in zip(medians, counts))
+        return moments[0] + sum_val, moments[1] + sum_sqr
+
+    @staticmethod
+    def __get_bucket_medians(histogram, indexes):
+        """
+        Vectorized equivalent of `_hdr_median_equiv_value(get_value_from_index(index))`
+        """
+        bucket_index = (indexes >> histogram.sub_bucket_half_count_magnitude) - 1
+        sub_bucket_index = (indexes & (histogram.sub_bucket_half_count - 1)) + histogram.sub_bucket_half_count
+        first_bucket = bucket_index < 0
+        sub_bucket_index[first_bucket] -= histogram.sub_bucket_half_count
+        bucket_index[first_bucket] = 0
+        lowest = sub_bucket_index << (bucket_index + histogram.unit_magnitude)
+
+        bit_length = numpy.frexp((lowest | histogram.sub_bucket_mask).astype(numpy.float64))[1]
+        bucket_index = bit_length - histogram.unit_magnitude - (histogram.sub_bucket_half_count_magnitude + 1)
+        sub_bucket_index = lowest >> (bucket_index + histogram.unit_magnitude)
+        bucket_index[sub_bucket_index >= histogram.sub_bucket_count] += 1
+        return lowest + ((1 << (histogram.unit_magnitude + bucket_index)) >> 1)
+
+
 class RespTimesCounter(JSONConvertible):
+    JOURNAL_LIMIT = 100  # deltas kept for snapshots, older snapshots are materialized when exceeded
+    COW_ATTRS = ('_histogram', '_base', '_snapshots', '_journal', '_journal_start')
+
     def __init__(self, low, high, sign_figures, perc_levels=()):
         super(RespTimesCounter, self).__init__()
         self.low = low
@@ -103,11 +217,33 @@ class RespTimesCounter(JSONConvertible):
         self._ff_iterator = None
         self._perc_levels = perc_levels
         self.known_mean = None
+        self._incremental = None
+        self.__init_cow()
+
+    def __init_cow(self):
+        self._base = None  # (owner counter, journal position) for snapshot that shares owner's counts
+        self._snapshots = []  # weak references to snapshots sharing counts of this counter
+        self._journal = []  # (indexes, counts) deltas applied since oldest live snapshot was taken
+        self._journal_start = 0
+
+    @property
+    def histogram(self):
+        """
+        :rtype: HdrHistogram
+        """
+        if self._base is not None:
+            self._materialize()
+        return self._histogram
+
+    @histogram.setter
+    def histogram(self, value):
+        self._histogram = value
 
     def __deepcopy__(self, memo):
         new = RespTimesCounter(self.low, self.high, self.sign_figures)
         new._ff_iterator = self._ff_iterator
         new._perc_levels = self._perc_levels
+        new._incremental = self._incremental and self._incremental.copy()
 
         # TODO: maybe hdrpy can encapsulate this itself
         new.histogram.counts = copy.deepcopy(self.histogram.counts, memo)
@@ -117,25 +253,203 @@ class RespTimesCounter(JSONConvertible):
 
         return new
 
+    def snapshot(self):
+        """
+        Copy-on-write copy: histogram counts aren't copied, snapshot refers to counts of this counter
+        and subtracts deltas journaled after it was taken only when it gets read or changed itself
+
+        :rtype: RespTimesCounter
+        """
+        new = RespTimesCounter.__new__(RespTimesCounter)
+        new.__dict__.update(self.__dict__)
+        new._histogram = copy.copy(self._histogram)  # scalars are own, counts array is shared
+        new._incremental = self._incremental and self._incremental.copy()
+        new._snapshots = []
+        new._journal = []
+        if self._base is None:
+            new._base = (self, self._journal_start + len(self._journal))
+        owner = new._base[0]
+        owner._snapshots.append(weakref.ref(new))
+        return new
+
+    def _materialize(self):
+        owner, position = self._base
+        self._base = None
+        counts = self._histogram.counts.copy()
+        for delta in owner._journal[position - owner._journal_start:]:
+            if delta is None:
+                break  # owner replaced its counts, shared ones weren't changed since then
+            numpy.subtract.at(counts, *delta)
+        self._histogram.counts = counts
+
+    def __journal(self, indexes=None, counts=None):
+        """
+        Record delta that is about to be applied to counts, so snapshots sharing them can restore their state.
+        Delta of None marks that counts array is replaced with new one.
+        """
+        self._snapshots = [ref for ref in self._snapshots if ref() is not None and ref()._base is not None]
+        if len(self._journal) >= self.JOURNAL_LIMIT:
+            self.__release_snapshots()
+
+        if self._snapshots:
+            oldest = min(ref()._base[1] for ref in self._snapshots)
+            del self._journal[:oldest - self._journal_start]
+            self._journal_start = oldest
+            self._journal.append(None if indexes is None else (indexes, counts))
+        else:
+            self._journal_start += len(self._journal)
+            self._journal = []
+
+    def __release_snapshots(self):
+        for ref in self._snapshots:
+            snapshot = ref()
+            if snapshot is not None and snapshot._base is not None:
+                snapshot._materialize()
+        self._snapshots = []
+        self._journal_start += len(self._journal)
+        self._journal = []
+
+    def __getstate__(self):
+        """
+        Compact pickled form: only non-empty histogram buckets are stored
+        """
+        hist = self.histogram
+        state = {key: val for key, val in iteritems(self.__dict__) if key not in self.COW_ATTRS}
+        state['_ff_iterator'] = None
+        indexes = numpy.flatnonzero(hist.counts)
+        state['counts'] = (indexes, hist.counts[indexes], hist.total_count, hist.min_value, hist.max_value)
+        return state
+
+    def __setstate__(self, state):
+        indexes, counts, total_count, min_value, max_value = state.pop('counts')
+        self.__dict__.update(state)
+        self.__init_cow()
+        self.histogram = HdrHistogram(self.low, self.high, self.sign_figures)
+        self.histogram.counts[indexes] = counts
+        self.histogram.total_count = total_count
+        self.histogram.min_value = min_value
+        self.histogram.max_value = max_value
+
     def __bool__(self):
         return len(self) > 0
 
     def __len__(self):
-        return self.histogram.total_count
+        return self._histogram.total_count
 
     def add(self, item, count=1):
         item = round(item * 1000.0, 3)
         if item > self.high:
             self.__grow(math.ceil(item / 1000.0) * 1000.0)
         self._ff_iterator = None
-        self.histogram.record_value(item, count)
+        self.__reset_incremental()
+        hist = self.histogram
+        index = hist._counts_index_for(item) if item >= 0 else -1
+        if 0 <= index < hist.counts_len:
+            self.__journal(numpy.array([index]), numpy.array([count]))
+        hist.record_value(item, count)
+
+    def add_values(self, items):
+        """
+        Bulk version of `add`, records list of response times in one pass
+
+        :type items: list[float]
+        """
+        items = numpy.array([round(item * 1000.0, 3) for item in items])
+        items = items[items >= 0]
+        if not len(items):
+            return
+
+        highest = items.max()
+        if highest > self.high:
+            self.__grow(math.ceil(highest / 1000.0) * 1000.0)
+        self._ff_iterator = None
+        self.__reset_incremental()
+
+        # TODO: maybe hdrpy can record arrays itself
+        hist = self.histogram
+        values = items.astype(numpy.int64)
+        bit_length = numpy.frexp((values | hist.sub_bucket_mask).astype(numpy.float64))[1]
+        bucket_index = bit_length - hist.unit_magnitude - (hist.sub_bucket_half_count_magnitude + 1)
+        sub_bucket_index = values >> (bucket_index + hist.unit_magnitude)
+        counts_index = ((bucket_index + 1) << hist.sub_bucket_half_count_magnitude)
+        counts_index += sub_bucket_index - hist.sub_bucket_half_count
+        delta = numpy.bincount(counts_index, minlength=hist.counts_len)[:hist.counts_len]
+        indexes = numpy.flatnonzero(delta)
+        self.__journal(indexes, delta[indexes])
+        hist.counts += delta
+        hist.total_count += len(items)
+        hist.min_value = min(hist.min_value, items.min().item())
+        hist.max_value = max(hist.max_value, highest.item())
+
+    def track_incrementally(self):
+        """
+        Maintain percentiles and stdev on each merge instead of walking whole histogram,
+        intended for cumulative counters that grow by merging per-second ones
+        """
+        self._incremental = IncrementalStats(self._perc_levels)
+
+    def __reset_incremental(self):
+        if self._incremental:
+            self._incremental = IncrementalStats(self._perc_levels)
 
     def merge(self, other):
         self._ff_iterator = None
         if other.high > self.high:
             self.__grow(other.high)
 
-        self.histogram.add(other.histogram)
+        hist = self.histogram
+        src = other.histogram
+        if src.unit_magnitude != hist.unit_magnitude or src.sub_bucket_count != hist.sub_bucket_count:
+            self.__release_snapshots()  # bucket indexes aren't compatible
+        else:
+            indexes = numpy.flatnonzero(src.counts)
+            self.__journal(indexes, src.counts[indexes])
+
+        hist.add(src)
+        if self._incremental:
+            self._incremental.update(hist, src)
+
+    def get_nonzero_counts(self):
+        """
+        Non-empty buckets of histogram, compact enough to be kept for each second
+
+        :rtype: list[(int, int)]
+        """
+        hist = self.histogram
+        indexes = numpy.flatnonzero(hist.counts)
+        return [(hist.get_value_from_index(index), count)
+                for index, count in zip(indexes.tolist(), hist.counts[indexes].tolist())]
+
+    def remove_counts(self, counts):
+        """
+        Remove values that were merged into this counter before, min and max values are kept as is
+
+        :param counts: result of `get_nonzero_counts` of merged counter
+        """
+        self._ff_iterator = None
+        self.__reset_incremental()
+        hist = self.histogram
+        counts = [(value, count) for value, count in counts if value >= 0]
+        indexes = numpy.array([hist._counts_index_for(value) for value, _ in counts], dtype=numpy.int64)
+        deltas = numpy.array([-count for _, count in counts], dtype=numpy.int64)
+        valid = (indexes >= 0) & (indexes < hist.counts_len)
+        self.__journal(indexes[valid], deltas[valid])
+        for value, count in counts:
+            hist.record_value(value, -count)
+
+    def get_percentile(self, level):
+        """
+        Value at percentile level, found without calculating all other stats
+
+        :type level: float
+        """
+        hist = self.histogram
+        if hist.total_count <= 0:
+            return 0
+
+        cumulative = numpy.cumsum(hist.counts)
+        index = int(numpy.argmax((cumulative > 0) & (100.0 * cumulative >= level * hist.total_count)))
+        return hist.get_value_from_index(index)
 
     def _get_ff(self):
         if self._ff_iterator is None:
@@ -144,13 +458,25 @@ class RespTimesCounter(JSONConvertible):
                 pass  # consume it
         return self._ff_iterator
 
+    def __get_tracked(self):
+        """
+        Snapshot with known incremental stats needs only histogram layout and total count, not its counts
+        """
+        if self._incremental.ranks is None:
+            return self.histogram
+        return self._histogram
+
     def get_percentiles_dict(self):
+        if self._incremental:
+            return self._incremental.get_percentiles_dict(self.__get_tracked())
         return self._get_ff().percentiles
 
     def get_counts(self):
         return self._get_ff().hist_values
 
     def get_stdev(self):
+        if self._incremental:
+            return self._incremental.get_stdev(self.__get_tracked(), self.known_mean) / 1000.0
         return self._get_ff().stdev / 1000.0
 
     def __json__(self):
@@ -162,9 +488,70 @@ class RespTimesCounter(JSONConvertible):
     def __grow(self, newsize):
         log.debug("Growing HDR from %s to %s", self.high, newsize)
         old = self.histogram
+        self.__journal()
         self.high = newsize
         self.histogram = HdrHistogram(self.low, self.high, self.sign_figures)
         self.histogram.add(old)
+        self.__reset_incremental()
+
+
+class ErrorsList(list):
+    """
+    List of error item dicts, indexed by message to merge items in constant time.
+    Index is dropped by any list modification that bypasses `inc` and rebuilt lazily on next `inc`
+    """
+
+    def __init__(self, items=()):
+        super(ErrorsList, self).__init__(items)
+        self._index = None
+
+    def __sync_index(self):
+        if self._index is None:
+            self._index = {}
+            for item in self:
+                self._index.setdefault(item['msg'], item)
+
+    def _invalidating(method):
+        def wrapper(self, *args, **kwargs):
+            self._index = None
+            return method(self, *args, **kwargs)
+
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    __setitem__ = _invalidating(list.__setitem__)
+    __delitem__ = _invalidating(list.__delitem__)
+    __iadd__ = _invalidating(list.__iadd__)
+    __imul__ = _invalidating(list.__imul__)
+    append = _invalidating(list.append)
+    extend = _invalidating(list.extend)
+    insert = _invalidating(list.insert)
+    pop = _invalidating(list.pop)
+    remove = _invalidating(list.remove)
+    reverse = _invalidating(list.reverse)
+    sort = _invalidating(list.sort)
+    if not PY3:
+        __setslice__ = _invalidating(list.__setslice__)
+        __delslice__ = _invalidating(list.__delslice__)
+    else:
+        clear = _invalidating(list.clear)
+    del _invalidating
+
+    def inc(self, value):
+        """
+        Add error item counts to the item with same message, or append copy of item
+
+        :type value: dict
+        """
+        self.__sync_index()
+        item = self._index.get(value['msg'])
+        if item is None:
+            item = dict(value, urls=Counter(value['urls']))
+            super(ErrorsList, self).append(item)
+            self._index[item['msg']] = item
+        else:
+            item['cnt'] += value['cnt']
+            item['urls'] += value['urls']
 
 
 class KPISet(dict):
@@ -207,7 +594,7 @@ class KPISet(dict):
         self[KPISet.AVG_CONN_TIME] = 0
         self[KPISet.BYTE_COUNT] = 0
         # vectors
-        self[KPISet.ERRORS] = []
+        self[KPISet.ERRORS] = ErrorsList()
         self[KPISet.RESP_TIMES] = RespTimesCounter(1, hist_max_rt, 3, perc_levels)
         self[KPISet.RESP_CODES] = Counter()
         self[KPISet.PERCENTILES] = {}
@@ -223,6 +610,37 @@ class KPISet(dict):
             mycopy[key] = copy.deepcopy(self.get(key, no_recalc=True), memo)
         return mycopy
 
+    def snapshot(self):
+        """
+        Make cheap read-only view of this KPISet for listeners. Scalars and small containers are copied,
+        response times histogram is shared in copy-on-write manner, so it's duplicated only when
+        counts of snapshot itself are needed.
+
+        :rtype: KPISet
+        """
+        mycopy = KPISet.__new__(KPISet)
+        for key in self:
+            mycopy[key] = self.get(key, no_recalc=True)
+
+        mycopy.sum_rt = self.sum_rt
+        mycopy.sum_lt = self.sum_lt
+        mycopy.sum_cn = self.sum_cn
+        mycopy.perc_levels = self.perc_levels
+        mycopy._concurrencies = Counter(self._concurrencies)
+
+        mycopy[KPISet.RESP_TIMES] = self.get(KPISet.RESP_TIMES, no_recalc=True).snapshot()
+        mycopy[KPISet.RESP_CODES] = Counter(self.get(KPISet.RESP_CODES, no_recalc=True))
+        mycopy[KPISet.PERCENTILES] = dict(self.get(KPISet.PERCENTILES, no_recalc=True))
+        errors = self.get(KPISet.ERRORS, no_recalc=True)
+        mycopy[KPISet.ERRORS] = [dict(error, urls=Counter(error['urls'])) for error in errors]
+        return mycopy
+
+    def __reduce__(self):
+        """
+        Pickle stored values as is, lazy stdev and percentiles are recalculated on access anyway
+        """
+        return KPISet, (), self.__dict__, None, iter([(key, self.get(key, no_recalc=True)) for key in self])
+
     @staticmethod
     def error_item_skel(error, ret_c, cnt, errtype, urls, tag):
         """
@@ -281,6 +699,61 @@ class KPISet(dict):
             # TODO: max/min rt? there is percentiles...
             # TODO: throughput if interval is not 1s
 
+    def add_samples(self, batch):
+        """
+        Bulk version of add_sample, all samples of batch should belong to this KPISet
+
+        :type batch: SamplesBatch
+        """
+        if not len(batch):
+            return
+
+        self[self.SAMPLE_COUNT] += len(batch)
+
+        with_cnc = numpy.flatnonzero(batch.concurrencies)
+        for trname_id, cnc in zip(batch.trname_ids[with_cnc].tolist(), batch.concurrencies[with_cnc].tolist()):
+            self.add_concurrency(cnc, batch.trnames[trname_id] if trname_id >= 0 else None)
+
+        with_rc = batch.r_code_ids >= 0
+        for r_code_id, count in self.__count_ids(batch.r_code_ids[with_rc]):
+            self[self.RESP_CODES][batch.r_codes[r_code_id]] += count
+
+        # count times only if we have RCs, sequential summing keeps float results same as in add_sample
+        self.sum_cn = sum(batch.con_times[with_rc].tolist(), self.sum_cn)
+        self.sum_lt = sum(batch.latencies[with_rc].tolist(), self.sum_lt)
+        self.sum_rt = sum(batch.r_times[with_rc].tolist(), self.sum_rt)
+
+        failed = numpy.flatnonzero(batch.error_ids >= 0)
+        self[self.FAILURES] += len(failed)
+        self[self.SUCCESSES] += len(batch) - len(failed)
+        failed_rcs = batch.r_code_ids[failed]
+        for error_id, count, first_idx in self.__count_ids(batch.error_ids[failed], with_first=True):
+            r_code = batch.r_codes[failed_rcs[first_idx]] if failed_rcs[first_idx] >= 0 else None
+            error = batch.errors[error_id]
+            item = self.error_item_skel(error, r_code, count, KPISet.ERRTYPE_ERROR, Counter(), None)
+            self.inc_list(self[self.ERRORS], ("msg", error), item)
+
+        self[self.RESP_TIMES].add_values(batch.r_times.tolist())
+        self[self.BYTE_COUNT] += int(batch.byte_counts.sum())
+
+    @staticmethod
+    def __count_ids(ids, with_first=False):
+        """
+        Count occurrences of ids, in order of their first appearance
+
+        :type ids: numpy.ndarray
+        :rtype: list[tuple]
+        """
+        if not len(ids):
+            return []
+
+        uniq, first_idx, counts = numpy.unique(ids, return_index=True, return_counts=True)
+        order = numpy.argsort(first_idx)
+        columns = [uniq[order].tolist(), counts[order].tolist()]
+        if with_first:
+            columns.append(first_idx[order].tolist())
+        return zip(*columns)
+
     def add_concurrency(self, cnc, sid):
         self._concurrencies[sid] = cnc
 
@@ -296,6 +769,10 @@ class KPISet(dict):
         :type selector: tuple
         :type value: dict
         """
+        if isinstance(values, ErrorsList) and selector == ("msg", value['msg']):
+            values.inc(value)
+            return
+
         found = False
         for item in values:
             if item[selector[0]] == selector[1]:
@@ -307,6 +784,11 @@ class KPISet(dict):
         if not found:
             values.append(copy.deepcopy(value))
 
+    def __setitem__(self, key, value):
+        if key == self.ERRORS and not isinstance(value, ErrorsList):
+            value = ErrorsList(value)
+        super(KPISet, self).__setitem__(key, value)
+
     def __getitem__(self, key):
         rtimes = self.get(self.RESP_TIMES, no_recalc=True)
         rtimes.known_mean = self.get(self.AVG_RESP_TIME, no_recalc=True)
@@ -504,10 +986,156 @@ class DataPoint(dict):
             self.recalculate()
 
 
+class SamplesBatch(object):
+    """
+    Columnar chunk of samples, readers may yield it from `_read` instead of separate sample tuples.
+    Numeric columns are numpy arrays, string columns are stored as ids in interned tables.
+    None values of string columns (no error, no response code) are marked with -1 id.
+    """
+
+    def __init__(self, timestamps, labels, label_ids, concurrencies, r_times, con_times, latencies,
+                 r_codes, r_code_ids, errors, error_ids, trnames, trname_ids, byte_counts):
+        self.timestamps = timestamps
+        self.labels = labels
+        self.label_ids = label_ids
+        self.concurrencies = concurrencies
+        self.r_times = r_times
+        self.con_times = con_times
+        self.latencies = latencies
+        self.r_codes = r_codes
+        self.r_code_ids = r_code_ids
+        self.errors = errors
+        self.error_ids = error_ids
+        self.trnames = trnames
+        self.trname_ids = trname_ids
+        self.byte_counts = byte_counts
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @staticmethod
+    def intern(values, nullable=True):
+        """
+        Turn column of strings into table of unique values and numpy array of ids,
+        table keeps order of first appearance, None values get -1 id for nullable column
+
+        :type values: list[str]
+        :type nullable: bool
+        :rtype: (list[str], numpy.ndarray)
+        """
+        table = {}
+        ids = [-1 if nullable and value is None else table.setdefault(value, len(table)) for value in values]
+        return list(table), numpy.array(ids, dtype=numpy.int64)
+
+    @staticmethod
+    def from_samples(t_stamp, samples):
+        """
+        Make batch out of ResultsReader buffer items:
+        label, concurrency, rt, ct, lt, rc, error, trname, byte_count
+
+        :type t_stamp: int
+        :type samples: list[tuple]
+        :rtype: SamplesBatch
+        """
+        labels, concurrencies, r_times, con_times, latencies, r_codes, errors, trnames, byte_counts = zip(*samples)
+        labels, label_ids = SamplesBatch.intern(labels, nullable=False)
+        r_codes, r_code_ids = SamplesBatch.intern(r_codes)
+        errors, error_ids = SamplesBatch.intern(errors)
+        trnames, trname_ids = SamplesBatch.intern(trnames)
+        return SamplesBatch(numpy.full(len(samples), t_stamp, dtype=numpy.int64), labels, label_ids,
+                            numpy.array([cnc or 0 for cnc in concurrencies]),
+                            numpy.array(r_times, dtype=numpy.float64),
+                            numpy.array([con_time or 0 for con_time in con_times], dtype=numpy.float64),
+                            numpy.array(latencies, dtype=numpy.float64), r_codes, r_code_ids, errors, error_ids,
+                            trnames, trname_ids, numpy.array([cnt or 0 for cnt in byte_counts], dtype=numpy.int64))
+
+    def split_by(self, column):
+        """
+        Split batch into parts with same value in column, keeping original order inside each part
+        and ordering parts by first appearance of value
+
+        :type column: numpy.ndarray
+        :rtype: list[(int, SamplesBatch)]
+        """
+        if not len(self):
+            return []
+
+        order = numpy.argsort(column, kind='stable')
+        bounds = numpy.flatnonzero(numpy.diff(column[order])) + 1
+        parts = sorted(numpy.split(order, bounds), key=lambda part: part[0])
+        return [(int(column[part[0]]), self.take(part)) for part in parts]
+
+    def take(self, selector):
+        """
+        Get batch subset, selected with numpy index array or boolean mask
+
+        :rtype: SamplesBatch
+        """
+        return SamplesBatch(self.timestamps[selector], self.labels, self.label_ids[selector],
+                            self.concurrencies[selector], self.r_times[selector], self.con_times[selector],
+                            self.latencies[selector], self.r_codes, self.r_code_ids[selector],
+                            self.errors, self.error_ids[selector], self.trnames, self.trname_ids[selector],
+                            self.byte_counts[selector])
+
+    def split_by_timestamp(self):
+        """
+        Bucket samples into per-second batches
+
+        :rtype: list[(int, SamplesBatch)]
+        """
+        return self.split_by(self.timestamps)
+
+    def split_by_label(self):
+        """
+        :rtype: list[(int, SamplesBatch)]
+        """
+        return self.split_by(self.label_ids)
+
+
+SafeDumper.add_representer(ErrorsList, SafeRepresenter.represent_list)
 SafeDumper.add_representer(KPISet, SafeRepresenter.represent_dict)
 SafeDumper.add_representer(DataPoint, SafeRepresenter.represent_dict)
 
 
+class FoldingSet(fuzzyset.FuzzySet):
+    """
+    Fuzzy set of known keys (labels or errors) with LRU memo of folding results,
+    so repeated keys skip fuzzy matching
+
+    :type memo: collections.OrderedDict
+    """
+
+    def __init__(self, memo_size=10000):
+        super(FoldingSet, self).__init__(use_levenshtein=True)
+        self.memo = collections.OrderedDict()
+        self.memo_size = memo_size
+        self.hits = 0
+        self.misses = 0
+
+    def recall(self, key):
+        """
+        Get folding result for key from memo, None if not remembered
+
+        :type key: str
+        :rtype: str
+        """
+        folded = self.memo.pop(key, None)
+        if folded is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.memo[key] = folded  # mark as recently used
+        return folded
+
+    def remember(self, key, folded):
+        self.memo[key] = folded
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+
+    def get_stats(self):
+        return {"size": len(self), "memo": len(self.memo), "hits": self.hits, "misses": self.misses}
+
+
 class ResultsProvider(object):
     """
     :type listeners: list[AggregatorListener]
@@ -524,16 +1152,16 @@ class ResultsProvider(object):
         self.buffer_multiplier = 2
         self.buffer_scale_idx = None
         self.histogram_max = 1.0
-        self.known_errors = fuzzyset.FuzzySet(use_levenshtein=True)
+        self.known_errors = FoldingSet()
         self.max_error_count = 100
-        self.known_labels = fuzzyset.FuzzySet(use_levenshtein=True)
+        self.known_labels = FoldingSet()
         self.generalize_labels = 100
 
     @staticmethod
     def _fuzzy_fold(key, dataset, limit):
         """
         :type key: str
-        :type dataset: fuzzyset.FuzzySet
+        :type dataset: FoldingSet
         :type limit: int
         :rtype: str
         """
@@ -543,6 +1171,14 @@ class ResultsProvider(object):
         if not isinstance(key, text_type):
             key = key.decode('utf-8')
 
+        folded = dataset.recall(key)
+        if folded is None:
+            folded = ResultsProvider.__fold(key, dataset, limit)
+            dataset.remember(key, folded)
+        return folded
+
+    @staticmethod
+    def __fold(key, dataset, limit):
         if key.lower() in dataset.exact_set:
             return key
 
@@ -581,10 +1217,21 @@ class ResultsProvider(object):
         :param current: KPISet
         """
         for label, data in iteritems(current):
-            cumul = self.cumulative.setdefault(label, KPISet(self.track_percentiles, data[KPISet.RESP_TIMES].high))
+            if label not in self.cumulative:
+                self.cumulative[label] = KPISet(self.track_percentiles, data[KPISet.RESP_TIMES].high)
+                self.cumulative[label][KPISet.RESP_TIMES].track_incrementally()
+            cumul = self.cumulative[label]
             cumul.merge_kpis(data)
             cumul.recalculate()
 
+    def _get_cumulative_snapshot(self):
+        """
+        Cheap copy of cumulative results to pass to listeners
+
+        :rtype: dict[str,KPISet]
+        """
+        return {label: kpiset.snapshot() for label, kpiset in iteritems(self.cumulative)}
+
     def datapoints(self, final_pass=False):
         """
         Generator object that returns datapoints from the reader
@@ -592,14 +1239,23 @@ class ResultsProvider(object):
         :type final_pass: bool
         """
         for datapoint in self._calculate_datapoints(final_pass):
-            current = datapoint[DataPoint.CURRENT]
-            self.__merge_to_cumulative(current)
-            datapoint[DataPoint.CUMULATIVE] = copy.deepcopy(self.cumulative)
-            datapoint.recalculate()
+            yield self._accumulate(datapoint)
 
-            for listener in self.listeners:
-                listener.aggregated_second(datapoint)
-            yield datapoint
+    def _accumulate(self, datapoint):
+        """
+        Merge calculated datapoint into cumulative and notify listeners
+
+        :type datapoint: DataPoint
+        :rtype: DataPoint
+        """
+        current = datapoint[DataPoint.CURRENT]
+        self.__merge_to_cumulative(current)
+        datapoint[DataPoint.CUMULATIVE] = self._get_cumulative_snapshot()
+        datapoint.recalculate()
+
+        for listener in self.listeners:
+            listener.aggregated_second(datapoint)
+        return datapoint
 
     @abstractmethod
     def _calculate_datapoints(self, final_pass=False):
@@ -621,6 +1277,8 @@ class ResultsReader(ResultsProvider):
         self.log = logging.getLogger(self.__class__.__name__)
         self.buffer = {}
         self.min_timestamp = 0
+        self.rtimes_max = {}  # histogram sizes of labels, for worker process that doesn't keep cumulative
+        self.worker_timeout = 60  # seconds to wait for worker process answer
         if perc_levels is not None:
             self.track_percentiles = perc_levels
 
@@ -653,9 +1311,41 @@ class ResultsReader(ResultsProvider):
 
                 error = self._fold_error(error)
                 self.buffer[t_stamp].append((label, conc, r_time, con_time, latency, r_code, error, trname, byte_count))
+            elif isinstance(result, SamplesBatch):
+                self.__process_batch(result)
             else:
                 raise TaurusInternalException("Unsupported results from %s reader: %s" % (self, result))
 
+    def __process_batch(self, batch):
+        """
+        Columnar counterpart of samples processing: filters, corrections and
+        error folding are done once per column or per unique value
+
+        :type batch: SamplesBatch
+        """
+        ignored = [idx for idx, label in enumerate(batch.labels)
+                   if any([label.startswith(ignore) for ignore in self.ignored_labels])]
+        if ignored:
+            batch = batch.take(~numpy.isin(batch.label_ids, ignored))
+
+        if not len(batch):
+            return
+
+        early = batch.timestamps < self.min_timestamp
+        if early.any():
+            self.log.debug("Putting %s samples into %s", numpy.count_nonzero(early), self.min_timestamp)
+            batch.timestamps[early] = self.min_timestamp
+
+        negative = batch.r_times < 0
+        if negative.any():
+            self.log.warning("Negative response time reported by tool, resetting it to zero")
+            batch.r_times[negative] = 0
+
+        batch.errors = [self._fold_error(error) for error in batch.errors]
+
+        for t_stamp, second_batch in batch.split_by_timestamp():
+            self.buffer.setdefault(t_stamp, []).append(second_batch)
+
     def __aggregate_current(self, datapoint, samples):
         """
         :param datapoint: DataPoint
@@ -663,19 +1353,23 @@ class ResultsReader(ResultsProvider):
         :return:
         """
         current = datapoint[DataPoint.CURRENT]
-        for sample in samples:
-            label, r_time, concur, con_time, latency, r_code, error, trname, byte_count = sample
-            if label == '':
-                label = '[empty]'
+        for batch in self.__get_batches(datapoint[DataPoint.TIMESTAMP], samples):
+            labels = []
+            for label in batch.labels:
+                if label == '':
+                    label = '[empty]'
 
-            if self.generalize_labels:
-                label = self._generalize_label(label)
+                if self.generalize_labels:
+                    label = self._generalize_label(label)
+
+                labels.append(label)
 
-            if label not in current:
-                current[label] = KPISet(self.track_percentiles, self.__get_rtimes_max(label))
+            for label_id, label_batch in batch.split_by_label():
+                label = labels[label_id]
+                if label not in current:
+                    current[label] = KPISet(self.track_percentiles, self.__get_rtimes_max(label))
 
-            # empty means overall
-            current[label].add_sample((r_time, concur, con_time, latency, r_code, error, trname, byte_count))
+                current[label].add_samples(label_batch)
 
         overall = KPISet(self.track_percentiles, self.__get_rtimes_max(''))
         for label in current.values():
@@ -683,26 +1377,39 @@ class ResultsReader(ResultsProvider):
         current[''] = overall
         return current
 
+    @staticmethod
+    def __get_batches(t_stamp, samples):
+        """
+        Turn mix of sample tuples and batches into batches, preserving order
+
+        :rtype: list[SamplesBatch]
+        """
+        batches = []
+        tuples = []
+        for sample in samples:
+            if isinstance(sample, SamplesBatch):
+                if tuples:
+                    batches.append(SamplesBatch.from_samples(t_stamp, tuples))
+                    tuples = []
+                batches.append(sample)
+            else:
+                tuples.append(sample)
+
+        if tuples:
+            batches.append(SamplesBatch.from_samples(t_stamp, tuples))
+        return batches
+
     def __get_rtimes_max(self, label):
         if label in self.cumulative:
             rtimes_max = self.cumulative[label][KPISet.RESP_TIMES].high
         else:
-            rtimes_max = self.histogram_max * 1000.0
+            rtimes_max = self.rtimes_max.get(label, self.histogram_max * 1000.0)
         return rtimes_max
 
-    def _calculate_datapoints(self, final_pass=False):
+    def _scale_buffer_len(self):
         """
-        A generator to read available datapoints
-
-        :type final_pass: bool
-        :rtype: DataPoint
+        Adapt buffer length to chosen percentile of cumulative response time
         """
-        self.__process_readers(final_pass)
-
-        self.log.debug("Buffer len: %s; Known errors count: %s", len(self.buffer), len(self.known_errors))
-        if not self.buffer:
-            return
-
         if self.cumulative and self.track_percentiles and self.buffer_scale_idx is not None:
             old_len = self.buffer_len
             chosen_timing = self.cumulative[''][KPISet.PERCENTILES][self.buffer_scale_idx]
@@ -713,6 +1420,48 @@ class ResultsReader(ResultsProvider):
             if self.buffer_len != old_len:
                 self.log.info("Changed data analysis delay to %ds", self.buffer_len)
 
+    def _fold_datapoint(self, datapoint):
+        """
+        Fold labels and errors of datapoint that was aggregated without folding in worker process
+
+        :type datapoint: DataPoint
+        :rtype: DataPoint
+        """
+        folded = {}
+        for label, kpiset in iteritems(datapoint[DataPoint.CURRENT]):
+            errors = kpiset[KPISet.ERRORS]
+            kpiset[KPISet.ERRORS] = ErrorsList()
+            for item in errors:
+                kpiset[KPISet.ERRORS].inc(dict(item, msg=self._fold_error(item['msg'])))
+
+            if label:  # overall KPISet isn't folded
+                label = self._generalize_label(label)
+
+            if label in folded:
+                concurrencies = dict(folded[label]._concurrencies)  # same thread group reports same concurrency
+                concurrencies.update(kpiset._concurrencies)
+                folded[label].merge_kpis(kpiset)
+                folded[label]._concurrencies = Counter(concurrencies)
+            else:
+                folded[label] = kpiset
+
+        datapoint[DataPoint.CURRENT] = folded
+        return datapoint
+
+    def _calculate_datapoints(self, final_pass=False):
+        """
+        A generator to read available datapoints
+
+        :type final_pass: bool
+        :rtype: DataPoint
+        """
+        self.__process_readers(final_pass)
+
+        self.log.debug("Buffer len: %s; Known errors: %s", len(self.buffer), self.known_errors.get_stats())
+        if not self.buffer:
+            return
+
+        self._scale_buffer_len()
         timestamps = sorted(self.buffer.keys())
         while final_pass or (timestamps[-1] >= (timestamps[0] + self.buffer_len)):
             timestamp = timestamps.pop(0)
@@ -746,6 +1495,261 @@ class ResultsReader(ResultsProvider):
         yield
 
 
+def receive_from_worker(conn, process, timeout, owner):
+    """
+    Wait for answer of worker process, while it's alive and not longer than timeout
+
+    :type timeout: float
+    :raise TaurusInternalException: if worker has died or got stuck
+    """
+    deadline = time.time() + timeout
+    while not conn.poll(min(1.0, max(deadline - time.time(), 0))):
+        if not process.is_alive() and not conn.poll():
+            raise TaurusInternalException("Worker process of %s has died" % owner)
+        if time.time() >= deadline:
+            raise TaurusInternalException("Worker process of %s didn't answer in %s seconds" % (owner, timeout))
+
+    try:
+        return conn.recv()
+    except EOFError:
+        raise TaurusInternalException("Worker process of %s has died" % owner)
+
+
+class ReaderWorker(object):
+    """
+    Child process doing reading and per-second aggregation for single reader.
+    Calculated datapoints are sent back to parent, which folds their labels and errors,
+    merges them into reader's cumulative and notifies reader's listeners as usual.
+    Buffer length and histogram sizes depend on cumulative, so parent passes them with each request.
+
+    :type reader: ResultsReader
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        context = multiprocessing.get_context("fork") if PY3 else multiprocessing  # reader isn't picklable
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=self._serve, args=(child_conn,))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+    def _serve(self, conn):
+        self.reader.generalize_labels = 0  # folding sets are kept by parent
+        self.reader.max_error_count = 0
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+
+            final_pass, self.reader.buffer_len, self.reader.rtimes_max = request
+            try:
+                points = list(self.reader._calculate_datapoints(final_pass))
+                conn.send((points, getattr(self.reader, "read_records", None), None))
+            except BaseException:
+                conn.send(([], None, traceback.format_exc()))
+        conn.close()
+
+    def request(self, final_pass):
+        """
+        Ask worker to read and aggregate next portion of data, doesn't wait for result
+
+        :type final_pass: bool
+        """
+        reader = self.reader
+        reader._scale_buffer_len()
+        rtimes_max = {label: kpiset[KPISet.RESP_TIMES].high for label, kpiset in iteritems(reader.cumulative)}
+        self.conn.send((final_pass, reader.buffer_len, rtimes_max))
+
+    def datapoints(self):
+        """
+        Wait for requested datapoints and pass them through parent's reader
+
+        :rtype: list[DataPoint]
+        """
+        points, read_records, error = receive_from_worker(self.conn, self.process, self.reader.worker_timeout,
+                                                         self.reader)
+
+        if error:
+            raise TaurusInternalException("Worker process of %s has failed:\n%s" % (self.reader, error))
+
+        if read_records is not None:
+            self.reader.read_records = read_records
+
+        return [self.reader._accumulate(self.reader._fold_datapoint(point)) for point in points]
+
+    def stop(self):
+        if self.process.is_alive():
+            self.conn.send(None)
+            self.process.join(self.reader.worker_timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+class ChunkedResultsReader(ResultsReader):
+    """
+    Offline reader for complete results file. File is split into chunks at line boundaries,
+    chunks are read and aggregated by pool of worker processes, then per-second datapoints
+    of chunks are merged into single stream, like it was read by one reader.
+
+    :param chunks: list of (start, end) byte ranges of file
+    :param reader_factory: callable(start, end) that returns ResultsReader for range of file
+    :param processes: number of worker processes
+    """
+
+    def __init__(self, chunks, reader_factory, processes=None):
+        super(ChunkedResultsReader, self).__init__()
+        self.chunks = chunks
+        self.reader_factory = reader_factory
+        self.processes = max(1, min(processes or multiprocessing.cpu_count(), len(chunks)))
+        self.received = 0
+        self.read_records = 0
+        self._workers = []
+
+    @staticmethod
+    def split_file(filename, chunk_size, start=0):
+        """
+        Get byte ranges of file chunks, each chunk ends with end of line
+
+        :rtype: list[tuple[int,int]]
+        """
+        chunks = []
+        with open(filename, 'rb') as fds:
+            fds.seek(0, 2)
+            size = fds.tell()
+            while start < size:
+                fds.seek(start + chunk_size)
+                fds.readline()
+                end = min(fds.tell(), size)
+                chunks.append((start, end))
+                start = end
+        return chunks
+
+    def is_complete(self):
+        return self.received == len(self.chunks) and not self.buffer
+
+    def __start_workers(self):
+        context = multiprocessing.get_context("fork") if PY3 else multiprocessing  # factory isn't picklable
+        self.log.info("Reading %s chunks of results with %s processes", len(self.chunks), self.processes)
+        for index in range(self.processes):
+            conn, child_conn = context.Pipe()
+            process = context.Process(target=self._serve, args=(child_conn, self.chunks[index::self.processes]))
+            process.daemon = True
+            process.start()
+            child_conn.close()
+            self._workers.append((process, conn))
+
+    def _serve(self, conn, chunks):
+        for start, end in chunks:
+            try:
+                reader = self.reader_factory(start, end)
+                self.__configure(reader)
+                points = list(reader.datapoints(final_pass=True))  # cumulative keeps histogram ranges of labels
+                for point in points:
+                    point[DataPoint.CUMULATIVE] = {}  # parent calculates it for whole file
+                conn.send((points, getattr(reader, "read_records", 0), None))
+            except BaseException:
+                conn.send(([], 0, traceback.format_exc()))
+                break
+        conn.close()
+
+    def __configure(self, reader):
+        """
+        :type reader: ResultsReader
+        """
+        reader.track_percentiles = self.track_percentiles
+        reader.ignored_labels = self.ignored_labels
+        reader.histogram_max = self.histogram_max
+        reader.max_error_count = 0  # chunks are folded by parent, to share folding sets
+        reader.generalize_labels = 0
+
+    def __receive(self, wait):
+        """
+        Collect datapoints of chunks in their order, chunks are distributed between workers round-robin
+
+        :return: min timestamp of last received chunk, or None if nothing was received
+        """
+        watermark = None
+        while self.received < len(self.chunks):
+            process, conn = self._workers[self.received % self.processes]
+            if not wait and not conn.poll():
+                break
+
+            points, read_records, error = receive_from_worker(conn, process, self.worker_timeout, self)
+
+            if error:
+                raise TaurusInternalException("Worker process of %s has failed:\n%s" % (self, error))
+
+            self.received += 1
+            self.read_records += read_records
+            for point in points:
+                self._fold_datapoint(point)
+                tstamp = point[DataPoint.TIMESTAMP]
+                if tstamp < self.min_timestamp:
+                    self.log.debug("Putting datapoint %s into %s", tstamp, self.min_timestamp)
+                    tstamp = point[DataPoint.TIMESTAMP] = self.min_timestamp
+                self.buffer.setdefault(tstamp, []).append(point)
+
+            if points:
+                watermark = min(point[DataPoint.TIMESTAMP] for point in points)
+
+        return watermark
+
+    def __merge(self, tstamp, points):
+        """
+        Merge datapoints of chunks for the same second, overall KPISet is calculated from merged labels
+
+        :rtype: DataPoint
+        """
+        point = DataPoint(tstamp, self.track_percentiles)
+        current = point[DataPoint.CURRENT]
+        for src in points:
+            for label, kpiset in iteritems(src[DataPoint.CURRENT]):
+                if label != '':
+                    dst = current.setdefault(label, KPISet(self.track_percentiles, kpiset[KPISet.RESP_TIMES].high))
+                    dst.merge_kpis(kpiset, id(self))
+
+        overall = KPISet(self.track_percentiles, self.histogram_max * 1000.0)
+        for kpiset in current.values():
+            overall.merge_kpis(kpiset, id(self))
+        current[''] = overall
+        return point
+
+    def _calculate_datapoints(self, final_pass=False):
+        if not self._workers and self.received < len(self.chunks):
+            self.__start_workers()
+
+        watermark = self.__receive(wait=final_pass)
+        if self.received == len(self.chunks):
+            self.stop()
+            watermark = float('inf')  # nothing more to come
+        elif watermark is None:
+            return
+
+        for tstamp in sorted(self.buffer.keys()):
+            if tstamp >= watermark:
+                break
+
+            points = self.buffer.pop(tstamp)
+            self.min_timestamp = tstamp + 1
+            point = points[0] if len(points) == 1 else self.__merge(tstamp, points)
+            point[DataPoint.SOURCE_ID] = id(self)
+            yield point
+
+    def _read(self, final_pass=False):
+        raise TaurusInternalException("Results of %s are read by worker processes" % self)
+
+    def stop(self):
+        for process, conn in self._workers:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            conn.close()
+        self._workers = []
+
+
 class ConsolidatingAggregator(Aggregator, ResultsProvider):
     """
 
@@ -761,7 +1765,11 @@ class ConsolidatingAggregator(Aggregator, ResultsProvider):
         self.underlings = []
         self.buffer = {}
         self.histogram_max = 5.0
+        self.parallel_reading = False
+        self.worker_timeout = 60
         self._sticky_concurrencies = {}
+        self._workers = {}
+        self._started = False
 
     def prepare(self):
         """
@@ -804,6 +1812,15 @@ class ConsolidatingAggregator(Aggregator, ResultsProvider):
         self.histogram_max = dehumanize_time(self.settings.get("histogram-initial", self.histogram_max))
         self.max_error_count = self.settings.get("max-error-variety", self.max_error_count)
 
+        memo_size = self.settings.get("folding-memo-size", self.known_labels.memo_size)
+        self.known_labels.memo_size = self.known_errors.memo_size = memo_size
+
+        self.parallel_reading = self.settings.get("parallel-reading", self.parallel_reading)
+        if self.parallel_reading and is_windows():
+            self.log.warning("Parallel reading isn't supported on Windows, results will be read sequentially")
+            self.parallel_reading = False
+        self.worker_timeout = dehumanize_time(self.settings.get("worker-timeout", self.worker_timeout))
+
     def add_underling(self, underling):
         """
         Add source for aggregating
@@ -818,6 +1835,7 @@ class ConsolidatingAggregator(Aggregator, ResultsProvider):
             underling.buffer_multiplier = self.buffer_multiplier
             underling.buffer_scale_idx = self.buffer_scale_idx
             underling.histogram_max = self.histogram_max
+            underling.worker_timeout = self.worker_timeout
 
             underling.max_error_count = self.max_error_count
             underling.generalize_labels = self.generalize_labels
@@ -826,8 +1844,25 @@ class ConsolidatingAggregator(Aggregator, ResultsProvider):
             underling.known_errors = self.known_errors
             underling.known_labels = self.known_labels
 
+            if self.parallel_reading and not isinstance(underling, ChunkedResultsReader):
+                self.__start_worker(underling)
+
         self.underlings.append(underling)
 
+    def __start_worker(self, underling):
+        """
+        Worker is forked while executors are prepared, before modules start their background threads
+        """
+        if self._started:
+            self.log.debug("Reading %s in main process, it's added after startup", underling)
+        else:
+            self.log.debug("Starting worker process for %s", underling)
+            self._workers[id(underling)] = ReaderWorker(underling)
+
+    def startup(self):
+        super(ConsolidatingAggregator, self).startup()
+        self._started = True
+
     def check(self):
         """
         Check if there is next aggregate data present
@@ -843,12 +1878,25 @@ class ConsolidatingAggregator(Aggregator, ResultsProvider):
         Process all remaining aggregate data
         """
         super(ConsolidatingAggregator, self).post_process()
-        for point in self.datapoints(True):
-            self.log.debug("Processed datapoint: %s/%s", point[DataPoint.TIMESTAMP], point[DataPoint.SOURCE_ID])
+        try:
+            for point in self.datapoints(True):
+                self.log.debug("Processed datapoint: %s/%s", point[DataPoint.TIMESTAMP], point[DataPoint.SOURCE_ID])
+        finally:
+            for worker in self._workers.values():
+                worker.stop()
+            self._workers = {}
+
+        self.log.debug("Label folding: %s", self.known_labels.get_stats())
+        self.log.debug("Error folding: %s", self.known_errors.get_stats())
 
     def _process_underlings(self, final_pass):
+        if self.parallel_reading:
+            self.__request_workers(final_pass)
+
         for underling in self.underlings:
-            for data in underling.datapoints(final_pass):
+            worker = self._workers.get(id(underling))
+            points = worker.datapoints() if worker else underling.datapoints(final_pass)
+            for data in points:
                 tstamp = data[DataPoint.TIMESTAMP]
                 if self.buffer:
                     mints = min(self.buffer.keys())
@@ -858,6 +1906,13 @@ class ConsolidatingAggregator(Aggregator, ResultsProvider):
                         tstamp = mints
                 self.buffer.setdefault(tstamp, []).append(data)
 
+    def __request_workers(self, final_pass):
+        """
+        Start all workers reading at once, so underlings are processed in parallel
+        """
+        for worker in self._workers.values():
+            worker.request(final_pass)
+
     def _calculate_datapoints(self, final_pass=False):
         """
         Override ResultsProvider._calculate_datapoints
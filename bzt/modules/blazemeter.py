@@ -16,16 +16,19 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 import copy
+import itertools
 import logging
 import os
 import platform
 import re
 import sys
+import tempfile
+import threading
 import time
 import traceback
 import zipfile
 from abc import abstractmethod
-from collections import defaultdict, OrderedDict, Counter, namedtuple
+from collections import defaultdict, OrderedDict, Counter, namedtuple, deque
 from functools import wraps
 from ssl import SSLError
 
@@ -47,7 +50,7 @@ from bzt.modules.monitoring import Monitoring, MonitoringListener, LocalClient
 from bzt.modules.services import Unpacker
 from bzt.modules.selenium import SeleniumExecutor
 from bzt.requests_model import has_variable_pattern
-from bzt.six import BytesIO, iteritems, HTTPError, r_input, URLError, b, string_types, text_type
+from bzt.six import iteritems, HTTPError, r_input, URLError, b, string_types, text_type
 from bzt.utils import open_browser, BetterDict, ExceptionalDownloader, ProgressBarContext
 from bzt.utils import to_json, dehumanize_time, get_full_path, get_files_recursive, replace_in_config, humanize_bytes
 
@@ -199,6 +202,9 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
         self.last_ts = 0
         self.report_name = None
         self._dpoint_serializer = DatapointSerializer(self)
+        self.send_async = False
+        self.sender = None  # type: AsyncSender
+        self.send_gzip = False
 
     def prepare(self):
         """
@@ -211,6 +217,10 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
         self.monitoring_buffer = MonitoringBuffer(monitoring_buffer_limit, self.log)
         self.browser_open = self.settings.get("browser-open", self.browser_open)
         self.public_report = self.settings.get("public-report", self.public_report)
+        self.send_async = self.settings.get("send-async", self.send_async)
+        self.send_gzip = self.settings.get("send-gzip", self.send_gzip)
+        self._dpoint_serializer.incremental = self.settings.get("send-incremental", self._dpoint_serializer.incremental)
+        self._dpoint_serializer.compact = self._dpoint_serializer.incremental or self.send_gzip
         self._dpoint_serializer.multi = self.settings.get("report-times-multiplier", self._dpoint_serializer.multi)
         token = self.settings.get("token", "")
         if not token:
@@ -283,6 +293,11 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
                 report_link = self._master.make_report_public()
                 self.log.info("Public report link: %s", report_link)
 
+        if self.send_async:
+            queue_limit = self.settings.get("send-queue-limit", 1000)
+            self.sender = AsyncSender(self._send_kpi, self._send_monitoring, queue_limit, self._user.timeout, self.log)
+            self.sender.start()
+
     def _start_online(self):
         """
         Start online test
@@ -305,10 +320,10 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
 
     def __get_jtls_and_more(self):
         """
-        Compress all files in artifacts dir to single zipfile
-        :rtype: (bzt.six.BytesIO,dict)
+        Compress all files in artifacts dir to single zipfile, which is written into temporary file
+        :rtype: (str,dict)
         """
-        mfile = BytesIO()
+        zip_file = tempfile.NamedTemporaryFile(prefix="artifacts", suffix=".zip", delete=False)
         listing = {}
 
         logs = set()
@@ -317,7 +332,7 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
                 logs.add(handler.baseFilename)
 
         max_file_size = self.settings.get('artifact-upload-size-limit', 10) * 1024 * 1024  # 10MB
-        with zipfile.ZipFile(mfile, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zfh:
+        with zipfile.ZipFile(zip_file, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zfh:
             for root, _, files in os.walk(self.engine.artifacts_dir):
                 for filename in files:
                     full_path = os.path.join(root, filename)
@@ -335,7 +350,8 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
             for filename in logs:  # upload logs unconditionally
                 zfh.write(filename, os.path.basename(filename))
                 listing[filename] = os.path.getsize(filename)
-        return mfile, listing
+        zip_file.close()
+        return zip_file.name, listing
 
     def __upload_artifacts(self):
         """
@@ -350,24 +366,29 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
         else:
             suffix = ''
         artifacts_zip = "artifacts%s.zip" % suffix
-        mfile, zip_listing = self.__get_jtls_and_more()
-        self.log.info("Uploading all artifacts as %s ...", artifacts_zip)
-        self._session.upload_file(artifacts_zip, mfile.getvalue())
-        self._session.upload_file(artifacts_zip + '.tail.bz', self.__format_listing(zip_listing))
-
-        handlers = self.engine.log.parent.handlers
-        for handler in handlers:
-            if isinstance(handler, logging.FileHandler):
-                fname = handler.baseFilename
-                self.log.info("Uploading %s", fname)
-                fhead, ftail = os.path.splitext(os.path.split(fname)[-1])
-                modified_name = fhead + suffix + ftail
-                with open(fname, 'rb') as _file:
-                    self._session.upload_file(modified_name, _file.read())
-                    _file.seek(-4096, 2)
-                    tail = _file.read()
-                    tail = tail[tail.index(b("\n")) + 1:]
-                    self._session.upload_file(modified_name + ".tail.bz", tail)
+        zip_path, zip_listing = self.__get_jtls_and_more()
+        try:
+            self.log.info("Uploading all artifacts as %s ...", artifacts_zip)
+            uploads = [(artifacts_zip, None, zip_path), (artifacts_zip + '.tail.bz', self.__format_listing(zip_listing))]
+
+            handlers = self.engine.log.parent.handlers
+            for handler in handlers:
+                if isinstance(handler, logging.FileHandler):
+                    fname = handler.baseFilename
+                    self.log.info("Uploading %s", fname)
+                    fhead, ftail = os.path.splitext(os.path.split(fname)[-1])
+                    modified_name = fhead + suffix + ftail
+                    uploads.append((modified_name, None, fname))
+                    with open(fname, 'rb') as _file:
+                        _file.seek(-4096, 2)
+                        tail = _file.read()
+                        tail = tail[tail.index(b("\n")) + 1:]
+                        uploads.append((modified_name + ".tail.bz", tail))
+
+            for args in uploads:
+                self._session.upload_file(*args)
+        finally:
+            os.remove(zip_path)
 
     def post_process(self):
         """
@@ -377,12 +398,17 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
             self.log.debug("No feeding session obtained, nothing to finalize")
             return
 
+        if self.sender:
+            self.kpi_buffer = self.sender.stop() + self.kpi_buffer
+            self.log.debug("Background sending stats: %s", self.sender.get_stats())
+
         self.log.debug("KPI bulk buffer len in post-proc: %s", len(self.kpi_buffer))
         try:
             self.log.info("Sending remaining KPI data to server...")
             if self.send_data:
                 self.__send_data(self.kpi_buffer, False, True)
                 self.kpi_buffer = []
+                self.log.debug("KPI serialization stats: %s", dict(self._dpoint_serializer.stats))
 
             if self.send_monitoring:
                 self.__send_monitoring()
@@ -464,26 +490,45 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
         Send data if any in buffer
         """
         self.log.debug("KPI bulk buffer len: %s", len(self.kpi_buffer))
+        if self.sender:
+            self.sender.check()
+
         if self.last_dispatch < (time.time() - self.send_interval):
             self.last_dispatch = time.time()
-            if self.send_data and len(self.kpi_buffer):
-                self.__send_data(self.kpi_buffer)
-                self.kpi_buffer = []
+            if self.sender:
+                self.__dispatch_async()
+            else:
+                if self.send_data and len(self.kpi_buffer):
+                    self.__send_data(self.kpi_buffer)
+                    self.kpi_buffer = []
 
-            if self.send_monitoring:
-                self.__send_monitoring()
+                if self.send_monitoring:
+                    self.__send_monitoring()
         return super(BlazeMeterUploader, self).check()
 
+    def __dispatch_async(self):
+        if self.send_data and len(self.kpi_buffer):
+            self.sender.put_kpi(self.kpi_buffer)
+            self.kpi_buffer = []
+
+        if self.send_monitoring:
+            self.sender.put_monitoring(self.monitoring_buffer.get_monitoring_json(self._session))
+
+        self.log.debug("Background sending stats: %s", self.sender.get_stats())
+
     @send_with_retry
     def __send_data(self, data, do_check=True, is_final=False):
         """
         :type data: list[bzt.modules.aggregator.DataPoint]
         """
+        self._send_kpi(data, do_check, is_final)
+
+    def _send_kpi(self, data, do_check=True, is_final=False):
         if not self._session:
             return
 
         serialized = self._dpoint_serializer.get_kpi_body(data, is_final)
-        self._session.send_kpi_data(serialized, do_check)
+        self._session.send_kpi_data(serialized, do_check, compress=self.send_gzip)
 
     def aggregated_second(self, data):
         """
@@ -499,10 +544,12 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
 
     @send_with_retry
     def __send_monitoring(self):
+        self._send_monitoring(self.monitoring_buffer.get_monitoring_json(self._session))
+
+    def _send_monitoring(self, data):
         engine_id = self.engine.config.get('modules').get('shellexec').get('env').get('TAURUS_INDEX_ALL', '')
         if not engine_id:
             engine_id = "0"
-        data = self.monitoring_buffer.get_monitoring_json(self._session)
         self._session.send_monitoring_data(engine_id, data)
 
     def __format_listing(self, zip_listing):
@@ -515,49 +562,233 @@ class BlazeMeterUploader(Reporter, AggregatorListener, MonitoringListener, Singl
         return "\n".join(lines)
 
 
-class MonitoringBuffer(object):
-    def __init__(self, size_limit, parent_log):
-        self.size_limit = size_limit
-        self.data = defaultdict(OrderedDict)
+class AsyncSender(object):
+    """
+    Sends KPI and monitoring data in background thread, so slow or failing network doesn't block engine loop.
+    All queued datapoints are coalesced into single request, monitoring data is replaced with latest.
+    Queue is limited by number of datapoints, oldest ones are dropped on overflow.
+    Failed sending is retried with exponential backoff, up to `max_backoff` seconds.
+    Exception other than network problem (e.g. test stop from Web UI) stops sending and is raised by `check`.
+    Queued datapoints are copies, so sending thread doesn't share KPISets with aggregator and other listeners.
+    """
+
+    def __init__(self, send_kpi, send_monitoring, queue_limit, max_backoff, parent_log):
+        super(AsyncSender, self).__init__()
         self.log = parent_log.getChild(self.__class__.__name__)
-        # data :: dict(datasource -> dict(interval -> datapoint))
-        # datapoint :: dict(metric -> value)
+        self.send_kpi = send_kpi
+        self.send_monitoring = send_monitoring
+        self.queue_limit = queue_limit
+        self.max_backoff = max_backoff
+        self.kpi_queue = []
+        self.monitoring = None
+        self.backoff = 0
+        self.error = None
+        self.stopping = False
+        self.stats = Counter()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=self.__class__.__name__)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def put_kpi(self, datapoints):
+        datapoints = [self.__freeze(point) for point in datapoints]
+        with self.condition:
+            self.__enqueue(datapoints)
+            self.condition.notify()
 
-    def record_data(self, data):
-        for monitoring_item in data:
-            item = copy.deepcopy(monitoring_item)
-            source = item.pop('source')
-            timestamp = int(item['ts'])
-            item['interval'] = 1
-            buff = self.data[source]
-            if timestamp in buff:
-                buff[timestamp].update(item)
+    @staticmethod
+    def __freeze(datapoint):
+        """
+        Copy datapoint for sending, stats are calculated here so copies don't need to read histograms later
+
+        :type datapoint: bzt.modules.aggregator.DataPoint
+        :rtype: bzt.modules.aggregator.DataPoint
+        """
+        frozen = DataPoint(datapoint[DataPoint.TIMESTAMP], datapoint.perc_levels)
+        frozen[DataPoint.SOURCE_ID] = datapoint[DataPoint.SOURCE_ID]
+        for key in (DataPoint.CURRENT, DataPoint.CUMULATIVE):
+            for label, kpiset in iteritems(datapoint[key]):
+                kpiset.get(KPISet.PERCENTILES)  # lazy stats are calculated and kept by copy
+                kpiset.get(KPISet.STDEV_RESP_TIME)
+                frozen[key][label] = kpiset.snapshot()
+        return frozen
+
+    def put_monitoring(self, data):
+        with self.condition:
+            self.monitoring = data
+            self.condition.notify()
+
+    def __enqueue(self, datapoints, old=False):
+        if old:
+            self.kpi_queue = datapoints + self.kpi_queue
+        else:
+            self.kpi_queue.extend(datapoints)
+
+        overflow = len(self.kpi_queue) - self.queue_limit
+        if overflow > 0:
+            if not self.stats["dropped"]:
+                self.log.warning("Sending queue limit reached (%s datapoints), dropping oldest data", self.queue_limit)
+            self.stats["dropped"] += overflow
+            self.kpi_queue = self.kpi_queue[overflow:]
+
+    def check(self):
+        """
+        Raise exception that stopped sending, if any
+        """
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats.update(queued=len(self.kpi_queue), backoff=self.backoff)
+        return stats
+
+    def stop(self):
+        """
+        Stop sending and return unsent datapoints, request in progress is waited for
+        and its datapoints are returned if it fails
+
+        :rtype: list[bzt.modules.aggregator.DataPoint]
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+        while self.thread.is_alive():  # request in progress is limited by client timeout
+            self.thread.join(self.max_backoff)
+            if self.thread.is_alive():
+                self.log.debug("Waiting for sending in progress to finish...")
+
+        with self.condition:
+            unsent, self.kpi_queue = self.kpi_queue, []
+        return unsent
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.stopping and not self.kpi_queue and self.monitoring is None:
+                    self.condition.wait()
+
+                if self.stopping:
+                    return
+
+                datapoints, self.kpi_queue = self.kpi_queue, []
+                monitoring, self.monitoring = self.monitoring, None
+
+            try:
+                self.__send(datapoints, monitoring)
+            except NETWORK_PROBLEMS:
+                self.log.debug("Error sending data: %s", traceback.format_exc())
+                with self.condition:
+                    self.stats["failures"] += 1
+                    self.__enqueue(datapoints, old=True)
+                    if self.monitoring is None:
+                        self.monitoring = monitoring
+
+                    self.backoff = min(max(2 * self.backoff, 1), self.max_backoff)
+                    self.log.warning("Failed to send data, will retry in %s sec...", self.backoff)
+                    if not self.stopping:
+                        self.condition.wait(self.backoff)
+            except BaseException as exc:
+                self.log.debug("Sending stopped: %s", traceback.format_exc())
+                self.error = exc
+                return
             else:
-                buff[timestamp] = item
+                self.backoff = 0
 
-        sources = list(self.data)
-        for source in sources:
-            if len(self.data[source]) > self.size_limit:
-                self._downsample(self.data[source])
-            self.log.debug("Monitoring buffer size '%s': %s", source, len(self.data[source]))
+    def __send(self, datapoints, monitoring):
+        if datapoints:
+            self.send_kpi(datapoints)
+            self.stats["sent"] += len(datapoints)
+            self.stats["requests"] += 1
+            datapoints[:] = []  # don't resend them if monitoring fails
 
-    def _downsample(self, buff):
-        size = 1
-        while len(buff) > self.size_limit:
-            self._merge_small_intervals(buff, size)
-            size += 1
-
-    def _merge_small_intervals(self, buff, size):
-        timestamps = list(buff)
-        merged_already = set()
-        for left, right in zip(timestamps, timestamps[1:]):
-            if left in merged_already:
-                continue
-            if buff[left]['interval'] <= size:
-                self._merge_datapoints(buff[left], buff[right])
-                buff.pop(right)
-                merged_already.add(left)
-                merged_already.add(right)
+        if monitoring is not None:
+            self.send_monitoring(monitoring)
+
+
+class MonitoringSeries(object):
+    """
+    Datapoints of single monitoring source, downsampled to fit into size limit, like RRD archive.
+
+    Datapoints are kept in three rings, from the oldest to the newest: merged ones of about `2 * resolution`
+    interval, ones of about `resolution` and the recent ones of smaller interval. On overflow recent
+    datapoints are merged together, or two oldest datapoints of `resolution`, and resolution is doubled
+    once all of them are merged. So each insert takes O(1) amortized time, and buffer keeps uniform
+    resolution along the whole time range.
+    """
+
+    def __init__(self, size_limit):
+        self.size_limit = size_limit
+        self.merged = deque()
+        self.complete = deque()
+        self.recent = deque()
+        self.index = {}  # timestamp -> datapoint
+        self.resolution = 1
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return (timestamp for timestamp, _ in self.iteritems())
+
+    def __contains__(self, timestamp):
+        return timestamp in self.index
+
+    def __getitem__(self, timestamp):
+        return self.index[timestamp]
+
+    def iteritems(self):
+        return itertools.chain(self.merged, self.complete, self.recent)
+
+    def itervalues(self):
+        return (datapoint for _, datapoint in self.iteritems())
+
+    items = viewitems = iteritems
+    values = viewvalues = itervalues
+
+    def add(self, timestamp, datapoint):
+        if timestamp in self.index:
+            datapoint.pop('interval', None)
+            self.index[timestamp].update(datapoint)
+            return
+
+        if len(self.index) >= self.size_limit:
+            self._merge()
+
+        datapoint['interval'] = 1
+        self.index[timestamp] = datapoint
+        self.recent.append((timestamp, datapoint))
+        self.__complete_recent()
+
+    def _merge(self):
+        if len(self.recent) < 2 and len(self.complete) < 2 and self.merged:
+            # all complete datapoints are merged, make merged ones complete and lower resolution
+            self.resolution *= 2
+            self.recent.extendleft(reversed(self.complete))
+            self.complete, self.merged = self.merged, deque()
+
+        if len(self.recent) > 1:
+            left, right = self.recent.popleft(), self.recent.popleft()
+            self.recent.appendleft(self.__merge_pair(left, right))
+        elif len(self.complete) > 1:
+            left, right = self.complete.popleft(), self.complete.popleft()
+            self.merged.append(self.__merge_pair(left, right))
+        elif self.complete and self.recent:  # tiny size limit
+            self.__merge_pair(self.complete[-1], self.recent.popleft())
+
+    def __complete_recent(self):
+        while self.recent and self.recent[0][1]['interval'] >= self.resolution:
+            self.complete.append(self.recent.popleft())
+
+    def __merge_pair(self, left, right):
+        self._merge_datapoints(left[1], right[1])
+        self.index.pop(right[0])
+        return left
 
     @staticmethod
     def _merge_datapoints(left, right):
@@ -571,6 +802,24 @@ class MonitoringBuffer(object):
                 left[metric] = right[metric]
         left['interval'] = sum_size
 
+
+class MonitoringBuffer(object):
+    def __init__(self, size_limit, parent_log):
+        self.size_limit = size_limit
+        self.data = defaultdict(lambda: MonitoringSeries(self.size_limit))
+        self.log = parent_log.getChild(self.__class__.__name__)
+        # data :: dict(datasource -> MonitoringSeries(interval -> datapoint))
+        # datapoint :: dict(metric -> value)
+
+    def record_data(self, data):
+        for monitoring_item in data:
+            item = dict(monitoring_item)
+            source = item.pop('source')
+            self.data[source].add(int(item['ts']), item)
+
+        for source in self.data:
+            self.log.debug("Monitoring buffer size '%s': %s", source, len(self.data[source]))
+
     def get_monitoring_json(self, session):
         """
         :type session: Session
@@ -658,6 +907,9 @@ class DatapointSerializer(object):
         super(DatapointSerializer, self).__init__()
         self.owner = owner
         self.multi = 1000  # miltiplier factor for reporting
+        self.incremental = False  # send only labels that have changed since previous send
+        self.compact = False  # serialize without indentation and spaces
+        self.stats = Counter()
 
     def get_kpi_body(self, data_buffer, is_final):
         # - reporting format:
@@ -669,13 +921,25 @@ class DatapointSerializer(object):
         #
         # - elements of 'intervals' are described in __get_interval()
         #   every interval contains info about response codes have gotten on it.
+        #
+        # - in incremental mode, only labels that got samples since previous send are reported,
+        #   final report contains all labels
+        start = time.time()
         report_items = BetterDict()
         if data_buffer:
             self.owner.first_ts = min(self.owner.first_ts, data_buffer[0][DataPoint.TIMESTAMP])
             self.owner.last_ts = max(self.owner.last_ts, data_buffer[-1][DataPoint.TIMESTAMP])
 
+            changed = None
+            if self.incremental and not is_final:
+                changed = set()
+                for dpoint in data_buffer:
+                    changed.update(dpoint[DataPoint.CURRENT])
+
             # following data is received in the cumulative way
             for label, kpi_set in iteritems(data_buffer[-1][DataPoint.CUMULATIVE]):
+                if changed is not None and label not in changed:
+                    continue
                 report_item = self.__get_label(label, kpi_set)
                 self.__add_errors(report_item, kpi_set)  # 'Errors' tab
                 report_items[label] = report_item
@@ -694,7 +958,15 @@ class DatapointSerializer(object):
         if is_final:
             data['final'] = True
 
-        return to_json(data)
+        body = to_json(data, indent=None) if self.compact else to_json(data)
+        build_time = time.time() - start
+        self.stats["payloads"] += 1
+        self.stats["labels"] += len(report_items)
+        self.stats["bytes"] += len(body)
+        self.stats["build_time"] += build_time
+        self.owner.log.debug("KPI payload: %s labels, %s bytes, built in %.3fs", len(report_items), len(body),
+                             build_time)
+        return body
 
     @staticmethod
     def __add_errors(report_item, kpi_set):
@@ -776,10 +1048,13 @@ class DatapointSerializer(object):
         #   {'n': <number of code encounters>,
         #    'f': <number of failed request (e.q. important for assertions)>
         #    'rc': <string value of response code>}
+        fails = {}
+        for err in item[KPISet.ERRORS]:
+            fails.setdefault(str(err['rc']), []).append(err['cnt'])
+
         rc_list = []
         for r_code, cnt in iteritems(item[KPISet.RESP_CODES]):
-            fails = [err['cnt'] for err in item[KPISet.ERRORS] if str(err['rc']) == r_code]
-            rc_list.append({"n": cnt, 'f': fails, "rc": r_code})
+            rc_list.append({"n": cnt, 'f': fails.get(r_code, []), "rc": r_code})
 
         return {
             "ec": item[KPISet.FAILURES],
@@ -34,7 +34,7 @@ class NUnitExecutor(SubprocessedExecutor, HavingInstallableTools):
 
         self.mono = self._get_tool(Mono)
         self.log.debug("Checking for Mono")
-        if not self.mono.check_if_installed():
+        if not self.mono.is_installed():
             self.mono.install()
 
     def prepare(self):
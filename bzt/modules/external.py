@@ -1,22 +1,23 @@
 import os
 import re
 import time
-from glob import glob
+from glob import glob, has_magic
 
 from bzt import TaurusInternalException
 from bzt.engine import ScenarioExecutor
 from bzt.modules.ab import TSVDataReader
-from bzt.modules.aggregator import AggregatorListener, ConsolidatingAggregator, DataPoint
+from bzt.modules.aggregator import AggregatorListener, ConsolidatingAggregator, DataPoint, ChunkedResultsReader
 from bzt.modules.gatling import DataLogReader as GatlingLogReader
 from bzt.modules.grinder import DataLogReader as GrinderLogReader
 from bzt.modules.jmeter import JTLReader, XMLJTLReader
 from bzt.modules.pbench import PBenchKPIReader
-from bzt.utils import dehumanize_time
+from bzt.utils import dehumanize_time, FileReader, is_windows
 
 
 class ExternalResultsLoader(ScenarioExecutor, AggregatorListener):
     AB_HEADER = "starttime\tseconds\tctime\tdtime\tttime\twait"
     PBENCH_FORMAT = re.compile("^[0-9]+\.[0-9]{3}\t[^\t]*\t([0-9]+\t){9}[0-9]+$")
+    BULK_READERS = (JTLReader, TSVDataReader)  # formats without state carried between lines
 
     def __init__(self):
         # TODO: document this executor
@@ -30,6 +31,9 @@ class ExternalResultsLoader(ScenarioExecutor, AggregatorListener):
         self._last_ts = -1
         self._prev_ts = -1
         self._file_check_ts = time.time()
+        self.bulk = False
+        self.bulk_processes = None
+        self.bulk_chunk_size = 16 * 1024 * 1024
 
     def prepare(self):
         self.data_file = self.execution.get("data-file", self.data_file)
@@ -46,6 +50,14 @@ class ExternalResultsLoader(ScenarioExecutor, AggregatorListener):
         str_to = self.execution.get("results-timeout", self.settings.get("results-timeout", self._result_timeout))
         self._result_timeout = dehumanize_time(str_to)
 
+        self.bulk = self.execution.get("bulk", self.settings.get("bulk", self.bulk))
+        self.bulk_processes = self.execution.get("bulk-processes", self.settings.get("bulk-processes", None))
+        self.bulk_chunk_size = self.execution.get("bulk-chunk-size", self.settings.get("bulk-chunk-size",
+                                                                                       self.bulk_chunk_size))
+        if self.bulk and is_windows():
+            self.log.warning("Bulk reading isn't supported on Windows, results will be read sequentially")
+            self.bulk = False
+
         self._file_check_ts = time.time()
         self._try_make_reader()
 
@@ -54,6 +66,9 @@ class ExternalResultsLoader(ScenarioExecutor, AggregatorListener):
             return
 
         if not self.data_file:
+            if not self._is_pattern_changed():
+                return
+
             files = glob(self._data_file_pattern)
             if not files:
                 return
@@ -75,11 +90,20 @@ class ExternalResultsLoader(ScenarioExecutor, AggregatorListener):
         self.log.info("Will load external results from file: %s", self.data_file)
         self.label = self.data_file
 
-        self.reader = self._get_reader()
+        self.reader = self._get_bulk_reader() if self.bulk else self._get_reader()
         if isinstance(self.engine.aggregator, ConsolidatingAggregator):
             self.engine.aggregator.add_underling(self.reader)
             self.engine.aggregator.add_listener(self)
 
+    def _is_pattern_changed(self):
+        """ re-glob only when directory of pattern got new entries, if file events are available """
+        directory = os.path.dirname(os.path.abspath(self._data_file_pattern))
+        if not FileReader.watcher or has_magic(directory):
+            return True
+
+        FileReader.watcher.follow_dir(directory)
+        return FileReader.watcher.pop_dir_changed(directory)
+
     def _get_reader(self):
         with open(self.data_file) as fhd:
             header = fhd.readline(2048).strip()  # just header chunk of file
@@ -104,6 +128,42 @@ class ExternalResultsLoader(ScenarioExecutor, AggregatorListener):
             self.log.info("Header line was: %s", header)
             raise TaurusInternalException("Unable to detect results format for: %s" % self.data_file)
 
+    def _get_bulk_reader(self):
+        """
+        Read complete results file in chunks by pool of processes, if its format allows that
+        """
+        reader = self._get_reader()
+        if not isinstance(reader, self.BULK_READERS) or isinstance(reader, XMLJTLReader) or \
+                (isinstance(reader, JTLReader) and self.errors_file):  # errors.jtl can't be split in sync
+            self.log.warning("Bulk reading isn't supported for %s, reading it sequentially", self.data_file)
+            return reader
+
+        with open(self.data_file, 'rb') as fds:
+            header_end = len(fds.readline())
+
+        chunks = ChunkedResultsReader.split_file(self.data_file, self.bulk_chunk_size, header_end)
+        factory = lambda start, end: self._get_chunk_reader(header_end, start, end)
+        return ChunkedResultsReader(chunks, factory, self.bulk_processes)
+
+    def _get_chunk_reader(self, header_end, start, end):
+        """
+        Make reader for range of lines, header line is passed to reader first to set up parsing
+        """
+        reader = self._get_reader()
+        if isinstance(reader, JTLReader):
+            reader.columnar = True
+            file_reader = reader.csvreader.file
+        else:
+            file_reader = reader.file
+
+        if header_end:
+            file_reader.limit = header_end
+            list(reader.datapoints(final_pass=True))
+
+        file_reader.offset = start
+        file_reader.limit = end
+        return reader
+
     def aggregated_second(self, data):
         self._last_ts = data[DataPoint.TIMESTAMP]
 
@@ -113,6 +173,9 @@ class ExternalResultsLoader(ScenarioExecutor, AggregatorListener):
 
     def check(self):
         self._try_make_reader()
+        if isinstance(self.reader, ChunkedResultsReader):
+            return self.reader.is_complete()
+
         if self._last_ts > 0 and self._last_ts == self._prev_ts and time.time() - self._last_ts > self._result_timeout:
             return True
         else:
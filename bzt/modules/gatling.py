@@ -470,7 +470,7 @@ class GatlingExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstal
         required_tools = [self._get_tool(TclLibrary), self._get_tool(JavaVM), self.tool]
 
         for tool in required_tools:
-            if not tool.check_if_installed():
+            if not tool.is_installed():
                 tool.install()
 
     def get_widget(self):
@@ -222,7 +222,7 @@ class GrinderExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstal
                           grinder]
 
         for tool in required_tools:
-            if not tool.check_if_installed():
+            if not tool.is_installed():
                 tool.install()
 
     def get_widget(self):
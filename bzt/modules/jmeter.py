@@ -19,9 +19,16 @@ import codecs
 import copy
 import csv
 import fnmatch
+import gc
+import hashlib
+import heapq
+import json
+import mmap
 import os
 import re
+import shutil
 import socket
+import struct
 import tempfile
 import time
 import traceback
@@ -29,13 +36,15 @@ from collections import Counter, namedtuple
 from distutils.version import LooseVersion
 from itertools import dropwhile
 
+import numpy
 from cssselect import GenericTranslator
 
-from bzt import TaurusConfigError, ToolError, TaurusInternalException, TaurusNetworkError
+from bzt import TaurusConfigError, ToolError, TaurusInternalException, TaurusNetworkError, VERSION
 from bzt.engine import ScenarioExecutor, Scenario, FileLister, HavingInstallableTools
 from bzt.engine import SelfDiagnosable, SETTINGS
 from bzt.jmx import JMX, JMeterScenarioBuilder, LoadSettingsProcessor, try_convert
-from bzt.modules.aggregator import ConsolidatingAggregator, ResultsReader, DataPoint, KPISet
+from bzt.modules.aggregator import ConsolidatingAggregator, ResultsReader, DataPoint, KPISet, SamplesBatch
+from bzt.modules.aggregator import ErrorsList
 from bzt.modules.console import WidgetProvider, ExecutorWidget
 from bzt.modules.functional import FunctionalAggregator, FunctionalResultsReader, FunctionalSample
 from bzt.modules.provisioning import Local
@@ -44,7 +53,8 @@ from bzt.requests_model import ResourceFilesCollector, has_variable_pattern, Hie
 from bzt.six import iteritems, string_types, StringIO, etree, numeric_types, PY2, unicode_decode
 from bzt.utils import get_full_path, EXE_SUFFIX, MirrorsManager, ExceptionalDownloader, get_uniq_name, is_windows
 from bzt.utils import BetterDict, guess_csv_dialect, dehumanize_time, FileReader, CALL_PROBLEMS
-from bzt.utils import unzip, RequiredTool, JavaVM, shutdown_process, ProgressBarContext, TclLibrary
+from bzt.utils import unzip, RequiredTool, JavaVM, shutdown_process, ProgressBarContext, TclLibrary, RESOURCES_DIR
+from bzt.utils import FilesCache, to_json
 
 
 def get_child_assertion(element):
@@ -100,6 +110,7 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
         self.properties_file = None
         self.sys_properties_file = None
         self.kpi_jtl = None
+        self.kpi_format = "csv"
         self.log_jtl = None
         self.process = None
         self.end_time = None
@@ -256,6 +267,11 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
         self.jmeter_log = self.engine.create_artifact("jmeter", ".log")
         self._set_remote_port()
         self.distributed_servers = self.execution.get('distributed', self.distributed_servers)
+        self.kpi_format = self.settings.get("kpi-format", self.kpi_format)
+        if self.kpi_format == "binary" and self.distributed_servers:
+            # JSR223 listener runs on remote engines, only result collectors get samples on controller
+            self.log.warning("Binary KPI format isn't supported in distributed mode, CSV is used instead")
+            self.kpi_format = "csv"
 
         is_jmx_generated = False
 
@@ -300,10 +316,17 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
             err_msg_separator = self.settings.get("error-message-separator")
             self.reader = JTLReader(self.kpi_jtl, self.log, self.log_jtl, err_msg_separator)
             self.reader.is_distributed = len(self.distributed_servers) > 0
+            self.reader.columnar = self.settings.get("jtl-reader", "rows") == "columnar"
+            if self.kpi_format == "binary":
+                self.reader.binreader = BinaryKPIReader(self.log, self.kpi_jtl)
+            if self.reader.errors_reader:
+                self.__configure_errors_reader(self.reader.errors_reader)
             assert isinstance(self.reader, JTLReader)
             self.engine.aggregator.add_underling(self.reader)
         elif isinstance(self.engine.aggregator, FunctionalAggregator):
             self.reader = FuncJTLReader(self.log_jtl, self.engine, self.log)
+            self.reader.streaming = self.settings.get("trace-streaming-parsing", self.reader.streaming)
+            self.reader.body_limit = int(self.settings.get("trace-body-inline-limit", self.reader.body_limit))
             self.reader.is_distributed = len(self.distributed_servers) > 0
             self.reader.executor_label = self.label
             self.engine.aggregator.add_underling(self.reader)
@@ -428,6 +451,10 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
 
     def post_process(self):
         self.engine.existing_artifact(self.modified_jmx, True)
+        if isinstance(self.reader, JTLReader) and self.reader.binreader and self.settings.get("kpi-binary-to-csv"):
+            kpi_csv = self.engine.create_artifact("kpi", ".jtl")
+            self.log.debug("Converting binary KPI file into %s", kpi_csv)
+            self.reader.binreader.to_csv(kpi_csv)
         super(JMeterExecutor, self).post_process()
 
     def has_results(self):
@@ -536,14 +563,27 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
         log_lst = jmx.new_xml_listener(self.log_jtl, True, flags)
         self.__add_listener(log_lst, jmx)
 
+    def __configure_errors_reader(self, errors_reader):
+        errors_reader.lean = self.settings.get("errors-lean-parsing", errors_reader.lean)
+        errors_reader.buffer_limit = int(self.settings.get("errors-buffer-limit", errors_reader.buffer_limit))
+        errors_reader.eviction = self.settings.get("errors-buffer-eviction", errors_reader.eviction)
+        if errors_reader.eviction not in JTLErrorsReader.EVICTION_POLICIES:
+            raise TaurusConfigError("JMeter: unsupported errors-buffer-eviction '%s', choose one of: %s" % (
+                errors_reader.eviction, ", ".join(JTLErrorsReader.EVICTION_POLICIES)))
+
     def __add_result_writers(self, jmx):
         version = LooseVersion(self.tool.version)
         flags = {}
         if version < LooseVersion("2.13"):
             flags['^connectTime'] = False
 
-        self.kpi_jtl = self.engine.create_artifact("kpi", ".jtl")
-        kpi_lst = jmx.new_kpi_listener(self.kpi_jtl, flags)
+        if self.kpi_format == "binary":
+            self.kpi_jtl = self.engine.create_artifact("kpi", ".bjtl")
+            script = os.path.join(RESOURCES_DIR, "binary-kpi-writer.groovy")
+            kpi_lst = jmx.new_binary_kpi_listener(self.kpi_jtl, script)
+        else:
+            self.kpi_jtl = self.engine.create_artifact("kpi", ".jtl")
+            kpi_lst = jmx.new_kpi_listener(self.kpi_jtl, flags)
         self.__add_listener(kpi_lst, jmx)
 
         verbose = self.engine.config.get(SETTINGS).get("verbose", False)
@@ -575,6 +615,7 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
         """
         self.log.debug("Load: %s", self.get_specific_load())
         jmx = JMX(original)
+        jmx.build_index()
 
         if self.get_scenario().get("disable-listeners", not self.settings.get("gui", False)):
             JMeterExecutor.__disable_listeners(jmx)
@@ -610,7 +651,9 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
             name = "CookieManager.implementation"
             if not node.get(name):
                 val = "org.apache.jmeter.protocol.http.control.HC4CookieHandler"
-                node.append(JMX._string_prop(name, val))
+                prop = JMX._string_prop(name, val)
+                node.append(prop)
+                jmx.invalidate(prop)
                 fix_counter += 1
         if fix_counter:
             self.log.info('%s obsolete CookieManagers are found and fixed' % fix_counter)
@@ -632,11 +675,63 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
         :return:
         """
         filename = self.engine.create_artifact("requests", ".jmx")
+        cache, key = self.__get_compile_cache()
+        entry = cache.get(key) if cache else None
+        if entry:
+            self.log.debug("Using JMX compiled before: %s", entry)
+            shutil.copy(os.path.join(entry, "requests.jmx"), filename)
+            with open(os.path.join(entry, "system-props.json")) as fds:
+                self.settings.merge(json.load(fds))
+            return filename
+
         jmx = JMeterScenarioBuilder(self)
         jmx.save(filename)
         self.settings.merge(jmx.system_props)
+
+        if cache:
+            with open(filename, "rb") as fds:
+                content = fds.read()
+            cache.put(key, {"requests.jmx": content, "system-props.json": to_json(jmx.system_props).encode()})
+
         return filename
 
+    def __get_compile_cache(self):
+        """
+        Cache of JMX compiled from requests, key covers everything compilation depends on:
+        scenarios, executor settings, Taurus version and files that are read while compiling
+        :return: cache and key, cache is None if compilation result can't be reused
+        """
+        cache_dir = self.settings.get("compile-cache", None)
+        if not cache_dir:
+            return None, None
+
+        files = []
+        for path in self.res_files_from_scenario(self.get_scenario()):
+            if path.lower().startswith("http://") or path.lower().startswith("https://"):
+                return None, None  # downloaded into artifacts on each run
+
+            if not has_variable_pattern(path):
+                full_path = self.engine.find_file(path)
+                try:
+                    stat = os.stat(full_path)
+                    files.append([full_path, stat.st_mtime, stat.st_size])
+                except OSError:
+                    files.append([full_path, None, None])
+
+        inputs = {
+            "version": VERSION,
+            "label": self.label,
+            "scenarios": self.engine.config.get("scenarios"),
+            "settings": self.settings,
+            "cwd": os.getcwd(),
+            "search-paths": self.engine.file_search_paths,
+            "files": files}
+
+        max_size = int(self.settings.get("compile-cache-size", 100 * 1024 * 1024))
+        max_age = dehumanize_time(self.settings.get("compile-cache-age", "7d"))
+        cache = FilesCache(cache_dir, max_size, max_age, self.log)
+        return cache, cache.get_key(inputs)
+
     @staticmethod
     def __write_props_to_file(file_path, params):
         """
@@ -825,7 +920,7 @@ class JMeterExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
 
         required_tools = [self._get_tool(JavaVM), self._get_tool(TclLibrary), self.tool]
         for tool in required_tools:
-            if not tool.check_if_installed():
+            if not tool.is_installed():
                 tool.install()
 
         self.settings['path'] = self.tool.tool_path
@@ -872,6 +967,8 @@ class JTLReader(ResultsReader):
         self.log = parent_logger.getChild(self.__class__.__name__)
         self.csvreader = IncrementalCSVReader(self.log, filename)
         self.read_records = 0
+        self.columnar = False
+        self.binreader = None  # type: BinaryKPIReader
         if errors_filename:
             self.errors_reader = JTLErrorsReader(errors_filename, parent_logger, err_msg_separator)
         else:
@@ -886,37 +983,166 @@ class JTLReader(ResultsReader):
         if self.errors_reader:
             self.errors_reader.read_file(last_pass)
 
-        for row in self.csvreader.read(last_pass):
-            label = unicode_decode(row["label"])
+        if self.binreader:
+            batch = self._read_binary_batch(last_pass)
+            if batch is not None:
+                yield batch
+            return
+
+        if self.columnar:
+            batch = self._read_batch(last_pass)
+            if batch is not None:
+                yield batch
+            return
+
+        rows = self.csvreader.read(last_pass)
+        if not rows:
+            return
+
+        fields = self.csvreader.indexes
+        timestamp, elapsed, latency = fields["timeStamp"], fields["elapsed"], fields["Latency"]
+        label_idx, code_idx, success_idx, message_idx = (fields["label"], fields["responseCode"],
+                                                         fields["success"], fields["responseMessage"])
+        connect, byte_idx = fields.get("Connect"), fields.get("bytes")
+        if self.is_distributed:
+            concur_idx, host_idx, thread_idx = fields["grpThreads"], fields["Hostname"], fields["threadName"]
+        else:
+            concur_idx = fields["allThreads"]
+
+        for row in rows:
+            label = unicode_decode(row[label_idx])
+            concur = int(row[concur_idx])
             if self.is_distributed:
-                concur = int(row["grpThreads"])
-                trname = row["Hostname"] + row["threadName"][:row["threadName"].rfind('-')]
+                thread = row[thread_idx]
+                trname = row[host_idx] + thread[:thread.rfind('-')]
             else:
-                concur = int(row["allThreads"])
                 trname = ''
 
-            rtm = int(row["elapsed"]) / 1000.0
-            ltc = int(row["Latency"]) / 1000.0
-            if "Connect" in row:
-                cnn = int(row["Connect"]) / 1000.0
+            rtm = int(row[elapsed]) / 1000.0
+            ltc = int(row[latency]) / 1000.0
+            if connect is not None:
+                cnn = int(row[connect]) / 1000.0
             else:
                 cnn = None
 
-            rcd = row["responseCode"]
+            rcd = row[code_idx]
             if rcd.endswith('Exception'):
                 rcd = rcd.split('.')[-1]
 
-            if row["success"] != "true":
-                error = row["responseMessage"]
+            if row[success_idx] != "true":
+                error = row[message_idx]
             else:
                 error = None
 
-            byte_count = int(row.get("bytes", 0))
+            byte_count = int(row[byte_idx]) if byte_idx is not None else 0
 
-            tstmp = int(int(row["timeStamp"]) / 1000.0)
+            tstmp = int(int(row[timestamp]) / 1000.0)
             self.read_records += 1
             yield tstmp, label, concur, rtm, cnn, ltc, rcd, error, trname, byte_count
 
+    def _read_batch(self, last_pass=False):
+        """
+        Read next portion of data as single columnar batch, doing all conversions on whole columns
+
+        :type last_pass: bool
+        :rtype: SamplesBatch
+        """
+        columns = self.csvreader.read_columns(last_pass)
+        if not columns:
+            return None
+
+        def as_ints(name):
+            return numpy.array(columns[name], dtype=numpy.int64)
+
+        count = len(columns["timeStamp"])
+        timestamps = as_ints("timeStamp") // 1000
+        r_times = as_ints("elapsed") / 1000.0
+        latencies = as_ints("Latency") / 1000.0
+        if "Connect" in columns:
+            con_times = as_ints("Connect") / 1000.0
+        else:
+            con_times = numpy.zeros(count)
+
+        if "bytes" in columns:
+            byte_counts = as_ints("bytes")
+        else:
+            byte_counts = numpy.zeros(count, dtype=numpy.int64)
+
+        labels, label_ids = SamplesBatch.intern(columns["label"])
+        labels = [unicode_decode(label) for label in labels]
+
+        if self.is_distributed:
+            concurrencies = as_ints("grpThreads")
+            trnames, trname_ids = SamplesBatch.intern([
+                host + thread[:thread.rfind('-')] for host, thread in zip(columns["Hostname"], columns["threadName"])])
+        else:
+            concurrencies = as_ints("allThreads")
+            trnames, trname_ids = [''], numpy.zeros(count, dtype=numpy.int64)
+
+        r_codes, r_code_ids = SamplesBatch.intern(columns["responseCode"])
+        r_codes = [rcd.split('.')[-1] if rcd.endswith('Exception') else rcd for rcd in r_codes]
+
+        failed = numpy.array(columns["success"]) != "true"
+        messages, message_ids = SamplesBatch.intern(numpy.array(columns["responseMessage"], dtype=object)[failed])
+        error_ids = numpy.full(count, -1, dtype=numpy.int64)
+        error_ids[failed] = message_ids
+
+        self.read_records += count
+        return SamplesBatch(timestamps, labels, label_ids, concurrencies, r_times, con_times, latencies,
+                            r_codes, r_code_ids, messages, error_ids, trnames, trname_ids, byte_counts)
+
+    def _read_binary_batch(self, last_pass=False):
+        """
+        Read next portion of binary KPI file as columnar batch
+
+        :type last_pass: bool
+        :rtype: SamplesBatch
+        """
+        records = self.binreader.read(last_pass)
+        if records is None:
+            return None
+
+        strings = self.binreader.strings
+
+        def as_strings(ids):
+            table, ids = numpy.unique(ids, return_inverse=True)
+            return [strings[idx] for idx in table.tolist()], ids
+
+        count = len(records)
+        timestamps = records["timeStamp"] // 1000
+        r_times = records["elapsed"] / 1000.0
+        latencies = records["Latency"] / 1000.0
+        con_times = records["Connect"] / 1000.0
+        byte_counts = records["bytes"].astype(numpy.int64)
+
+        labels, label_ids = as_strings(records["label"])
+
+        if self.is_distributed:
+            concurrencies = records["grpThreads"].astype(numpy.int64)
+            threads, thread_ids = numpy.unique(
+                (records["Hostname"].astype(numpy.int64) << 32) | records["threadName"], return_inverse=True)
+            thread_groups = []
+            for thread in threads.tolist():
+                host, name = strings[thread >> 32], strings[thread & 0xFFFFFFFF]
+                thread_groups.append(host + name[:name.rfind('-')])
+            trnames, group_ids = SamplesBatch.intern(thread_groups)
+            trname_ids = group_ids[thread_ids]
+        else:
+            concurrencies = records["allThreads"].astype(numpy.int64)
+            trnames, trname_ids = [''], numpy.zeros(count, dtype=numpy.int64)
+
+        r_codes, r_code_ids = as_strings(records["responseCode"])
+        r_codes = [rcd.split('.')[-1] if rcd.endswith('Exception') else rcd for rcd in r_codes]
+
+        failed = records["success"] == 0
+        messages, message_ids = as_strings(records["responseMessage"][failed])
+        error_ids = numpy.full(count, -1, dtype=numpy.int64)
+        error_ids[failed] = message_ids
+
+        self.read_records += count
+        return SamplesBatch(timestamps, labels, label_ids, concurrencies, r_times, con_times, latencies,
+                            r_codes, r_code_ids, messages, error_ids, trnames, trname_ids, byte_counts)
+
     def _calculate_datapoints(self, final_pass=False):
         for point in super(JTLReader, self)._calculate_datapoints(final_pass):
             if self.errors_reader:
@@ -930,6 +1156,98 @@ class JTLReader(ResultsReader):
             yield point
 
 
+class TraceTreeBuilder(object):
+    """
+    Parser target that builds each sample of trace.jtl as separate tree. Request and response bodies of samples
+    that are longer than `body_limit` characters are streamed into artifact files while parsing, only their first
+    `body_limit` characters are kept in tree. Completed samples are collected into `elements`.
+    """
+    STREAMED_TAGS = {"queryString": "requestBody", "responseData": "responseBody"}
+    ARTIFACT_ATTR = "taurus-artifact"
+    SIZE_ATTR = "taurus-size"
+
+    def __init__(self, engine, body_limit):
+        self.engine = engine
+        self.body_limit = body_limit
+        self.elements = []
+        self.builder = None
+        self.depth = 0
+        self.body_depth = None
+        self.body_field = None  # extras field of body written into artifact, None for nested samples
+        self.body_chunks = []
+        self.body_kept = 0
+        self.body_size = 0
+        self.body_artifact = None
+        self.body_file = None
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if self.depth == 1:  # root element
+            return
+
+        if self.builder is None:
+            self.builder = etree.TreeBuilder()
+        self.builder.start(tag, attrib)
+
+        if tag in self.STREAMED_TAGS and self.depth >= 3:
+            self.body_depth = self.depth
+            self.body_field = self.STREAMED_TAGS[tag] if self.depth == 3 else None
+
+    def end(self, tag):
+        depth = self.depth
+        self.depth -= 1
+        if depth == 1:
+            return
+
+        if depth == self.body_depth:
+            self.builder.data("".join(self.body_chunks))
+            elem = self.builder.end(tag)
+            if self.body_file:
+                self.body_file.close()
+                elem.set(self.ARTIFACT_ATTR, self.body_artifact)
+                elem.set(self.SIZE_ATTR, str(self.body_size))
+            self.__reset_body()
+        else:
+            self.builder.end(tag)
+
+        if depth == 2:
+            self.elements.append(self.builder.close())
+            self.builder = None
+
+    def data(self, data):
+        if self.builder is None:  # whitespace between samples
+            return
+
+        if self.body_depth is None:
+            self.builder.data(data)
+            return
+
+        self.body_size += len(data)
+        if self.body_file:
+            self.body_file.write(data.encode('utf-8'))
+        elif self.body_field and self.body_size > self.body_limit:
+            self.body_artifact = self.engine.create_artifact("sample-%s" % self.body_field, ".bin")
+            self.body_file = open(self.body_artifact, 'wb')
+            self.body_file.write(("".join(self.body_chunks) + data).encode('utf-8'))
+
+        if self.body_kept < self.body_limit:
+            head = data[:self.body_limit - self.body_kept]
+            self.body_chunks.append(head)
+            self.body_kept += len(head)
+
+    def __reset_body(self):
+        self.body_depth = None
+        self.body_field = None
+        self.body_chunks = []
+        self.body_kept = 0
+        self.body_size = 0
+        self.body_artifact = None
+        self.body_file = None
+
+    def close(self):
+        pass
+
+
 class FuncJTLReader(FunctionalResultsReader):
     """
     Class to read trace.jtl
@@ -943,12 +1261,35 @@ class FuncJTLReader(FunctionalResultsReader):
         super(FuncJTLReader, self).__init__()
         self.executor_label = "JMeter"
         self.log = parent_logger.getChild(self.__class__.__name__)
-        self.parser = etree.XMLPullParser(events=('end',), recover=True)
+        self.parser = None
+        self.streaming = False  # parse samples with bounded memory, long bodies are written while parsing
+        self.body_limit = 1024 * 1024  # max number of body characters kept in memory with streaming
+        self.tree_builder = None
         self.engine = engine
         self.file = FileReader(filename=filename, parent_logger=self.log)
         self.failed_processing = False
         self.read_records = 0
 
+    def __create_parser(self):
+        if self.streaming:
+            self.tree_builder = TraceTreeBuilder(self.engine, self.body_limit)
+            return etree.XMLParser(target=self.tree_builder, recover=True)
+        else:
+            return etree.XMLPullParser(events=('end',), recover=True)
+
+    def __completed_elements(self):
+        if self.tree_builder:
+            elements, self.tree_builder.elements = self.tree_builder.elements, []
+            for elem in elements:
+                yield elem
+        else:
+            for _, elem in self.parser.read_events():
+                if elem.getparent() is not None and elem.getparent().tag == 'testResults':
+                    yield elem
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+
     def read(self, last_pass=True):
         """
         Read the next part of the file
@@ -956,18 +1297,15 @@ class FuncJTLReader(FunctionalResultsReader):
         if self.failed_processing:
             return
 
-        self.__read_next_chunk(last_pass)
-
-        for _, elem in self.parser.read_events():
-            if elem.getparent() is not None and elem.getparent().tag == 'testResults':
-                sample = self._extract_sample(elem)
-                self.read_records += 1
+        if self.parser is None:
+            self.parser = self.__create_parser()
 
-                elem.clear()
-                while elem.getprevious() is not None:
-                    del elem.getparent()[0]
+        self.__read_next_chunk(last_pass)
 
-                yield sample
+        for elem in self.__completed_elements():
+            sample = self._extract_sample(elem)
+            self.read_records += 1
+            yield sample
 
     def __read_next_chunk(self, last_pass):
         while not self.failed_processing:
@@ -1062,10 +1400,24 @@ class FuncJTLReader(FunctionalResultsReader):
 
         return sample_extras
 
-    def __write_sample_data_to_artifacts(self, sample_extras):
+    @staticmethod
+    def _get_streamed_bodies(sample_elem):
+        """
+        :return: dict of extras field -> (artifact, size) for bodies that were written while parsing
+        """
+        bodies = {}
+        for tag, field in iteritems(TraceTreeBuilder.STREAMED_TAGS):
+            elem = sample_elem.find(tag)
+            if elem is not None and elem.get(TraceTreeBuilder.ARTIFACT_ATTR):
+                bodies[field] = (elem.get(TraceTreeBuilder.ARTIFACT_ATTR), int(elem.get(TraceTreeBuilder.SIZE_ATTR)))
+        return bodies
+
+    def __write_sample_data_to_artifacts(self, sample_extras, streamed_bodies):
         for file_field in self.FILE_EXTRACTED_FIELDS:
             contents = sample_extras.pop(file_field)
-            if contents:
+            if file_field in streamed_bodies:
+                sample_extras[file_field], sample_extras[file_field + "Size"] = streamed_bodies[file_field]
+            elif contents:
                 filename = "sample-%s" % file_field
                 artifact = self._write_sample_data(filename, contents)
                 sample_extras[file_field] = artifact
@@ -1094,7 +1446,7 @@ class FuncJTLReader(FunctionalResultsReader):
             error_msg = "The operation lasted too long"
 
         sample_extras = self._extract_sample_extras(sample_elem)
-        self.__write_sample_data_to_artifacts(sample_extras)
+        self.__write_sample_data_to_artifacts(sample_extras, self._get_streamed_bodies(sample_elem))
 
         return FunctionalSample(test_case=label, test_suite=self.executor_label, status=status,
                                 start_time=tstmp, duration=duration,
@@ -1138,93 +1490,325 @@ class FuncJTLReader(FunctionalResultsReader):
 
 class IncrementalCSVReader(object):
     """
-    JTL csv reader
+    JTL csv reader, parses data in blocks without per-line buffering.
+    Rows are lists of strings, ``indexes`` maps field names into positions in row.
     """
 
     def __init__(self, parent_logger, filename):
-        self.buffer = StringIO()
-        self.csv_reader = None
-        self.log = parent_logger.getChild(self.__class__.__name__)
+        self.dialect = None
+        self.fieldnames = []
         self.indexes = {}
+        self.log = parent_logger.getChild(self.__class__.__name__)
         self.partial_buffer = ""
         self.file = FileReader(filename=filename, parent_logger=self.log)
         self.read_speed = 1024 * 1024
 
+    def _read_block(self, last_pass=False):
+        """
+        Read next block of complete data lines from jtl, header line is consumed to set up parsing
+
+        :type last_pass: bool
+        :rtype: str
+        """
+        data = self.file.get_bytes(size=self.read_speed, last_pass=last_pass)
+        if not data:
+            return ""
+
+        data = self.partial_buffer + data
+        end = data.rfind("\n") + 1
+        self.partial_buffer = data[end:]
+        if not end:
+            return ""
+
+        start = 0
+        if self.dialect is None:
+            start = data.index("\n") + 1
+            header = data[:start]
+            self.dialect = guess_csv_dialect(header, force_doublequote=True)  # TODO: configurable doublequoting?
+            self.fieldnames = header.strip().split(self.dialect.delimiter)
+            self.indexes = {name: index for index, name in enumerate(self.fieldnames)}
+            self.log.debug("Analyzed header line: %s", self.fieldnames)
+
+        self.log.debug("Read: %s bytes (at speed %s)", end, self.read_speed)
+        self._tune_speed(end)
+        return data[start:end]
+
+    def read(self, last_pass=False):
+        """
+        read data from jtl as list of rows, see ``indexes`` for positions of fields in row
+        :type last_pass: bool
+        :rtype: list[list[str]]
+        """
+        block = self._read_block(last_pass)
+        if not block:
+            return []
+
+        if PY2:  # todo: fix csv parsing of unicode strings on PY2
+            lines = block.encode('utf-8').splitlines(True)
+        else:
+            lines = StringIO(block)
+
+        width = len(self.fieldnames)
+        rows = []
+        gc_enabled = gc.isenabled()
+        gc.disable()  # rows can't make reference cycles, while GC passes triggered by their allocation are costly
+        try:
+            for row in csv.reader(lines, dialect=self.dialect):
+                if len(row) < width:
+                    self.log.debug("Skipping incomplete row: %s", row)
+                    continue
+                rows.append(row)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        return rows
+
+    def read_columns(self, last_pass=False):
+        """
+        read data from jtl as columns of string values
+        :type last_pass: bool
+        :rtype: dict[str,tuple]
+        """
+        rows = self.read(last_pass)
+        if not rows:
+            return {}
+
+        return dict(zip(self.fieldnames, zip(*rows)))
+
+    def _tune_speed(self, bytes_read):
+        if bytes_read >= self.read_speed:
+            self.read_speed = min(8 * 1024 * 1024, self.read_speed * 2)
+        elif bytes_read < self.read_speed / 2:
+            self.read_speed = max(self.read_speed // 2, 1024 * 1024)
+
+
+class BinaryKPIReader(object):
+    """
+    Reader for KPI file in Taurus binary format, written by resources/binary-kpi-writer.groovy.
+    File consists of fixed-width records, their string fields are indexes in table of strings,
+    which is kept in separate '.strings' file as sequence of int32 length + UTF-8 bytes.
+    """
+    RECORD = numpy.dtype([("timeStamp", "<i8"), ("elapsed", "<i4"), ("label", "<i4"), ("responseCode", "<i4"),
+                          ("responseMessage", "<i4"), ("threadName", "<i4"), ("success", "<i4"), ("bytes", "<i8"),
+                          ("grpThreads", "<i4"), ("allThreads", "<i4"), ("Latency", "<i4"), ("Hostname", "<i4"),
+                          ("Connect", "<i4")])
+    STRING_FIELDS = ("label", "responseCode", "responseMessage", "threadName", "Hostname")
+    STRINGS_SUFFIX = ".strings"
+    LENGTH = struct.Struct("<i")
+
+    def __init__(self, parent_logger, filename):
+        self.log = parent_logger.getChild(self.__class__.__name__)
+        self.file = FileReader(filename=filename, parent_logger=self.log)
+        self.strings_file = FileReader(filename=filename + self.STRINGS_SUFFIX, parent_logger=self.log)
+        self.strings = []
+        self.strings_tail = b""
+        self.mapped = None
+        self.retired_maps = []
+        self.read_limit = 1000 * 1000  # records per read
+
     def read(self, last_pass=False):
         """
-        read data from jtl
-        yield csv row
+        Get records appeared since previous call. Array is a view of mapped file,
+        it's valid until next call, string fields refer `strings` table
+
         :type last_pass: bool
+        :rtype: numpy.ndarray
         """
-        lines = self.file.get_lines(size=self.read_speed, last_pass=last_pass)
+        if not self.file.is_ready():
+            return None
+
+        size = os.fstat(self.file.fds.fileno()).st_size
+        count = (size - self.file.offset) // self.RECORD.itemsize
+        if not last_pass:
+            count = min(count, self.read_limit)
+        if count <= 0:
+            return None
+
+        if self.mapped is None or len(self.mapped) < size:
+            self.__remap()
+
+        records = numpy.frombuffer(self.mapped, dtype=self.RECORD, count=count, offset=self.file.offset)
+        self.file.offset += count * self.RECORD.itemsize
+        self.log.debug("Read: %s records", count)
+        self.__read_strings()  # writer flushes strings before records that refer them
+        return records
+
+    def __remap(self):
+        self.__unmap()
+        self.mapped = mmap.mmap(self.file.fds.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __read_strings(self):
+        data = self.strings_tail + (self.strings_file.get_bytes(last_pass=True, decode=False) or b"")
+        pos = 0
+        while pos + self.LENGTH.size <= len(data):
+            length, = self.LENGTH.unpack_from(data, pos)
+            end = pos + self.LENGTH.size + length
+            if end > len(data):
+                break
+            self.strings.append(data[pos + self.LENGTH.size:end].decode('utf-8'))
+            pos = end
+        self.strings_tail = data[pos:]
 
-        lines_read = 0
-        bytes_read = 0
+    def __unmap(self):
+        if self.mapped is not None:
+            self.retired_maps.append(self.mapped)
+            self.mapped = None
 
-        for line in lines:
-            if not line.endswith("\n"):
-                self.partial_buffer += line
-                continue
+        in_use = []
+        for mapped in self.retired_maps:
+            try:
+                mapped.close()
+            except BufferError:  # some records are still in use, retry on next unmapping
+                in_use.append(mapped)
+        self.retired_maps = in_use
 
-            line = "%s%s" % (self.partial_buffer, line)
-            self.partial_buffer = ""
+    def close(self):
+        try:
+            self.__unmap()
+            if self.retired_maps:
+                self.log.debug("Mapped file is still in use, it's closed when released")
+        finally:
+            self.file.close()
+            self.strings_file.close()
 
-            lines_read += 1
-            bytes_read += len(line)
+    def to_csv(self, filename):
+        """
+        Convert whole binary file into regular CSV KPI file
 
-            if self.csv_reader is None:
-                dialect = guess_csv_dialect(line, force_doublequote=True)  # TODO: configurable doublequoting?
-                self.csv_reader = csv.DictReader(self.buffer, [], dialect=dialect)
-                self.csv_reader.fieldnames += line.strip().split(self.csv_reader.dialect.delimiter)
-                self.log.debug("Analyzed header line: %s", self.csv_reader.fieldnames)
-                continue
+        :type filename: str
+        """
+        fields = self.RECORD.names
+        string_idxs = [fields.index(field) for field in self.STRING_FIELDS]
+        success_idx = fields.index("success")
+
+        reader = BinaryKPIReader(self.log, self.file.name)
+        reader.read_limit = 100 * 1000
+        with (open(filename, 'wb') if PY2 else open(filename, 'w', encoding='utf-8', newline='')) as fds:
+            writer = csv.writer(fds)
+            writer.writerow(fields)
+            records = reader.read()
+            while records is not None:
+                for record in records.tolist():
+                    row = list(record)
+                    for idx in string_idxs:
+                        row[idx] = reader.strings[row[idx]]
+                        if PY2:
+                            row[idx] = row[idx].encode('utf-8')
+                    row[success_idx] = "true" if row[success_idx] else "false"
+                    writer.writerow(row)
+                records = reader.read()
+        reader.close()
+
+
+class ErrorsTreeBuilder(object):
+    """
+    Parser target that builds each sample of errors.jtl as separate tree, skipping content we don't report
+    (response data, headers, etc.). Completed samples are collected into `elements`.
+    """
+    SKIPPED_TAGS = frozenset(("responseData", "samplerData", "requestHeader", "responseHeader", "cookies",
+                              "queryString", "saveConfig"))
 
-            if PY2:  # todo: fix csv parsing of unicode strings on PY2
-                line = line.encode('utf-8')
+    def __init__(self):
+        self.elements = []
+        self.builder = None
+        self.depth = 0
+        self.skipped_depth = None
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if self.skipped_depth is not None or self.depth == 1:  # skipped content or root element
+            return
 
-            self.buffer.write(line)
+        if tag in self.SKIPPED_TAGS:
+            self.skipped_depth = self.depth
+            return
 
-        if lines_read:
-            self.log.debug("Read: %s lines / %s bytes (at speed %s)", lines_read, bytes_read, self.read_speed)
-            self._tune_speed(bytes_read)
+        if self.builder is None:
+            self.builder = etree.TreeBuilder()
+        self.builder.start(tag, attrib)
 
-            self.buffer.seek(0)
-            for row in self.csv_reader:
-                yield row
+    def end(self, tag):
+        depth = self.depth
+        self.depth -= 1
+        if self.skipped_depth is not None:
+            if depth == self.skipped_depth:
+                self.skipped_depth = None
+            return
 
-            self.buffer.seek(0)
-            self.buffer.truncate(0)
+        if depth > 1:
+            self.builder.end(tag)
+            if depth == 2:
+                self.elements.append(self.builder.close())
+                self.builder = None
 
-    def _tune_speed(self, bytes_read):
-        if bytes_read >= self.read_speed:
-            self.read_speed = min(8 * 1024 * 1024, self.read_speed * 2)
-        elif bytes_read < self.read_speed / 2:
-            self.read_speed = max(self.read_speed / 2, 1024 * 1024)
+    def data(self, data):
+        if self.builder is not None and self.skipped_depth is None:
+            self.builder.data(data)
+
+    def close(self):
+        pass
 
 
 class JTLErrorsReader(object):
     """
     Reader for errors.jtl, which is in XML max-verbose format
 
+    Errors are buffered per second until requested by `get_data`, buffer size is capped by `buffer_limit`
+    error items (0 means unlimited). Oldest seconds are evicted on overflow: with 'release' eviction they are
+    reported with next `get_data` call, with 'drop' they are discarded.
+
     :type filename: str
     :type parent_logger: logging.Logger
     """
     url_xpath = GenericTranslator().css_to_xpath("java\\.net\\.URL")
+    EVICTION_POLICIES = ("release", "drop")
 
     def __init__(self, filename, parent_logger, err_msg_separator=None):
         # http://stackoverflow.com/questions/9809469/python-sax-to-lxml-for-80gb-xml/9814580#9814580
         super(JTLErrorsReader, self).__init__()
         self.log = parent_logger.getChild(self.__class__.__name__)
-        self.parser = etree.XMLPullParser(events=('end',))
+        self.parser = None
+        self.lean = False  # build only parts of samples used for error reporting
+        self.tree_builder = None
         self.file = FileReader(filename=filename, parent_logger=self.log)
-        self.buffer = BetterDict()
+        self.buffer = {}
+        self.buffer_index = []  # heap of buffered timestamps
+        self.buffered_items = 0
+        self.buffer_limit = 100 * 1000
+        self.eviction = "release"
+        self.evicted = {}
+        self.dropped_errors = 0
         self.failed_processing = False
         self.err_msg_separator = err_msg_separator
 
+    def __create_parser(self):
+        if self.lean:
+            self.tree_builder = ErrorsTreeBuilder()
+            return etree.XMLParser(target=self.tree_builder)
+        else:
+            return etree.XMLPullParser(events=('end',))
+
+    def __completed_elements(self):
+        if self.tree_builder:
+            elements, self.tree_builder.elements = self.tree_builder.elements, []
+            for elem in elements:
+                yield elem
+        else:
+            for _, elem in self.parser.read_events():
+                if elem.getparent() is not None and elem.getparent().tag == 'testResults':
+                    yield elem
+                    elem.clear()  # cleanup processed from the memory
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+
     def read_file(self, final_pass=False):
         """
         Read the next part of the file
         """
+        if self.parser is None:
+            self.parser = self.__create_parser()
+
         start_size = os.path.getsize(self.file.name) if self.file.is_ready() else 0
         while not self.failed_processing:
             # we need to feed bytes, not a unicode string, into the parser
@@ -1241,12 +1825,8 @@ class JTLErrorsReader(object):
                 self.log.debug("Error reading errors.jtl: %s", traceback.format_exc())
                 self.log.warning("Failed to parse errors XML: %s", exc)
 
-            for _, elem in self.parser.read_events():
-                if elem.getparent() is not None and elem.getparent().tag == 'testResults':
-                    self._parse_element(elem)
-                    elem.clear()  # cleanup processed from the memory
-                    while elem.getprevious() is not None:
-                        del elem.getparent()[0]
+            for elem in self.__completed_elements():
+                self._parse_element(elem)
 
             if not final_pass:
                 break
@@ -1271,19 +1851,40 @@ class JTLErrorsReader(object):
         Get accumulated errors data up to specified timestamp
         """
         result = BetterDict()
-        for t_stamp in sorted(self.buffer.keys()):
-            if t_stamp > max_ts:
-                break
-            labels = self.buffer.pop(t_stamp)
-            for label, label_data in iteritems(labels):
-                res = result.get(label, [], force_set=True)
-                for err_item in label_data:
-                    KPISet.inc_list(res, ('msg', err_item['msg']), err_item)
+        if self.evicted:
+            self.__merge_labels(result, self.evicted)
+            self.evicted = {}
+
+        while self.buffer_index and self.buffer_index[0] <= max_ts:
+            self.__merge_labels(result, self.__pop_oldest())
 
         if result:
             self.log.debug("Got error info for %s, labels: %s", max_ts, result.keys())
         return result
 
+    @staticmethod
+    def __merge_labels(result, labels):
+        for label, label_data in iteritems(labels):
+            res = result.setdefault(label, ErrorsList())
+            for err_item in label_data:
+                KPISet.inc_list(res, ('msg', err_item['msg']), err_item)
+
+    def __pop_oldest(self):
+        labels = self.buffer.pop(heapq.heappop(self.buffer_index))
+        self.buffered_items -= sum(len(label_data) for label_data in labels.values())
+        return labels
+
+    def __evict(self):
+        while self.buffered_items > self.buffer_limit and self.buffer_index:
+            labels = self.__pop_oldest()
+            if self.eviction == "drop":
+                if not self.dropped_errors:
+                    self.log.warning("Errors buffer limit reached (%s items), dropping oldest errors",
+                                     self.buffer_limit)
+                self.dropped_errors += sum(item['cnt'] for item in labels.get('', ()))  # overall errors
+            else:
+                self.__merge_labels(self.evicted, labels)
+
     def _extract_standard(self, elem):
         t_stamp = int(elem.get("ts")) / 1000
         label = elem.get("lb")
@@ -1305,9 +1906,19 @@ class JTLErrorsReader(object):
                 url_counts = Counter()
 
         err_item = KPISet.error_item_skel(f_msg, f_rc, 1, f_type, url_counts, f_tag)
-        buf = self.buffer.get(t_stamp, force_set=True)
-        KPISet.inc_list(buf.get(label, [], force_set=True), ("msg", f_msg), err_item)
-        KPISet.inc_list(buf.get('', [], force_set=True), ("msg", f_msg), err_item)
+        buf = self.buffer.get(t_stamp)
+        if buf is None:
+            buf = self.buffer[t_stamp] = {}
+            heapq.heappush(self.buffer_index, t_stamp)
+
+        for key in (label, ''):
+            errors = buf.setdefault(key, ErrorsList())
+            size = len(errors)
+            KPISet.inc_list(errors, ("msg", f_msg), err_item)
+            self.buffered_items += len(errors) - size
+
+        if self.buffer_limit and self.buffered_items > self.buffer_limit:
+            self.__evict()
 
     def _extract_nonstandard(self, elem):
         t_stamp = int(elem.findtext("timeStamp")) / 1000  # NOTE: will it be sometimes EndTime?
@@ -1393,6 +2004,8 @@ class JMeter(RequiredTool):
                       '{ver}/jmeter-plugins-manager-{ver}.jar'.format(ver=PLUGINS_MANAGER_VERSION)
     CMDRUNNER = 'https://search.maven.org/remotecontent?filepath=kg/apc/cmdrunner/2.2/cmdrunner-2.2.jar'
     VERSION = "5.0"
+    PLUGINS_CACHE = "taurus-plugins-cache.json"
+    PMGR_FAILURE = re.compile(r"Failed to (download|apply|install)")  # non-fatal problems that pmgr only reports
 
     def __init__(self, config=None, props=None, **kwargs):
         settings = config or {}
@@ -1477,6 +2090,11 @@ class JMeter(RequiredTool):
             self.log.warning("Script %s not found" % jmx_file)
             return
 
+        classes = self._get_jmx_classes(jmx_file)
+        if classes is not None and self.__plugins_satisfied(classes):
+            self.log.debug("Plugins for %s are already installed", jmx_file)
+            return
+
         try:
             params = ["install-for-jmx", jmx_file]
             out, err = self._pmgr_call(params)
@@ -1487,9 +2105,96 @@ class JMeter(RequiredTool):
 
         if err and "Wrong command: install-for-jmx" in err:  # old manager
             self.log.debug("pmgr can't discover jmx for plugins")
+            return
 
         if out and "Plugins manager will apply some modifications" in out:
             time.sleep(5)  # allow for modifications to complete
+            self.log.debug("Plugins for %s will be checked again next time, jars might be still changing", jmx_file)
+            return
+
+        if self.PMGR_FAILURE.search("%s\n%s" % (out or "", err or "")):  # exit code is checked by call
+            self.log.warning("Plugins manager reported problems for %s:\n%s\n%s", jmx_file, out, err)
+            return
+
+        if classes is not None:
+            self.__record_plugins(classes)
+
+    def _get_jmx_classes(self, jmx_file):
+        """
+        :return: set of testclass/guiclass values used in jmx, None if jmx can't be parsed
+        """
+        try:
+            tree = etree.parse(jmx_file)
+        except BaseException as exc:
+            self.log.debug("Failed to read classes from %s: %s", jmx_file, exc)
+            return None
+
+        classes = set()
+        for elem in tree.iter():
+            for attr in ("testclass", "guiclass"):
+                if elem.get(attr):
+                    classes.add(elem.get(attr))
+        return classes
+
+    def _get_jars_digest(self):
+        """
+        Fingerprint of installed jars (name, size and mtime), None if there is no installation
+        """
+        lib_dir = os.path.join(get_full_path(self.tool_path, step_up=2), 'lib')
+        ext_dir = os.path.join(lib_dir, 'ext')
+        if not os.path.isdir(ext_dir):
+            return None
+
+        jars = []
+        for dirname in (lib_dir, ext_dir):
+            for file_name in os.listdir(dirname):
+                if file_name.endswith('.jar'):
+                    stat = os.stat(os.path.join(dirname, file_name))
+                    jars.append("%s:%s:%s" % (os.path.join(dirname, file_name), stat.st_size, stat.st_mtime))
+
+        return hashlib.sha1("\n".join(sorted(jars)).encode()).hexdigest()
+
+    def __get_plugins_cache_path(self):
+        return os.path.join(get_full_path(self.tool_path, step_up=2), self.PLUGINS_CACHE)
+
+    def __plugins_satisfied(self, classes):
+        if self.recheck:
+            return False
+
+        digest = self._get_jars_digest()
+        cache_path = self.__get_plugins_cache_path()
+        if digest is None or not os.path.isfile(cache_path):
+            return False
+
+        try:
+            with open(cache_path) as fds:
+                cache = json.load(fds)
+        except (IOError, ValueError) as exc:
+            self.log.debug("Failed to read plugins cache %s: %s", cache_path, exc)
+            return False
+
+        return cache.get("jars") == digest and classes.issubset(cache.get("classes", []))
+
+    def __record_plugins(self, classes):
+        digest = self._get_jars_digest()  # pmgr might have installed something
+        if digest is None:
+            return
+
+        cache_path = self.__get_plugins_cache_path()
+        cache = {"jars": digest, "classes": sorted(classes)}
+        try:
+            with open(cache_path) as fds:
+                prev_cache = json.load(fds)
+            if prev_cache.get("jars") == digest:  # classes detected before are still satisfied
+                cache["classes"] = sorted(classes.union(prev_cache.get("classes", [])))
+        except (IOError, ValueError):
+            pass
+
+        try:
+            with open(cache_path, "w") as fds:
+                json.dump(cache, fds, indent=1)
+        except IOError as exc:
+            self.log.debug("Failed to save plugins cache %s: %s", cache_path, exc)
 
     def __install_jmeter(self, dest):
         if self.download_link:
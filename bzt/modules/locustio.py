@@ -73,7 +73,7 @@ class LocustIOExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInsta
 
     def install_required_tools(self):
         tool = self._get_tool(LocustIO)
-        if not tool.check_if_installed():
+        if not tool.is_installed():
             tool.install()
 
     def startup(self):
@@ -100,7 +100,7 @@ class MolotovExecutor(ScenarioExecutor, FileLister, WidgetProvider, HavingInstal
 
     def install_required_tools(self):
         self.molotov = self._get_tool(Molotov, config=self.settings)
-        if not self.molotov.check_if_installed():
+        if not self.molotov.is_installed():
             self.molotov.install()
 
     def get_error_diagnostics(self):
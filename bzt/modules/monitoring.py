@@ -1,11 +1,13 @@
 """ Monitoring service subsystem """
+import os
 import select
 import socket
 import subprocess
+import threading
 import time
 import traceback
 from abc import abstractmethod
-from collections import OrderedDict, namedtuple
+from collections import OrderedDict, namedtuple, deque, Counter
 
 import psutil
 from urwid import Pile, Text
@@ -28,6 +30,9 @@ class Monitoring(Service, WidgetProvider, Singletone):
         super(Monitoring, self).__init__()
         self.listeners = []
         self.clients = []
+        self.background = False
+        self.pollers = []
+        self.data_queue = None
         self.client_classes = {
             'server-agent': ServerAgentClient,
             'graphite': GraphiteClient,
@@ -40,7 +45,10 @@ class Monitoring(Service, WidgetProvider, Singletone):
 
     def prepare(self):
         super(Monitoring, self).prepare()
-        clients = (param for param in self.parameters if param not in ('run-at', 'module'))
+        self.background = self.parameters.get("background", self.background)
+        self.data_queue = deque(maxlen=int(self.parameters.get("buffer-size", 10000)))
+        options = ('run-at', 'module', 'background', 'buffer-size')
+        clients = (param for param in self.parameters if param not in options)
         for client_name in clients:
             if client_name in self.client_classes:
                 client_class = self.client_classes[client_name]
@@ -68,12 +76,21 @@ class Monitoring(Service, WidgetProvider, Singletone):
     def startup(self):
         for client in self.clients:
             client.start()
+            if self.background:
+                interval = getattr(client, 'interval', None) or self.engine.check_interval
+                poller = ClientPoller(client, self.data_queue, interval, self.log)
+                poller.start()
+                self.pollers.append(poller)
         super(Monitoring, self).startup()
 
     def check(self):
         results = []
-        for client in self.clients:
-            results.extend(client.get_data())
+        if self.background:
+            while self.data_queue:
+                results.append(self.data_queue.popleft())
+        else:
+            for client in self.clients:
+                results.extend(client.get_data())
 
         if results:
             for listener in self.listeners:
@@ -81,10 +98,23 @@ class Monitoring(Service, WidgetProvider, Singletone):
         return super(Monitoring, self).check()
 
     def shutdown(self):
+        for poller in self.pollers:
+            poller.stop()
+        if self.pollers:
+            self.log.debug("Monitoring clients stats: %s", self.get_client_stats())
+
         for client in self.clients:
             client.disconnect()
         super(Monitoring, self).shutdown()
 
+    def get_client_stats(self):
+        """
+        Polling stats for clients in background mode: latency of last poll and staleness of data (seconds)
+
+        :rtype: list[dict]
+        """
+        return [poller.get_stats() for poller in self.pollers]
+
     def get_widget(self):
         widget = MonitoringWidget()
         self.add_listener(widget)
@@ -117,6 +147,70 @@ class MonitoringClient(object):
         pass
 
 
+class ClientPoller(object):
+    """
+    Polls monitoring client from background thread on its own interval, so slow client doesn't block engine loop.
+    Collected data is appended into shared ring buffer, oldest items are dropped on overflow.
+    """
+    STOP_TIMEOUT = 5  # seconds to wait for poll in progress on stop
+
+    def __init__(self, client, data_queue, interval, parent_log):
+        """
+        :type client: MonitoringClient
+        :type data_queue: collections.deque
+        """
+        super(ClientPoller, self).__init__()
+        self.log = parent_log.getChild(self.__class__.__name__)
+        self.client = client
+        self.data_queue = data_queue
+        self.interval = interval
+        self.name = client.__class__.__name__
+        self.latency = None
+        self.last_data = None
+        self.polls = 0
+        self.errors = 0
+        self.started = None
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="%s-%s" % (self.__class__.__name__, self.name))
+        self.thread.daemon = True
+
+    def start(self):
+        self.started = time.time()
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join(self.STOP_TIMEOUT)
+            if self.thread.is_alive():
+                self.log.warning("Polling of %s didn't finish in %ss, leaving it behind", self.name, self.STOP_TIMEOUT)
+
+    def get_stats(self):
+        staleness = time.time() - (self.last_data or self.started) if self.started else None
+        return {"client": self.name, "polls": self.polls, "errors": self.errors,
+                "latency": self.latency, "staleness": staleness}
+
+    def _run(self):
+        while not self.stopping.is_set():
+            start = time.time()
+            try:
+                data = self.client.get_data()
+            except BaseException as exc:
+                self.log.debug("Failed to get data from %s: %s", self.name, traceback.format_exc())
+                self.log.warning("Failed to get data from %s: %s", self.name, exc)
+                self.errors += 1
+                data = None
+
+            now = time.time()
+            self.latency = now - start
+            self.polls += 1
+            if data:
+                self.last_data = now
+                self.data_queue.extend(data)
+
+            self.stopping.wait(self.interval)
+
+
 class LocalClient(MonitoringClient):
     """
     :type monitor: LocalMonitor
@@ -183,6 +277,8 @@ class LocalClient(MonitoringClient):
         self.metrics = list(set(good_list))
 
         self.monitor = LocalMonitor(self.log, self.metrics, self.engine)
+        self.monitor.conn_by_process = self.config.get("conn-by-process", False)
+        self.monitor.conn_by_port = self.config.get("conn-by-remote-port", False)
         self.interval = dehumanize_time(self.config.get("interval", self.engine.check_interval))
 
     def get_data(self):
@@ -193,7 +289,8 @@ class LocalClient(MonitoringClient):
             self._cached_data = []
             metric_values = self._get_resource_stats()
 
-            for name in self.metrics:
+            names = self.metrics + sorted(name for name in metric_values if name.startswith(LocalMonitor.CONN_PREFIX))
+            for name in names:
                 self._cached_data.append({
                     'source': self.label,
                     'ts': now,
@@ -203,6 +300,10 @@ class LocalClient(MonitoringClient):
 
 
 class LocalMonitor(object):
+    PROC_NET_TCP = ("/proc/net/tcp", "/proc/net/tcp6")
+    TCP_ESTABLISHED = "01"  # state code in /proc/net/tcp
+    CONN_PREFIX = "conn/"  # prefix of connections breakdown metrics, mustn't match 'conn-all'
+
     def __init__(self, parent_logger, metrics, engine):
         if not engine:
             raise TaurusInternalException('Local monitor requires valid engine instance')
@@ -213,6 +314,9 @@ class LocalMonitor(object):
         self._disk_counters = None
         self._net_counters = None
         self._last_check = None
+        self._process_names = {}  # pid => (create time, name) for processes seen by last check
+        self.conn_by_process = False
+        self.conn_by_port = False
 
     def resource_stats(self):
         if not self._last_check:
@@ -254,11 +358,7 @@ class LocalMonitor(object):
 
         if 'conn-all' in self.metrics:
             try:
-                # take all connections without address resolution
-                output = subprocess.check_output(['netstat', '-an'])
-                output_lines = stream_decode(output).split('\n')  # in py3 stream has 'bytes' type
-                est_lines = [line for line in output_lines if line.find('EST') != -1]
-                result['conn-all'] = len(est_lines)
+                result.update(self.__get_connections())
             except BaseException as exc:
                 self.log.debug("Failed to get connections info: %s", exc)
                 result['conn-all'] = 0
@@ -298,6 +398,88 @@ class LocalMonitor(object):
 
         return result
 
+    def __get_connections(self):
+        """
+        Count established TCP connections, with optional breakdown by process name and remote port.
+        Reads /proc/net/tcp where available, falls back to psutil and then to netstat.
+
+        :rtype: dict
+        """
+        by_port = Counter()
+        by_process = Counter()
+        if self.conn_by_process:
+            total = self.__count_psutil_connections(by_port, by_process)
+        elif os.path.exists(self.PROC_NET_TCP[0]):
+            total = self.__count_proc_connections(by_port)
+        else:
+            try:
+                total = self.__count_psutil_connections(by_port, by_process)
+            except psutil.AccessDenied:  # e.g. macOS for non-root user
+                total = self.__count_netstat_connections()
+
+        result = {'conn-all': total}
+        if self.conn_by_port:
+            for port, count in iteritems(by_port):
+                result['%sport-%s' % (self.CONN_PREFIX, port)] = count
+        if self.conn_by_process:
+            for name, count in iteritems(by_process):
+                result['%s%s' % (self.CONN_PREFIX, name)] = count
+        return result
+
+    def __count_proc_connections(self, by_port):
+        total = 0
+        for fname in self.PROC_NET_TCP:
+            if not os.path.exists(fname):
+                continue
+
+            with open(fname) as fds:
+                next(fds)  # header
+                for line in fds:
+                    fields = line.split(None, 4)
+                    if fields[3] == self.TCP_ESTABLISHED:
+                        total += 1
+                        if self.conn_by_port:
+                            by_port[int(fields[2][fields[2].rindex(':') + 1:], 16)] += 1
+        return total
+
+    def __count_psutil_connections(self, by_port, by_process):
+        total = 0
+        process_names = {}
+        for conn in psutil.net_connections(kind='tcp'):
+            if conn.status == psutil.CONN_ESTABLISHED:
+                total += 1
+                if self.conn_by_port and conn.raddr:
+                    by_port[conn.raddr[1]] += 1
+                if self.conn_by_process:
+                    by_process[self.__get_process_name(conn.pid, process_names)] += 1
+
+        if self.conn_by_process:
+            self._process_names = process_names  # forget processes that have gone
+        return total
+
+    def __get_process_name(self, pid, process_names):
+        if pid is None:
+            return "unknown"
+
+        if pid not in process_names:
+            try:
+                process = psutil.Process(pid)
+                known = self._process_names.get(pid)
+                if known and known[0] == process.create_time():  # pid isn't reused by other process
+                    process_names[pid] = known
+                else:
+                    process_names[pid] = (process.create_time(), process.name())  # short-lived pids share series
+            except psutil.Error:
+                return "unknown"
+        return process_names[pid][1]
+
+    @staticmethod
+    def __count_netstat_connections():
+        # take all connections without address resolution
+        output = subprocess.check_output(['netstat', '-an'])
+        output_lines = stream_decode(output).split('\n')  # in py3 stream has 'bytes' type
+        return len([line for line in output_lines if line.find('EST') != -1])
+
     def __get_disk_counters(self):
         counters = None
         try:
@@ -20,15 +20,16 @@ import logging
 import re
 import sys
 from abc import abstractmethod
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from operator import itemgetter
 
 from urwid import Pile, Text
 
 from bzt import AutomatedShutdown, TaurusConfigError
 from bzt.engine import Reporter
-from bzt.modules.aggregator import KPISet, DataPoint, AggregatorListener, ResultsProvider
+from bzt.modules.aggregator import KPISet, DataPoint, AggregatorListener, ResultsProvider, RespTimesCounter
 from bzt.modules.console import WidgetProvider, PrioritizedWidget
-from bzt.six import string_types, viewvalues, iteritems
+from bzt.six import string_types, iteritems
 from bzt.utils import load_class, dehumanize_time, BetterDict
 
 
@@ -40,6 +41,8 @@ class CriteriaProcessor(AggregatorListener):
     def __init__(self, crit_cfg_list, feeder):
         super(CriteriaProcessor, self).__init__()
         self.criteria = []
+        self.plan = None
+        self.delegated = None
         self.last_datapoint = None
         self.log = logging.getLogger(__name__)
 
@@ -69,10 +72,39 @@ class CriteriaProcessor(AggregatorListener):
         :type data: bzt.modules.aggregator.DataPoint
         """
         self.last_datapoint = data
+        if self.plan is None:
+            self.plan, self.delegated = self._build_plan()
+
+        part = data[DataPoint.CURRENT]
+        tstmp = data[DataPoint.TIMESTAMP]
+        for label, criteria in self.plan:
+            kpiset = part.get(label)
+            if kpiset is None:
+                self.log.debug("No label %s in %s", label, part.keys())
+                continue
+
+            for crit in criteria:
+                crit.process_criteria_logic(tstmp, crit.get_value(kpiset))
+
+        for crit in self.delegated:
+            crit.aggregated_second(data)
+
+    def _build_plan(self):
+        """
+        Group non-cumulative data criteria by label, so each label is looked up once per datapoint.
+        Criteria with own `aggregated_second` are left to process datapoints themselves.
+
+        :rtype: (list[(str, list[DataCriterion])], list[DataCriterion])
+        """
+        plan = OrderedDict()
+        delegated = []
         for crit in self.criteria:
-            if isinstance(crit, DataCriterion):
-                if crit.selector != DataPoint.CUMULATIVE:
-                    crit.aggregated_second(data)
+            if isinstance(crit, DataCriterion) and crit.selector != DataPoint.CUMULATIVE:
+                if type(crit).aggregated_second == DataCriterion.aggregated_second:
+                    plan.setdefault(crit.label, []).append(crit)
+                else:
+                    delegated.append(crit)
+        return list(plan.items()), delegated
 
     def check(self):
         res = False
@@ -164,10 +196,11 @@ class FailCriterion(object):
     def __init__(self, config, owner):
         self.owner = owner
         self.config = config
-        self.agg_buffer = OrderedDict()
+        self.agg_buffer = deque()  # (timestamp, value) pairs in window
+        self.agg_sum = 0
         self.percentage = str(config['threshold']).endswith('%')
-        self.get_value = self._get_field_functor(config['subject'], self.percentage)
         self.window_logic = config.get('logic', 'for')
+        self.get_value = self._get_field_functor(config['subject'], self.percentage)
         self.agg_logic = self._get_aggregator_functor(self.window_logic, config['subject'])
         self.condition = self._get_condition_functor(config.get('condition', '>', force_set=True))
         self.threshold = dehumanize_time(config['threshold'])
@@ -219,8 +252,7 @@ class FailCriterion(object):
             self._end = tstmp
             self.trigger()
         elif self.window_logic == 'over' and state:
-            min_buffer_tstmp = min(self.agg_buffer.keys())
-            self._start = min_buffer_tstmp
+            self._start = self.agg_buffer[0][0]
             self._end = tstmp
             if self.get_counting() >= self.window:
                 self.trigger()
@@ -271,23 +303,28 @@ class FailCriterion(object):
         else:
             raise TaurusConfigError("Unsupported window logic: %s" % logic)
 
-    def _get_windowed_points(self, tstmp, value):
-        self.agg_buffer[tstmp] = value
-        keys = list(self.agg_buffer.keys())
-        for tstmp_old in keys:
-            if tstmp_old <= tstmp - self.window:
-                del self.agg_buffer[tstmp_old]
-                continue
-            break
+    def _update_window(self, tstmp, value):
+        """
+        Slide window to new point, keeping running sum of values in it
+        """
+        if self.agg_buffer and self.agg_buffer[-1][0] == tstmp:
+            self.agg_sum -= self.agg_buffer.pop()[1]
 
-        return viewvalues(self.agg_buffer)
+        self.agg_buffer.append((tstmp, value))
+        self.agg_sum += value
+        while self.agg_buffer and self.agg_buffer[0][0] <= tstmp - self.window:
+            self.agg_sum -= self.agg_buffer.popleft()[1]
+
+        if not self.agg_buffer:
+            self.agg_sum = 0
 
     def _within_aggregator_sum(self, tstmp, value):
-        return sum(self._get_windowed_points(tstmp, value))
+        self._update_window(tstmp, value)
+        return self.agg_sum
 
     def _within_aggregator_avg(self, tstmp, value):
-        points = self._get_windowed_points(tstmp, value)
-        return sum(points) / len(points)
+        self._update_window(tstmp, value)
+        return self.agg_sum / len(self.agg_buffer)
 
     def get_counting(self):
         return self._end - self._start + 1
@@ -310,6 +347,9 @@ class DataCriterion(FailCriterion):
     """
 
     def __init__(self, config, owner):
+        self.perc_level = None
+        self.agg_hist = None
+        self.hist_percentile = True
         super(DataCriterion, self).__init__(config, owner)
         self.label = config.get('label', '')
         self.selector = DataPoint.CURRENT if self.window > 0 else DataPoint.CUMULATIVE
@@ -332,48 +372,48 @@ class DataCriterion(FailCriterion):
         if subject == 'avg-rt':
             if percentage:
                 raise TaurusConfigError("Percentage threshold is not applicable for %s" % subject)
-            return lambda x: x[KPISet.AVG_RESP_TIME]
+            return itemgetter(KPISet.AVG_RESP_TIME)
         elif subject == 'avg-lt':
             if percentage:
                 raise TaurusConfigError("Percentage threshold is not applicable for %s" % subject)
-            return lambda x: x[KPISet.AVG_LATENCY]
+            return itemgetter(KPISet.AVG_LATENCY)
         elif subject == 'avg-ct':
             if percentage:
                 raise TaurusConfigError("Percentage threshold is not applicable for %s" % subject)
-            return lambda x: x[KPISet.AVG_CONN_TIME]
+            return itemgetter(KPISet.AVG_CONN_TIME)
         elif subject == 'stdev-rt':
             if percentage:
                 raise TaurusConfigError("Percentage threshold is not applicable for %s" % subject)
-            return lambda x: x[KPISet.STDEV_RESP_TIME]
+            return itemgetter(KPISet.STDEV_RESP_TIME)
         elif subject.startswith('concurr'):
             if percentage:
                 raise TaurusConfigError("Percentage threshold is not applicable for %s" % subject)
-            return lambda x: x[KPISet.CONCURRENCY]
+            return itemgetter(KPISet.CONCURRENCY)
         elif subject == 'hits':
             if percentage:
                 raise TaurusConfigError("Percentage threshold is not applicable for %s" % subject)
-            return lambda x: x[KPISet.SAMPLE_COUNT]
+            return itemgetter(KPISet.SAMPLE_COUNT)
         elif subject.startswith('succ'):
             if percentage:
                 return lambda x: 100.0 * x[KPISet.SUCCESSES] / x[KPISet.SAMPLE_COUNT]
             else:
-                return lambda x: x[KPISet.SUCCESSES]
+                return itemgetter(KPISet.SUCCESSES)
         elif subject.startswith('fail'):
             if percentage:
                 return lambda x: 100.0 * x[KPISet.FAILURES] / x[KPISet.SAMPLE_COUNT]
             else:
-                return lambda x: x[KPISet.FAILURES]
+                return itemgetter(KPISet.FAILURES)
         elif subject.startswith('p'):
             if percentage:
                 raise TaurusConfigError("Percentage threshold is not applicable for %s" % subject)
+            if self.window_logic in ('within', 'over'):
+                self.perc_level = float(subject[1:])
+                return lambda x: x  # window percentile is calculated from histograms, if there are any
+
             level = str(float(subject[1:]))
             return lambda x: x[KPISet.PERCENTILES][level] if level in x[KPISet.PERCENTILES] else 0
         elif subject.startswith('rc'):
-            count = lambda x: sum([
-                x[KPISet.RESP_CODES][y]
-                for y in x[KPISet.RESP_CODES].keys()
-                if fnmatch.fnmatch(y, subject[2:])
-            ])
+            count = self._get_rc_counter(subject[2:])
             if percentage:
                 return lambda x: 100.0 * count(x) / float(x[KPISet.SAMPLE_COUNT])
             else:
@@ -381,10 +421,64 @@ class DataCriterion(FailCriterion):
         else:
             raise TaurusConfigError("Unsupported fail criteria subject: %s" % subject)
 
+    def _within_aggregator_percentile(self, tstmp, kpiset):
+        """
+        True percentile over window: per-second histograms are merged into window histogram
+        and subtracted from it when they leave the window. Sources that report percentiles
+        without histograms (e.g. cloud results) get per-second percentiles averaged instead.
+
+        :type kpiset: KPISet
+        """
+        rtimes = kpiset[KPISet.RESP_TIMES]
+        level = str(self.perc_level)
+        if self.hist_percentile and not len(rtimes) and level in kpiset[KPISet.PERCENTILES]:
+            self.owner.log.debug("No response times histogram for %s, averaging percentiles", self)
+            self.hist_percentile = False
+            self.agg_buffer.clear()
+            self.agg_sum = 0
+            self.agg_hist = None
+
+        if not self.hist_percentile:
+            return self._within_aggregator_avg(tstmp, kpiset[KPISet.PERCENTILES].get(level, 0))
+
+        if self.agg_hist is None:
+            self.agg_hist = RespTimesCounter(rtimes.low, rtimes.high, rtimes.sign_figures)
+
+        if self.agg_buffer and self.agg_buffer[-1][0] == tstmp:
+            self.agg_hist.remove_counts(self.agg_buffer.pop()[1])
+
+        self.agg_buffer.append((tstmp, rtimes.get_nonzero_counts()))
+        self.agg_hist.merge(rtimes)
+        while self.agg_buffer and self.agg_buffer[0][0] <= tstmp - self.window:
+            self.agg_hist.remove_counts(self.agg_buffer.popleft()[1])
+
+        return self.agg_hist.get_percentile(self.perc_level) / 1000.0
+
+    @staticmethod
+    def _get_rc_counter(pattern):
+        """
+        Get functor counting response codes matching pattern, match results are cached per code
+        """
+        matches = {}
+
+        def count(kpiset):
+            total = 0
+            for code, value in iteritems(kpiset[KPISet.RESP_CODES]):
+                matched = matches.get(code)
+                if matched is None:
+                    matched = matches[code] = fnmatch.fnmatch(code, pattern)
+                if matched:
+                    total += value
+            return total
+
+        return count
+
     def _get_aggregator_functor(self, logic, subj):
         if logic in ('within', "over") and not self.percentage:
             if subj in ('hits',) or subj.startswith('succ') or subj.startswith('fail') or subj.startswith('rc'):
                 return self._within_aggregator_sum
+            elif subj.startswith('p'):
+                return self._within_aggregator_percentile
 
         return super(DataCriterion, self)._get_aggregator_functor(logic, subj)
 
@@ -113,7 +113,7 @@ class PBenchExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstall
     def install_required_tools(self):
         self.tool = self._get_tool(PBench, config=self.settings)
 
-        if not self.tool.check_if_installed():
+        if not self.tool.is_installed():
             self.tool.install()
 
     def get_error_diagnostics(self):
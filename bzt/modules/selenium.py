@@ -108,7 +108,7 @@ class SeleniumExecutor(AbstractSeleniumExecutor, WidgetProvider, FileLister, Hav
                            self._get_tool(GeckoDriver, config=self.settings.get('geckodriver'))]
 
         for tool in self.webdrivers:
-            if not tool.check_if_installed():
+            if not tool.is_installed():
                 self.log.info("Installing %s...", tool.tool_name)
                 tool.install()
 
@@ -139,7 +139,7 @@ class AndroidEmulatorLoader(Service):
                 raise TaurusConfigError(message)
 
         tool = AndroidEmulator(tool_path=self.tool_path, log=self.log)
-        if not tool.check_if_installed():
+        if not tool.is_installed():
             tool.install()
 
     def startup(self):
@@ -208,7 +208,7 @@ class AppiumLoader(Service):
                           Appium(tool_path=self.tool_path, log=self.log)]
 
         for tool in required_tools:
-            if not tool.check_if_installed():
+            if not tool.is_installed():
                 tool.install()
 
     def startup(self):
@@ -152,7 +152,7 @@ class SiegeExecutor(ScenarioExecutor, WidgetProvider, HavingInstallableTools, Fi
 
     def install_required_tools(self):
         self.tool = self._get_tool(Siege, config=self.settings)
-        if not self.tool.check_if_installed():
+        if not self.tool.is_installed():
             self.tool.install()
 
     def get_error_diagnostics(self):
@@ -117,7 +117,7 @@ class TsungExecutor(ScenarioExecutor, WidgetProvider, FileLister, HavingInstalla
 
     def install_required_tools(self):
         self.tool = self._get_tool(Tsung, config=self.settings)
-        if not self.tool.check_if_installed():
+        if not self.tool.is_installed():
             self.tool.install()
 
     def get_widget(self):
@@ -0,0 +1,104 @@
+/*
+ * JSR223 Listener script writing samples in Taurus binary KPI format,
+ * read by bzt.modules.jmeter.BinaryKPIReader.
+ *
+ * Parameters: path of records file, strings are written into '<path>.strings'.
+ *
+ * Records file consists of fixed-width little-endian records (60 bytes):
+ *   timeStamp: int64, elapsed: int32, label: int32, responseCode: int32, responseMessage: int32,
+ *   threadName: int32, success: int32, bytes: int64, grpThreads: int32, allThreads: int32,
+ *   Latency: int32, Hostname: int32, Connect: int32
+ * String fields are indexes in strings file, which is sequence of int32 length + UTF-8 bytes.
+ * Strings are always flushed before records that refer them.
+ */
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
+import java.nio.charset.StandardCharsets
+
+class BinaryKPIWriter {
+    static final int RECORD_SIZE = 60
+    static final long FLUSH_INTERVAL = 1000
+
+    final OutputStream records
+    final OutputStream strings
+    final ByteBuffer buffer = ByteBuffer.allocate(RECORD_SIZE * 8192).order(ByteOrder.LITTLE_ENDIAN)
+    final ByteArrayOutputStream newStrings = new ByteArrayOutputStream()
+    final Map<String, Integer> ids = new HashMap<>()
+    final Timer timer = new Timer("BinaryKPIWriter", true)
+
+    BinaryKPIWriter(String filename) {
+        records = new FileOutputStream(filename, true)
+        strings = new FileOutputStream(filename + ".strings", true)
+        timer.scheduleAtFixedRate({ flush() } as TimerTask, FLUSH_INTERVAL, FLUSH_INTERVAL)
+        Runtime.runtime.addShutdownHook(new Thread({ close() }))
+    }
+
+    private int intern(String value) {
+        if (value == null) {
+            value = ""
+        }
+
+        Integer id = ids.get(value)
+        if (id == null) {
+            id = ids.size()
+            ids.put(value, id)
+            byte[] bytes = value.getBytes(StandardCharsets.UTF_8)
+            newStrings.write(ByteBuffer.allocate(4).order(ByteOrder.LITTLE_ENDIAN).putInt(bytes.length).array())
+            newStrings.write(bytes)
+        }
+        return id
+    }
+
+    synchronized void write(sample, String hostname) {
+        if (buffer.remaining() < RECORD_SIZE) {
+            flush()
+        }
+
+        buffer.putLong(sample.timeStamp)
+        buffer.putInt((int) sample.time)
+        buffer.putInt(intern(sample.sampleLabel))
+        buffer.putInt(intern(sample.responseCode))
+        buffer.putInt(intern(sample.responseMessage))
+        buffer.putInt(intern(sample.threadName))
+        buffer.putInt(sample.successful ? 1 : 0)
+        buffer.putLong(sample.bytesAsLong)
+        buffer.putInt(sample.groupThreads)
+        buffer.putInt(sample.allThreads)
+        buffer.putInt((int) sample.latency)
+        buffer.putInt(intern(hostname))
+        buffer.putInt((int) sample.connectTime)
+    }
+
+    synchronized void flush() {
+        if (newStrings.size()) {
+            newStrings.writeTo(strings)
+            newStrings.reset()
+            strings.flush()
+        }
+
+        if (buffer.position()) {
+            records.write(buffer.array(), 0, buffer.position())
+            buffer.clear()
+            records.flush()
+        }
+    }
+
+    synchronized void close() {
+        timer.cancel()
+        flush()
+        records.close()
+        strings.close()
+    }
+}
+
+def key = "taurus.binary-kpi-writer." + Parameters
+def writer
+synchronized (props) {
+    writer = props.get(key)
+    if (writer == null) {
+        writer = new BinaryKPIWriter(Parameters)
+        props.put(key, writer)
+    }
+}
+
+writer.write(sampleResult, sampleEvent.hostname)
@@ -19,7 +19,11 @@ limitations under the License.
 import codecs
 import copy
 import csv
+import ctypes
+import ctypes.util
+import errno
 import fnmatch
+import hashlib
 import itertools
 import json
 import locale
@@ -32,6 +36,7 @@ import re
 import shlex
 import shutil
 import signal
+import struct
 import sys
 import tarfile
 import tempfile
@@ -523,8 +528,186 @@ class Environment(object):
             method(*args, **kwargs)
 
 
+class FileWatcher(object):
+    """
+    Tracks changes of files by watching their directories with Linux inotify, so followed files
+    are touched only after something was written, created, renamed or deleted there.
+    Files whose directories can't be watched are reported as changed on each check (polling).
+    One watcher is shared by all FileReader instances, see `FileReader.watcher`.
+    """
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    MASK = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct("iIII")
+    READ_INTERVAL = 0.01  # events are read once for all readers that check files in a row
+
+    def __init__(self, parent_logger=None):
+        if parent_logger:
+            self.log = parent_logger.getChild(self.__class__.__name__)
+        else:
+            self.log = logging.getLogger(self.__class__.__name__)
+        self.libc = None
+        self.fd = None
+        self.dirs = {}  # directory -> watch descriptor
+        self.watches = {}  # watch descriptor -> directory
+        self.files = set()
+        self.changed = set()
+        self.changed_dirs = set()
+        self.last_read = 0
+        self.__init_inotify()
+
+    def __init_inotify(self):
+        if not sys.platform.startswith('linux'):
+            self.log.debug("Inotify isn't available on %s, files will be polled", sys.platform)
+            return
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        except (OSError, AttributeError) as exc:
+            self.log.debug("Failed to init inotify, files will be polled: %s", exc)
+            return
+
+        if fd < 0:
+            self.log.debug("Failed to init inotify, files will be polled: %s", os.strerror(ctypes.get_errno()))
+            return
+
+        self.libc = libc
+        self.fd = fd
+
+    def follow(self, filename):
+        """
+        Start tracking changes of file, it may not exist yet
+
+        :return: True if changes are tracked with events
+        """
+        path = os.path.abspath(filename)
+        if not self.follow_dir(os.path.dirname(path)):
+            return False
+
+        self.files.add(path)
+        self.changed.add(path)
+        return True
+
+    def follow_dir(self, directory):
+        """
+        Start tracking changes of directory entries
+
+        :return: True if changes are tracked with events
+        """
+        directory = os.path.abspath(directory)
+        if self.fd is None:
+            return False
+
+        if directory not in self.dirs:
+            encoded = directory.encode(sys.getfilesystemencoding()) if isinstance(directory, text_type) else directory
+            wdesc = self.libc.inotify_add_watch(self.fd, encoded, self.MASK)
+            if wdesc < 0:
+                self.log.debug("Can't watch %s, polling it: %s", directory, os.strerror(ctypes.get_errno()))
+                return False
+
+            self.dirs[directory] = wdesc
+            self.watches[wdesc] = directory
+            self.changed_dirs.add(directory)
+
+        return True
+
+    def pop_changed(self, filename):
+        """
+        Check if file could change since previous check
+
+        :rtype: bool
+        """
+        path = os.path.abspath(filename)
+        if os.path.dirname(path) not in self.dirs:
+            return True
+
+        self.__read_events()
+        if path in self.changed:
+            self.changed.remove(path)
+            return True
+        return False
+
+    def pop_dir_changed(self, directory):
+        """
+        Check if entries of directory could change since previous check
+
+        :rtype: bool
+        """
+        directory = os.path.abspath(directory)
+        if directory not in self.dirs:
+            return True
+
+        self.__read_events()
+        if directory in self.changed_dirs:
+            self.changed_dirs.remove(directory)
+            return True
+        return False
+
+    def __read_events(self):
+        if time.time() - self.last_read < self.READ_INTERVAL:
+            return
+
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except OSError as exc:
+                if exc.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+
+            offset = 0
+            while offset < len(buf):
+                wdesc, mask, _, length = self.EVENT_HEADER.unpack_from(buf, offset)
+                offset += self.EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b("\0"))
+                offset += length
+                self.__process_event(wdesc, mask, name)
+
+        self.last_read = time.time()
+
+    def __process_event(self, wdesc, mask, name):
+        if mask & self.IN_Q_OVERFLOW:
+            self.log.debug("Inotify queue overflow, all files are treated as changed")
+            self.changed.update(self.files)
+            self.changed_dirs.update(self.dirs)
+            return
+
+        directory = self.watches.get(wdesc)
+        if directory is None:
+            return
+
+        if mask & self.IN_IGNORED:  # directory was removed, its files will be polled
+            self.log.debug("Directory is not watched anymore: %s", directory)
+            self.watches.pop(wdesc)
+            self.dirs.pop(directory)
+            return
+
+        self.changed_dirs.add(directory)
+        if name:
+            if not isinstance(name, str):
+                name = name.decode(sys.getfilesystemencoding(), 'replace')
+            path = os.path.join(directory, name)
+            if path in self.files:
+                self.changed.add(path)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.dirs.clear()
+            self.watches.clear()
+
+
 class FileReader(object):
     SYS_ENCODING = locale.getpreferredencoding()
+    watcher = None  # FileWatcher shared by all readers, if file events are enabled
 
     def __init__(self, filename="", file_opener=None, parent_logger=None):
         self.fds = None
@@ -545,6 +728,11 @@ class FileReader(object):
         self.decoder = codecs.lookup(self.cp).incrementaldecoder()
         self.fallback_decoder = codecs.lookup(self.SYS_ENCODING).incrementaldecoder(errors='ignore')
         self.offset = 0
+        self.followed = None  # name of file tracked with watcher
+        self.pending = False  # last read got data, maybe there's more
+        self.read_end = 0  # offset where last read stopped, owners may move offset
+        self.rotated = False
+        self.limit = None  # offset to stop reading at, for reading file by chunks
 
     def _readlines(self, hint=None):
         # get generator instead of list (in regular readlines())
@@ -559,6 +747,8 @@ class FileReader(object):
     def is_ready(self):
         if not self.fds:
             if self.name:
+                if not self.__is_changed():
+                    return False
                 if not os.path.isfile(self.name):
                     self.log.debug("File not appeared yet: %s", self.name)
                     return False
@@ -570,11 +760,72 @@ class FileReader(object):
 
             # call opener regardless of the name value as it can use empty name as flag
             self.fds = self.file_opener(self.name)
+            self.pending = True
 
         if self.fds:
             self.name = self.fds.name
             return True
 
+    def __is_changed(self):
+        if self.pending or self.watcher is None or not self.name:
+            return True
+
+        if self.followed != self.name:
+            self.followed = self.name if self.watcher.follow(self.name) else None
+            return True
+
+        return self.watcher.pop_changed(self.name)
+
+    def __is_readable(self):
+        """
+        Check if there might be something new to read, file is opened when it appears
+        """
+        if not self.is_ready():
+            return False
+
+        if self.pending or self.rotated or self.offset != self.read_end:
+            return True
+
+        if not self.__is_changed():
+            return False
+
+        if self.followed:
+            self.__check_rotation()
+        return True
+
+    def __check_rotation(self):
+        """
+        Detect that file was truncated or replaced with new one
+        """
+        if not self.name or not hasattr(self.fds, 'fileno'):
+            return
+
+        try:
+            fstat = os.fstat(self.fds.fileno())
+            stat = os.stat(self.name)
+        except (OSError, ValueError):
+            return
+
+        if (stat.st_dev, stat.st_ino) != (fstat.st_dev, fstat.st_ino):
+            self.log.debug("File was rotated, will reopen it after reading the rest: %s", self.name)
+            self.rotated = True
+        elif fstat.st_size < self.offset:
+            self.log.info("File was truncated, reading from start: %s", self.name)
+            self.offset = self.read_end = 0
+            self.decoder.reset()
+
+    def __after_read(self, size):
+        self.pending = size > 0
+        self.read_end = self.offset
+        if not size and self.rotated:
+            self.log.info("Reopening rotated file: %s", self.name)
+            self.fds.close()
+            self.fds = None
+            self.offset = self.read_end = 0
+            self.decoder.reset()
+            self.rotated = False
+            self.pending = True
+
     def _decode(self, line, last_pass=False):
         try:
             return self.decoder.decode(line, final=last_pass)
@@ -587,30 +838,39 @@ class FileReader(object):
             return self.decoder.decode(line, final=last_pass)
 
     def get_lines(self, size=-1, last_pass=False):
-        if self.is_ready():
+        if last_pass and self.is_ready() or self.__is_readable():
             if last_pass:
                 size = -1
             self.fds.seek(self.offset)
+            start = self.offset
             for line in self._readlines(hint=size):
+                if self.limit is not None and self.offset >= self.limit:
+                    break
                 self.offset += len(line)
                 yield self._decode(line, last_pass)
+            self.__after_read(self.offset - start)
 
     def get_line(self):
         line = ""
-        if self.is_ready():
+        if self.__is_readable() and (self.limit is None or self.offset < self.limit):
             self.fds.seek(self.offset)
             line = self.fds.readline()
             self.offset += len(line)
+            self.__after_read(len(line))
 
         return self._decode(line)
 
     def get_bytes(self, size=-1, last_pass=False, decode=True):
-        if self.is_ready():
+        if last_pass and self.is_ready() or self.__is_readable():
             if last_pass:
                 size = -1
+            if self.limit is not None:
+                left = max(0, self.limit - self.offset)
+                size = left if size < 0 else min(size, left)
             self.fds.seek(self.offset)
             _bytes = self.fds.read(size)
             self.offset += len(_bytes)
+            self.__after_read(len(_bytes))
             if decode:
                 return self._decode(_bytes, last_pass)
             else:
@@ -699,6 +959,19 @@ class MultiPartForm(object):
             body = file_handle.read()
         self.add_file_as_string(fieldname, filename, body, mimetype)
 
+    def add_file_by_path(self, fieldname, path, filename=None, mimetype=None):
+        """
+        Add a file to be uploaded, its contents will be read when form is sent
+
+        :type fieldname: str
+        :type path: str
+        :type filename: str
+        :type mimetype: str
+        """
+        if filename is None:
+            filename = os.path.basename(path)
+        self.add_file_as_string(fieldname, filename, FileContents(path, os.path.getsize(path)), mimetype)
+
     def __convert_to_list(self):
         """Return a string representing the form, including attached files."""
         # Build a list of lists, each containing "lines" of the
@@ -739,6 +1012,8 @@ class MultiPartForm(object):
                 result_list.append(item)
             elif isinstance(item, text_type):
                 result_list.append(item.encode())
+            elif isinstance(item, FileContents):
+                result_list.append(b("").join(item.read_chunks()))
             else:
                 raise TaurusInternalException("Unhandled form data type: %s" % type(item))
 
@@ -746,6 +1021,103 @@ class MultiPartForm(object):
         res_bytes += b("\r\n")
         return res_bytes
 
+    def form_as_stream(self):
+        """
+        represents form contents as file-like object, files added by path are read chunk by chunk while sending
+
+        :rtype: MultiPartStream
+        """
+        parts = []
+        for item in self.__convert_to_list():
+            if isinstance(item, text_type):
+                item = item.encode()
+            elif not isinstance(item, (binary_type, FileContents)):
+                raise TaurusInternalException("Unhandled form data type: %s" % type(item))
+
+            if isinstance(item, FileContents):
+                parts.extend([item, b("\r\n")])
+            elif parts and isinstance(parts[-1], binary_type):
+                parts[-1] += item + b("\r\n")
+            else:
+                parts.append(item + b("\r\n"))
+
+        return MultiPartStream(parts)
+
+
+class FileContents(object):
+    """
+    Contents of file to be read lazily, limited to size file had when added
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def read_chunks(self):
+        remaining = self.size
+        with open(self.path, 'rb') as fds:
+            while remaining > 0:
+                chunk = fds.read(min(self.CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise TaurusInternalException("File was truncated while reading: %s" % self.path)
+                remaining -= len(chunk)
+                yield chunk
+
+
+class MultiPartStream(object):
+    """
+    File-like body of multipart form, having known length, so it can be sent by requests without buffering
+
+    :type parts: list[bytes|FileContents]
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.chunks = self.__generate_chunks()
+        self.buffer = b("")
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __generate_chunks(self):
+        for part in self.parts:
+            if isinstance(part, FileContents):
+                for chunk in part.read_chunks():
+                    yield chunk
+            else:
+                yield part
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = self.read(FileContents.CHUNK_SIZE)
+        if not chunk:
+            raise StopIteration
+        return chunk
+
+    next = __next__  # python 2
+
+    def read(self, size=-1):
+        result = []
+        length = 0
+        while size < 0 or length < size:
+            if not self.buffer:
+                self.buffer = next(self.chunks, b(""))
+                if not self.buffer:
+                    break
+
+            count = len(self.buffer) if size < 0 else min(size - length, len(self.buffer))
+            result.append(self.buffer[:count])
+            self.buffer = self.buffer[count:]
+            length += count
+
+        return b("").join(result)
+
 
 def to_json(obj, indent=True):
     """
@@ -1147,10 +1519,188 @@ class ExceptionalDownloader(object):
         return result
 
 
+class ToolChecksCache(object):
+    """
+    Persistent record of successful tool checks, so tools aren't launched on every run.
+    Check result is reused while tool class, path and version are the same,
+    and tool files found by path weren't changed since check (by mtime and size).
+    Tools that can't be found on disk by path are always checked.
+    """
+
+    def __init__(self, filename, parent_logger=None):
+        self.filename = os.path.expanduser(filename)
+        if parent_logger:
+            self.log = parent_logger.getChild(self.__class__.__name__)
+        else:
+            self.log = logging.getLogger(self.__class__.__name__)
+        self.entries = None
+
+    def __load(self):
+        if self.entries is None:
+            self.entries = {}
+            if os.path.isfile(self.filename):
+                try:
+                    with open(self.filename) as fds:
+                        self.entries = json.load(fds)
+                except (IOError, ValueError) as exc:
+                    self.log.debug("Failed to read tool checks from %s: %s", self.filename, exc)
+        return self.entries
+
+    def __save(self):
+        dirname = os.path.dirname(self.filename)
+        try:
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname)
+            tmp_name = "%s.%s" % (self.filename, os.getpid())
+            with open(tmp_name, "w") as fds:
+                json.dump(self.entries, fds, indent=1, sort_keys=True)
+            shutil.move(tmp_name, self.filename)  # readers never see partial file
+        except (IOError, OSError) as exc:
+            self.log.debug("Failed to save tool checks into %s: %s", self.filename, exc)
+
+    @staticmethod
+    def get_key(tool):
+        """
+        :type tool: RequiredTool
+        """
+        return "%s:%s:%s" % (tool.tool_name, tool.tool_path, tool.version)
+
+    @staticmethod
+    def get_fingerprint(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime, stat.st_size]
+
+    def restore(self, key, tool):
+        """
+        Apply recorded check results to tool
+
+        :type tool: RequiredTool
+        :return: True if tool check can be skipped
+        """
+        entry = self.__load().get(key)
+        if not entry:
+            return False
+
+        for path, fingerprint in entry["files"]:
+            if self.get_fingerprint(path) != fingerprint:
+                self.log.debug("Tool file was changed: %s", path)
+                return False
+
+        self.log.debug("Using recorded check of %s", key)
+        tool.tool_path = entry["tool_path"]
+        tool.version = entry["version"]
+        return True
+
+    def record(self, key, tool, paths):
+        """
+        Record successful check of tool
+
+        :type tool: RequiredTool
+        :param paths: tool files to watch
+        """
+        self.__load()
+        files = [[path, self.get_fingerprint(path)] for path in sorted(set(paths))]
+        self.entries[key] = {"tool_path": tool.tool_path, "version": tool.version, "files": files}
+        self.__save()
+
+
+class FilesCache(object):
+    """
+    Directory of cached files sets, each set is stored under key computed from its inputs.
+    Sets that weren't used for max_age seconds are evicted,
+    least recently used ones are evicted when cache grows over max_size bytes.
+    """
+
+    def __init__(self, dirname, max_size, max_age, parent_logger=None):
+        self.dirname = get_full_path(dirname)
+        self.max_size = max_size
+        self.max_age = max_age
+        if parent_logger:
+            self.log = parent_logger.getChild(self.__class__.__name__)
+        else:
+            self.log = logging.getLogger(self.__class__.__name__)
+
+    @staticmethod
+    def get_key(inputs):
+        """
+        Canonical hash of inputs, key order of dicts doesn't matter
+
+        :param inputs: json-serializable object
+        """
+        canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'), cls=ComplexEncoder)
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        :return: directory with cached files, None if there is no entry for key
+        """
+        entry = os.path.join(self.dirname, key)
+        if not os.path.isdir(entry):
+            return None
+
+        try:
+            os.utime(entry, None)  # mark entry as recently used
+        except OSError as exc:
+            self.log.debug("Failed to use cache entry %s: %s", entry, exc)
+            return None
+
+        self.log.debug("Using cache entry %s", entry)
+        return entry
+
+    def put(self, key, files):
+        """
+        Store files set into cache
+
+        :param files: dict of file name -> content (bytes)
+        """
+        entry = os.path.join(self.dirname, key)
+        tmp_entry = "%s.%s" % (entry, os.getpid())
+        try:
+            if not os.path.exists(tmp_entry):
+                os.makedirs(tmp_entry)
+            for name, content in iteritems(files):
+                with open(os.path.join(tmp_entry, name), "wb") as fds:
+                    fds.write(content)
+            if os.path.exists(entry):
+                shutil.rmtree(entry)
+            os.rename(tmp_entry, entry)  # readers never see partial entry
+        except (IOError, OSError) as exc:
+            self.log.debug("Failed to store cache entry %s: %s", entry, exc)
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.dirname):
+            if "." in name:  # entry being stored
+                continue
+            path = os.path.join(self.dirname, name)
+            try:
+                used = os.stat(path).st_mtime
+                size = sum(os.path.getsize(os.path.join(path, fname)) for fname in os.listdir(path))
+            except OSError:  # entry is being written or removed by other process
+                continue
+            entries.append((used, size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for used, size, path in sorted(entries):
+            if time.time() - used > self.max_age or total_size > self.max_size:
+                self.log.debug("Evicting cache entry %s", path)
+                shutil.rmtree(path, ignore_errors=True)
+                total_size -= size
+
+
 class RequiredTool(object):
     """
     Abstract required tool
     """
+    checks_cache = None  # ToolChecksCache shared by all tools, if enabled
+    recheck = False  # verify tools again instead of using recorded checks, results are still recorded
 
     def __init__(self, log=None, tool_path="", download_link="", http_client=None,
                  env=None, version=None, installable=True):
@@ -1176,6 +1726,47 @@ class RequiredTool(object):
 
         self.env = env or Environment(self.log)
 
+    def is_installed(self):
+        """
+        Check if tool is installed, using recorded result of previous check if tool checks cache is enabled
+
+        :rtype: bool
+        """
+        cache = self.checks_cache
+        path = self._find_on_disk(self.tool_path)
+        if cache is None or path is None:
+            return self.check_if_installed()
+
+        key = cache.get_key(self)
+        if not self.recheck and cache.restore(key, self):
+            return True
+
+        result = self.check_if_installed()
+        if result:
+            found = self._find_on_disk(self.tool_path)  # check may have resolved tool path
+            cache.record(key, self, [path, found] if found else [path])
+        return result
+
+    def _find_on_disk(self, path):
+        """
+        Get absolute path of tool file or dir, commands are searched in PATH
+
+        :rtype: str
+        """
+        if not path:
+            return None
+
+        if os.path.exists(path):
+            return os.path.abspath(path)
+
+        if os.path.dirname(path):
+            return None
+
+        for location in (self.env.get("PATH") or "").split(os.pathsep):
+            candidate = os.path.join(location, path)
+            if location and os.path.isfile(candidate):
+                return os.path.abspath(candidate)
+
     def _get_version(self, output):
         return
 
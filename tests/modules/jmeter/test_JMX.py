@@ -1,8 +1,12 @@
 # coding=utf-8
+import fnmatch
+import time
+
 from . import MockJMeterExecutor
 from bzt.engine import Provisioning
 from bzt.jmx import JMX, LoadSettingsProcessor
-from tests import BZTestCase, RESOURCES_DIR
+from bzt.six import etree
+from tests import BZTestCase, RESOURCES_DIR, ROOT_LOGGER
 from tests.mocks import EngineEmul
 
 
@@ -259,7 +263,92 @@ class TestLoadSettingsProcessor(BZTestCase):
         self.assertEqual(res_values, {'TG.01': 2, 'CTG.02': 3, 'STG.03': 4, 'UTG.04': 1, 'ATG.05': 1})
 
 
+def generate_jmx(filename, groups, samplers):
+    jmx = JMX()
+    for group_no in range(groups):
+        children = etree.Element("hashTree")
+        for sampler_no in range(samplers):
+            label = "sampler %s.%s" % (group_no, sampler_no)
+            children.append(JMX._get_http_request("http://localhost/%s" % sampler_no, label, "GET", 0, {}, True))
+            children.append(etree.Element("hashTree"))
+        children.append(JMX._get_cookie_mgr())
+        children.append(etree.Element("hashTree"))
+        jmx.append(JMX.TEST_PLAN_SEL, JMX.get_thread_group(concurrency=1, testname="TG %s" % group_no))
+        jmx.append(JMX.TEST_PLAN_SEL, children)
+    jmx.save(filename)
+
+
 class TestJMX(BZTestCase):
+    def test_index(self):
+        jmx = JMX(RESOURCES_DIR + "/jmeter/jmx/http.jmx")
+        indexed = JMX(RESOURCES_DIR + "/jmeter/jmx/http.jmx")
+        indexed.build_index()
+        selectors = ["ResultCollector", "[testname]", "[testclass=CookieManager]", "[testclass=HTTPSamplerProxy]",
+                     "HTTPSamplerProxy[testclass=HTTPSamplerProxy]", "[testname='Thread Group']", "Absent"]
+
+        for selector in selectors:
+            self.assertEqual(len(jmx.get(selector)), len(indexed.get(selector)), selector)
+
+        for obj in (jmx, indexed):
+            obj.append(JMX.TEST_PLAN_SEL, JMX._get_cookie_mgr())
+            obj.append(JMX.TEST_PLAN_SEL, etree.Element("Absent"))
+            group = obj.get("[testclass=ThreadGroup]")[0]
+            group.getparent().replace(group, JMX.get_thread_group(testname="Thread Group"))
+            obj.invalidate(group)
+
+        for selector in selectors:
+            expected = [(node.tag, node.get("testname")) for node in jmx.get(selector)]
+            self.assertEqual(expected, [(node.tag, node.get("testname")) for node in indexed.get(selector)], selector)
+
+        self.assertEqual(1, len(indexed.get("[testname='Thread Group']")))  # replaced group isn't found
+        self.assertEqual(1, len(indexed.get("Absent")))
+
+    def test_index_modifications(self):
+        jmx = JMX(RESOURCES_DIR + "/jmeter/jmx/http.jmx")
+        indexed = JMX(RESOURCES_DIR + "/jmeter/jmx/http.jmx")
+        indexed.build_index()
+        selectors = ["ResultCollector", "[testname]", "[testclass=HTTPSamplerProxy]", "stringProp", "hashTree"]
+        for selector in selectors:
+            indexed.get(selector)  # fill index
+
+        for obj in (jmx, indexed):
+            obj.remove(obj.get("[testclass=HTTPSamplerProxy]")[0])
+            collector = obj.get("ResultCollector")[0]
+            collector.getparent().remove(collector)  # plain etree removal
+            obj.set_enabled("[testclass=HTTPSamplerProxy]", False)
+            obj.set_text("stringProp", "changed")
+
+        for selector in selectors + ["[enabled=false]"]:
+            expected = [(node.tag, node.get("testname"), node.text) for node in jmx.get(selector)]
+            actual = [(node.tag, node.get("testname"), node.text) for node in indexed.get(selector)]
+            self.assertEqual(expected, actual, selector)
+
+    def test_index_benchmark(self):
+        jmx_file = EngineEmul().create_artifact("large", ".jmx")
+        generate_jmx(jmx_file, groups=10, samplers=100)
+
+        disabled = []
+        for use_index in (False, True):
+            start = time.time()
+            jmx = JMX(jmx_file)
+            if use_index:
+                jmx.build_index()
+
+            for listener in jmx.get("ResultCollector"):
+                listener.set("enabled", "false")
+            for node in jmx.get("[testclass=CookieManager]"):
+                node.append(JMX._string_prop("CookieManager.implementation", "HC4CookieHandler"))
+            for candidate in jmx.get("[testname]"):
+                if fnmatch.fnmatch(candidate.get("testname"), "sampler 1*"):
+                    jmx.set_enabled("[testname='%s']" % candidate.get("testname"), False)
+
+            duration = time.time() - start
+            ROOT_LOGGER.info("Index %s: %s elements modified in %.2fs",
+                             use_index, len(list(jmx.tree.iter())), duration)
+            disabled.append(len(jmx.get("[enabled=false]")))
+
+        self.assertEqual([100, 100], disabled)
+
     def test_jmx_unicode_checkmark(self):
         obj = JMX()
         res = obj._get_http_request("url", "label", "method", 0, {"param": u"✓"}, True)
@@ -290,6 +379,13 @@ class TestJMX(BZTestCase):
         self.assertEqual("code", res.find(".//stringProp[@name='RegexExtractor.useHeaders']").text)
         self.assertIsNone(res.find(".//stringProp[@name='Sample.scope']"))
 
+    def test_binary_kpi_listener(self):
+        res = JMX.new_binary_kpi_listener("kpi.bjtl", "writer.groovy")
+        self.assertEqual("JSR223Listener", res.tag)
+        self.assertEqual("kpi.bjtl", res.find(".//stringProp[@name='parameters']").text)
+        self.assertEqual("writer.groovy", res.find(".//stringProp[@name='filename']").text)
+        self.assertEqual("groovy", res.find(".//stringProp[@name='scriptLanguage']").text)
+
     def test_int_udv(self):
         res = JMX()
         data = {"varname2": "1", "varname": 1, 2: 3}
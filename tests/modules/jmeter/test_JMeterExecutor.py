@@ -2,10 +2,17 @@
 import json
 import os
 import shutil
+import tempfile
 import time
+
 from unittest import skipUnless, skipIf
 from distutils.version import LooseVersion
 
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
 import yaml
 
 from bzt import ToolError, TaurusConfigError, TaurusInternalException
@@ -70,6 +77,48 @@ class TestJMeterExecutor(ExecutorTestCase):
         self.obj.execution.merge({"scenario": {"script": RESOURCES_DIR + "/jmeter/jmx/dummy.jmx"}})
         self.obj.prepare()
 
+    def test_compile_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        config = {
+            "execution": {"scenario": {"requests": ["http://blazedemo.com/"], "think-time": "1s"}},
+            "modules": {"jmeter": {"compile-cache": cache_dir}}}
+        self.configure(config)
+        self.obj.prepare()
+        entries = os.listdir(cache_dir)
+        self.assertEqual(1, len(entries))
+        with open(os.path.join(cache_dir, entries[0], "requests.jmx"), "a") as fds:
+            fds.write("<!-- cached -->")
+
+        self.setUp()  # next run uses compiled jmx
+        self.configure(config)
+        self.obj.prepare()
+        with open(self.obj.original_jmx) as fds:
+            self.assertIn("<!-- cached -->", fds.read())
+
+        self.setUp()
+        config["execution"]["scenario"]["think-time"] = "2s"
+        self.configure(config)
+        self.obj.prepare()
+        self.assertEqual(2, len(os.listdir(cache_dir)))
+
+        self.setUp()  # any executor setting is part of key
+        config["modules"]["jmeter"]["xml-jtl-flags"] = {"responseData": True}
+        self.configure(config)
+        self.obj.prepare()
+        self.assertEqual(3, len(os.listdir(cache_dir)))
+
+        self.setUp()  # as well as Taurus version
+        self.configure(config)
+        with mock.patch("bzt.modules.jmeter.VERSION", "0.0.0"):
+            self.obj.prepare()
+        self.assertEqual(4, len(os.listdir(cache_dir)))
+
+    def test_compile_cache_default(self):
+        self.configure({"execution": {"scenario": {"requests": ["http://blazedemo.com/"]}}})
+        with mock.patch("bzt.modules.jmeter.FilesCache") as files_cache:
+            self.obj.prepare()
+        files_cache.assert_not_called()
+
     def test_jmx_with_props(self):
         self.configure({"execution": {
             "concurrency": 10,
@@ -803,6 +852,17 @@ class TestJMeterExecutor(ExecutorTestCase):
         for writer in writers:
             self.assertEqual('true', writer.find('objProp/value/hostname').text)
 
+    def test_binary_kpi_distributed(self):
+        self.obj.execution.merge({"scenario": {"script": RESOURCES_DIR + "/jmeter/jmx/http.jmx"},
+                                  "distributed": ["127.0.0.1"]})
+        self.obj.settings["kpi-format"] = "binary"
+        self.obj.prepare()
+        self.assertTrue(self.obj.kpi_jtl.endswith(".jtl"))
+        self.assertEqual("csv", self.obj.kpi_format)
+        xml_tree = etree.fromstring(open(self.obj.modified_jmx, "rb").read())
+        self.assertEqual([], xml_tree.findall(".//JSR223Listener"))
+        self.assertEqual(1, len(xml_tree.findall(".//ResultCollector[@testname='KPI Writer']")))
+
     def test_distributed_props(self):
         self.sniff_log(self.obj.log)
 
@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from . import MockJMeter
 from tests import BZTestCase, RESOURCES_DIR
 
@@ -33,3 +36,46 @@ class TestJMeterTool(BZTestCase):
 
         self.assertIn(jmx_file + " not found", self.log_recorder.warn_buff.getvalue())
 
+    def test_plugins_cache(self):
+        jmeter_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(jmeter_dir, "lib", "ext"))
+        self.obj.tool_path = os.path.join(jmeter_dir, "bin", "jmeter")
+        jmx_file = RESOURCES_DIR + "/jmeter/jmx/http.jmx"
+
+        self.obj.reaction = [{"output": ("one", "two")}]
+        self.obj.install_for_jmx(jmx_file)
+        self.assertEqual(0, len(self.obj.reaction))
+
+        self.obj.install_for_jmx(jmx_file)  # no reaction left, pmgr mustn't be called
+
+        with open(os.path.join(jmeter_dir, "lib", "ext", "jmeter-plugins-casutg-2.6.jar"), "w") as fds:
+            fds.write("jar")
+        self.obj.reaction = [{"output": ("one", "two")}]
+        self.obj.install_for_jmx(jmx_file)
+        self.assertEqual(0, len(self.obj.reaction))
+
+    def test_plugins_cache_failure(self):
+        jmeter_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(jmeter_dir, "lib", "ext"))
+        self.obj.tool_path = os.path.join(jmeter_dir, "bin", "jmeter")
+        jmx_file = RESOURCES_DIR + "/jmeter/jmx/http.jmx"
+
+        self.obj.reaction = [{"output": ("Failed to download jpgc-casutg from https://example.com", "")}]
+        self.obj.install_for_jmx(jmx_file)
+
+        self.obj.reaction = [{"output": ("one", "two")}]
+        self.obj.install_for_jmx(jmx_file)  # failed installation isn't cached
+        self.assertEqual(0, len(self.obj.reaction))
+
+        self.obj.install_for_jmx(jmx_file)
+
+    def test_plugins_cache_normal_output(self):
+        jmeter_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(jmeter_dir, "lib", "ext"))
+        self.obj.tool_path = os.path.join(jmeter_dir, "bin", "jmeter")
+        jmx_file = RESOURCES_DIR + "/jmeter/jmx/http.jmx"
+
+        out = "INFO: Plugins are installed: jpgc-casutg, jpgc-json (error handling and exceptions logging fixed)"
+        self.obj.reaction = [{"output": (out, "WARNING: failed reflective access is not an error")}]
+        self.obj.install_for_jmx(jmx_file)
+        self.obj.install_for_jmx(jmx_file)  # recorded, no reaction left, pmgr mustn't be called
@@ -1,18 +1,51 @@
 # coding=utf-8
+import csv
+import io
 import json
 import os
+import struct
 import sys
 import time
 import unittest
 
+import numpy
+
 from bzt.modules.aggregator import DataPoint, KPISet
-from bzt.modules.jmeter import JTLErrorsReader, JTLReader, FuncJTLReader
-from bzt.six import PY2
-from bzt.utils import to_json
+from bzt.modules.jmeter import JTLErrorsReader, JTLReader, FuncJTLReader, BinaryKPIReader, IncrementalCSVReader
+from bzt.six import PY2, unicode_decode
+from bzt.utils import to_json, guess_csv_dialect, temp_file
 from tests import BZTestCase, RESOURCES_DIR, close_reader_file, ROOT_LOGGER
 from tests.mocks import EngineEmul
 
 
+def write_binary_kpi(csv_filename, filename):
+    """
+    Convert CSV KPI file into binary format the same way as binary-kpi-writer.groovy does
+    """
+    with io.open(csv_filename, encoding='utf-8') as fds:
+        header = fds.readline()
+        dialect = guess_csv_dialect(header, force_doublequote=True)
+        rows = list(csv.DictReader(fds, header.strip().split(dialect.delimiter), dialect=dialect))
+
+    strings = {}
+    records = numpy.zeros(len(rows), dtype=BinaryKPIReader.RECORD)
+    for record, row in zip(records, rows):
+        for field in BinaryKPIReader.RECORD.names:
+            value = row.get(field, '')
+            if field in BinaryKPIReader.STRING_FIELDS:
+                record[field] = strings.setdefault(value, len(strings))
+            elif field == "success":
+                record[field] = value == "true"
+            else:
+                record[field] = int(value or 0)
+
+    records.tofile(filename)
+    with open(filename + BinaryKPIReader.STRINGS_SUFFIX, 'wb') as fds:
+        for string in sorted(strings, key=strings.get):
+            string = string.encode('utf-8')
+            fds.write(struct.pack("<i", len(string)) + string)
+
+
 class TestFuncJTLReader(BZTestCase):
     def setUp(self):
         super(TestFuncJTLReader, self).setUp()
@@ -104,6 +137,46 @@ class TestFuncJTLReader(BZTestCase):
                                   "isFailed": True,
                                   "errorMessage": "Test failed: text expected to contain /something/"})
 
+    def test_functional_reader_streaming(self):
+        for jtl in ("trace.jtl", "standard-errors.jtl", "cookies.jtl", "unicode-reqs.jtl"):
+            self.configure(RESOURCES_DIR + "/jmeter/jtl/" + jtl)
+            expected = list(self.obj.read())
+            close_reader_file(self.obj)
+
+            self.configure(RESOURCES_DIR + "/jmeter/jtl/" + jtl)
+            self.obj.streaming = True
+            self.obj.body_limit = 100
+            samples = list(self.obj.read())
+
+            self.assertEqual(len(expected), len(samples), jtl)
+            for exp_sample, sample in zip(expected, samples):
+                self.assertEqual((exp_sample.status, exp_sample.error_msg), (sample.status, sample.error_msg))
+                self.assertTrue(exp_sample.error_trace.startswith(sample.error_trace))
+                for field in exp_sample.extras:
+                    if field in FuncJTLReader.FILE_EXTRACTED_FIELDS:
+                        with open(exp_sample.extras[field], 'rb') as exp_fds, open(sample.extras[field], 'rb') as fds:
+                            self.assertEqual(exp_fds.read(), fds.read())
+                    else:
+                        self.assertEqual(exp_sample.extras[field], sample.extras[field], field)
+
+    def test_functional_reader_streaming_large_body(self):
+        jtl_file = temp_file()
+        body = u"<html>чсмт</html>" * 100000
+        with io.open(jtl_file, "w", encoding="utf-8") as fds:
+            fds.write(u'<?xml version="1.0" encoding="UTF-8"?>\n<testResults version="1.2">\n')
+            fds.write(u'<httpSample t="1" ts="1489492771539" s="true" lb="large" rc="200" rm="OK" tn="TG 1-1">\n')
+            fds.write(u'<responseData class="java.lang.String">%s</responseData>\n' % body.replace("<", "&lt;"))
+            fds.write(u'</httpSample>\n</testResults>\n')
+
+        self.configure(jtl_file)
+        self.obj.streaming = True
+        self.obj.body_limit = 1000
+        samples = list(self.obj.read())
+        self.assertEqual(1, len(samples))
+        self.assertEqual(len(body), samples[0].extras["responseBodySize"])
+        with io.open(samples[0].extras["responseBody"], encoding="utf-8") as fds:
+            self.assertEqual(body, fds.read())
+
     def test_functional_reader_extras_empty_body(self):
         self.configure(RESOURCES_DIR + "/jmeter/jtl/cookies.jtl")
         samples = list(self.obj.read())
@@ -247,6 +320,49 @@ class TestJTLErrorsReader(BZTestCase):
         self.assertEquals(KPISet.ERRTYPE_ERROR, values[''][0]['type'])
         self.assertEquals('200', values[''][0]['rc'])
 
+    def test_lean_parsing(self):
+        for jtl in ("resource-errors-main-assert.jtl", "resource-errors-child-assert.jtl", "error-bug1.jtl",
+                    "error-puzzle.jtl", "resource_tc.jtl", "nonstandard-unicode.jtl", "standard-errors.jtl",
+                    "resource-error-embedded.jtl", "error-parsing.jtl"):
+            self.configure(RESOURCES_DIR + "/jmeter/jtl/" + jtl)
+            self.obj.read_file(final_pass=True)
+            expected = to_json(self.obj.get_data(sys.maxsize))
+            close_reader_file(self.obj)
+
+            self.configure(RESOURCES_DIR + "/jmeter/jtl/" + jtl)
+            self.obj.lean = True
+            self.obj.read_file(final_pass=True)
+            self.assertEqual(expected, to_json(self.obj.get_data(sys.maxsize)))
+            close_reader_file(self.obj)
+
+    def test_buffer_limit(self):
+        def count(values):
+            return sum(item['cnt'] for item in values.get('', []))
+
+        self.configure(RESOURCES_DIR + "/jmeter/jtl/error-bug1.jtl")
+        self.obj.read_file(final_pass=True)
+        self.assertFalse(self.obj.get_data(0))
+        total = count(self.obj.get_data(sys.maxsize))
+        self.assertEqual(0, self.obj.buffered_items)
+        close_reader_file(self.obj)
+
+        self.configure(RESOURCES_DIR + "/jmeter/jtl/error-bug1.jtl")
+        self.obj.buffer_limit = 5
+        self.obj.read_file(final_pass=True)
+        self.assertLessEqual(self.obj.buffered_items, 5)
+        released = count(self.obj.get_data(0))  # evicted seconds are reported right away
+        self.assertGreater(released, 0)
+        self.assertEqual(total, released + count(self.obj.get_data(sys.maxsize)))
+        close_reader_file(self.obj)
+
+        self.configure(RESOURCES_DIR + "/jmeter/jtl/error-bug1.jtl")
+        self.obj.buffer_limit = 5
+        self.obj.eviction = "drop"
+        self.obj.read_file(final_pass=True)
+        self.assertFalse(self.obj.get_data(0))
+        self.assertGreater(self.obj.dropped_errors, 0)
+        self.assertEqual(total, self.obj.dropped_errors + count(self.obj.get_data(sys.maxsize)))
+
     @unittest.skipUnless(sys.platform == "darwin" and sys.version_info >= (3, 0), "MacOS- and Python3-only")
     def test_macos_unicode_parsing_is_not_supported(self):
         self.configure(RESOURCES_DIR + "/jmeter/jtl/standard-errors.jtl")
@@ -293,6 +409,144 @@ class TestJTLReader(BZTestCase):
         self.configure(RESOURCES_DIR + "/jmeter/jtl/quote-guessing-crash.jtl")
         list(self.obj.datapoints(final_pass=True))
 
+    def test_csv_reader_incremental(self):
+        with open(RESOURCES_DIR + "/jmeter/jtl/unicode.jtl", 'rb') as fds:
+            data = fds.read()
+
+        expected = IncrementalCSVReader(ROOT_LOGGER, RESOURCES_DIR + "/jmeter/jtl/unicode.jtl")
+        expected_rows = expected.read(last_pass=True)
+        close_reader_file(expected)
+
+        jtl = temp_file()
+        reader = IncrementalCSVReader(ROOT_LOGGER, jtl)
+        rows = []
+        with open(jtl, 'wb') as fds:
+            for pos in range(0, len(data), 1000):  # cuts lines and multibyte chars
+                fds.write(data[pos:pos + 1000])
+                fds.flush()
+                rows.extend(reader.read())
+
+        rows.extend(reader.read(last_pass=True))
+        close_reader_file(reader)
+        self.assertEqual(expected.indexes, reader.indexes)
+        self.assertEqual(expected_rows, rows)
+        self.assertEqual(u"САП.АутентифицироватьРасш", unicode_decode(rows[0][reader.indexes["label"]]))
+
+    def test_csv_reader_speed(self):
+        with open(RESOURCES_DIR + "/jmeter/jtl/simple.kpi.jtl") as fds:
+            header = fds.readline()
+            lines = fds.readlines()
+
+        jtl = temp_file()
+        with open(jtl, 'w') as fds:
+            fds.write(header)
+            for _ in range(10 * 1024 * 1024 // len("".join(lines))):
+                fds.writelines(lines)
+
+        size = os.path.getsize(jtl) / 1024.0 / 1024.0
+        speeds = []
+        for columnar in (False, True):
+            reader = IncrementalCSVReader(ROOT_LOGGER, jtl)
+            read = reader.read_columns if columnar else reader.read
+            start = time.time()
+            while reader.file.offset < size * 1024 * 1024:
+                read()
+            speeds.append(size / (time.time() - start))
+            close_reader_file(reader)
+
+        ROOT_LOGGER.info("CSV reading speed, MB/s (rows, columns): %s", speeds)
+
+    def test_columnar_reader(self):
+        def get_kpis():
+            return [to_json([x[DataPoint.TIMESTAMP], x[DataPoint.CURRENT], x[DataPoint.CUMULATIVE]])
+                    for x in self.obj.datapoints(final_pass=True)]
+
+        for jtl in ("simple.kpi.jtl", "tranctl.jtl", "tabs.jtl", "unicode.jtl", "slow-stdev.jtl"):
+            self.configure(RESOURCES_DIR + "/jmeter/jtl/" + jtl)
+            expected = get_kpis()
+            close_reader_file(self.obj.csvreader)
+
+            self.configure(RESOURCES_DIR + "/jmeter/jtl/" + jtl)
+            self.obj.columnar = True
+            self.assertEqual(expected, get_kpis())
+
+    def test_binary_reader(self):
+        def get_kpis():
+            return [to_json([x[DataPoint.TIMESTAMP], x[DataPoint.CURRENT], x[DataPoint.CUMULATIVE]])
+                    for x in self.obj.datapoints(final_pass=True)]
+
+        for jtl, distributed in (("simple.kpi.jtl", True), ("tranctl.jtl", False), ("tabs.jtl", False),
+                                 ("unicode.jtl", False), ("slow-stdev.jtl", True)):
+            self.configure(RESOURCES_DIR + "/jmeter/jtl/" + jtl)
+            self.obj.is_distributed = distributed
+            expected = get_kpis()
+            close_reader_file(self.obj.csvreader)
+
+            binary = temp_file()
+            write_binary_kpi(RESOURCES_DIR + "/jmeter/jtl/" + jtl, binary)
+            self.configure(binary)
+            self.obj.is_distributed = distributed
+            self.obj.binreader = BinaryKPIReader(ROOT_LOGGER, binary)
+            self.assertEqual(expected, get_kpis())
+            self.obj.binreader.close()
+
+    def test_binary_reader_incremental(self):
+        binary = temp_file()
+        write_binary_kpi(RESOURCES_DIR + "/jmeter/jtl/slow-stdev.jtl", binary)
+        with open(binary, 'rb') as fds:
+            data = fds.read()
+
+        size = BinaryKPIReader.RECORD.itemsize
+        with open(binary, 'wb') as fds:
+            fds.write(data[:10 * size + size // 2])
+
+        reader = BinaryKPIReader(ROOT_LOGGER, binary)
+        self.assertEqual(10, len(reader.read()))
+        self.assertIsNone(reader.read())
+
+        with open(binary, 'wb') as fds:
+            fds.write(data)
+        reader.read_limit = 20
+        self.assertEqual(20, len(reader.read()))
+        records = reader.read(last_pass=True)
+        self.assertEqual(len(data) // size - 30, len(records))
+        self.assertEqual("PostedTransactionHistory", reader.strings[records[-1]["label"]])
+
+        reader.close()  # records are still in use, so mapping is kept until they're released
+        self.assertEqual(1, len(reader.retired_maps))
+        del records
+        reader.close()
+        self.assertEqual([], reader.retired_maps)
+
+    def test_binary_to_csv(self):
+        def get_kpis():
+            return [to_json([x[DataPoint.TIMESTAMP], x[DataPoint.CURRENT], x[DataPoint.CUMULATIVE]])
+                    for x in self.obj.datapoints(final_pass=True)]
+
+        self.configure(RESOURCES_DIR + "/jmeter/jtl/unicode.jtl")
+        expected = get_kpis()
+        close_reader_file(self.obj.csvreader)
+
+        binary = temp_file()
+        write_binary_kpi(RESOURCES_DIR + "/jmeter/jtl/unicode.jtl", binary)
+        reader = BinaryKPIReader(ROOT_LOGGER, binary)
+        converted = temp_file()
+        reader.to_csv(converted)
+        reader.close()
+
+        self.configure(converted)
+        self.assertEqual(expected, get_kpis())
+        close_reader_file(self.obj.csvreader)
+
+    def test_columnar_reader_ignored_labels(self):
+        self.configure(RESOURCES_DIR + "/jmeter/jtl/unicode.jtl")
+        self.obj.columnar = True
+        self.obj.ignored_labels = [u"Тест.Эхо"]
+        for point in self.obj.datapoints(final_pass=True):
+            cumulative = point[DataPoint.CUMULATIVE]
+            self.assertIn(u"САП.АутентифицироватьРасш", cumulative)
+            self.assertNotIn(u"Тест.Эхо", cumulative)
+
     def test_stdev_performance(self):
         start = time.time()
         self.configure(RESOURCES_DIR + "/jmeter/jtl/slow-stdev.jtl")
@@ -1,10 +1,13 @@
+import copy
 import json
+import pickle
 import time
+from collections import Counter
 
 from bzt.utils import to_json
 from tests import BZTestCase, ROOT_LOGGER
 
-from bzt.modules.aggregator import ResultsReader, DataPoint, KPISet
+from bzt.modules.aggregator import ResultsReader, DataPoint, KPISet, SamplesBatch, ErrorsList, RespTimesCounter
 from tests.mocks import r, rc, err, MockReader
 
 
@@ -164,3 +167,213 @@ class TestResultsReader(BZTestCase):
                 rt = float(key)
                 self.assertGreaterEqual(rt, 1.0)
                 self.assertLessEqual(rt, 2.0)
+
+    def test_cumulative_snapshot(self):
+        mock = MockReader()
+        mock.buffer_scale_idx = '100.0'
+        mock.data.append((1, "a", 1, 1, 1, 1, 200, None, '', 0))
+        mock.data.append((2, "a", 1, 2, 2, 2, 500, "Some Error", '', 0))
+        mock.data.append((3, "a", 1, 3, 3, 3, 200, None, '', 0))
+        mock.data.append((4, "a", 1, 4, 4, 4, 200, None, '', 0))
+
+        list(mock.datapoints(True))
+        first = mock.results[0][DataPoint.CUMULATIVE]['a']
+        self.assertEqual(1, first[KPISet.SAMPLE_COUNT])
+        self.assertEqual(1, len(first[KPISet.RESP_TIMES]))
+        self.assertEqual({200: 1}, dict(first[KPISet.RESP_CODES]))
+        self.assertEqual([], first[KPISet.ERRORS])
+        self.assertEqual(1.0, first[KPISet.PERCENTILES]['100.0'])
+
+        second = mock.results[1][DataPoint.CUMULATIVE]['a']
+        self.assertEqual(2, len(second[KPISet.RESP_TIMES]))
+        self.assertEqual(1, second[KPISet.ERRORS][0]['cnt'])
+
+        last = mock.results[-1][DataPoint.CUMULATIVE]['a']
+        self.assertEqual(4, len(last[KPISet.RESP_TIMES]))
+        self.assertEqual(4.0, last[KPISet.PERCENTILES]['100.0'])
+
+        # listener changes must not leak into aggregator state
+        second.merge_kpis(copy.deepcopy(last))
+        second[KPISet.ERRORS][0]['cnt'] += 10
+        self.assertEqual(6, len(second[KPISet.RESP_TIMES]))
+        self.assertEqual(4, len(mock.cumulative['a'][KPISet.RESP_TIMES]))
+        self.assertEqual(1, mock.cumulative['a'][KPISet.ERRORS][0]['cnt'])
+        self.assertEqual(4, len(last[KPISet.RESP_TIMES]))
+
+    def test_speed_labels(self):
+        res = {}
+        for labels_count in (10, 100, 500):
+            mock = MockReader()
+            mock.buffer_scale_idx = '100.0'
+            mock.generalize_labels = 0
+            for second in range(10):
+                for label in range(labels_count):
+                    sample = (second, "label%s" % label, 1, r(1000), r(1000), r(1000), rc(), err(), '', 0)
+                    mock.data.append(sample)
+
+            before = time.time()
+            for _ in mock.datapoints(True):
+                pass
+            after = time.time()
+
+            copy.deepcopy(mock.cumulative)
+            deep_copied = time.time()
+
+            mock._get_cumulative_snapshot()
+            snapshotted = time.time()
+
+            res[labels_count] = (after - before, deep_copied - after, snapshotted - deep_copied)
+            ROOT_LOGGER.info("Times by label count (aggregate, deepcopy, snapshot): %s", res)
+            self.assertEqual(labels_count + 1, len(mock.results[-1][DataPoint.CUMULATIVE]))
+
+            # histograms of published cumulative snapshots must not be copied
+            copied = [kpiset for point in mock.results for kpiset in point[DataPoint.CUMULATIVE].values()
+                      if kpiset[KPISet.RESP_TIMES]._base is None]
+            self.assertEqual([], copied)
+
+    def test_resp_times_snapshot(self):
+        counter = RespTimesCounter(1, 60 * 1000, 3)
+        counter.track_incrementally()
+        counter.add_values([r() for _ in range(100)])
+        other = RespTimesCounter(1, 60 * 1000, 3)
+        other.add(0.5, 3)
+
+        snapshots = []
+        for step in range(RespTimesCounter.JOURNAL_LIMIT + 10):
+            snapshot = counter.snapshot()
+            snapshots.append((snapshot, copy.deepcopy(counter), snapshot.snapshot()))
+            if step % 3 == 0:
+                counter.add(r())
+            elif step % 3 == 1:
+                counter.merge(other)
+            else:
+                counter.remove_counts(other.get_nonzero_counts())
+
+        counter.add(120.0)  # grows histogram
+        counter.add(r())
+        for snapshot, expected, nested in snapshots:
+            for actual in (snapshot, nested):
+                self.assertEqual(len(expected), len(actual))
+                self.assertEqual(expected.get_percentiles_dict(), actual.get_percentiles_dict())
+                self.assertEqual(expected.histogram.counts.tolist(), actual.histogram.counts.tolist())
+
+    def test_add_samples(self):
+        samples = [("", 1, r(), r(), r(), rc(), err(), '', 10) for _ in range(1000)]
+        samples.append(("", None, 1.5, None, 0.1, None, None, None, None))
+        samples.append(("", 2, 2000.0, 0.1, 0.1, "500", "Timeout", "tn", 5))
+        samples.append(("", 3, -1.0, 0.1, 0.1, "Exception", "", "tn", 5))
+
+        expected = KPISet(self.obj.track_percentiles)
+        for label, cnc, r_time, con_time, latency, r_code, error, trname, byte_count in samples:
+            expected.add_sample((cnc, r_time, con_time, latency, r_code, error, trname, byte_count))
+
+        actual = KPISet(self.obj.track_percentiles)
+        actual.add_samples(SamplesBatch.from_samples(1, samples))
+
+        self.assertEqual(to_json(expected.recalculate()), to_json(actual.recalculate()))
+
+    def test_speed_errors(self):
+        res = {}
+        for variety in (10, 100, 1000):
+            items = [KPISet.error_item_skel("Error #%s" % num, "500", 1, KPISet.ERRTYPE_ERROR, Counter(), None)
+                     for num in range(variety)]
+
+            timings = []
+            for errors in (ErrorsList(), []):
+                before = time.time()
+                for _ in range(10):
+                    for item in items:
+                        KPISet.inc_list(errors, ("msg", item['msg']), item)
+                timings.append(time.time() - before)
+
+                self.assertEqual(variety, len(errors))
+                self.assertEqual(10 * variety, sum(item['cnt'] for item in errors))
+
+            res[variety] = timings
+            ROOT_LOGGER.info("Error merge times by variety (indexed, plain list): %s", res)
+
+    def test_errors_list(self):
+        kpiset = KPISet()
+        kpiset[KPISet.ERRORS] = [KPISet.error_item_skel("first", "500", 1, KPISet.ERRTYPE_ERROR, Counter(), None)]
+        errors = kpiset[KPISet.ERRORS]
+        self.assertIsInstance(errors, ErrorsList)
+
+        errors.append(KPISet.error_item_skel("second", "500", 1, KPISet.ERRTYPE_ERROR, Counter({"url": 1}), None))
+        errors.inc(KPISet.error_item_skel("second", "404", 2, KPISet.ERRTYPE_ERROR, Counter({"url": 1}), None))
+        errors.inc(KPISet.error_item_skel("third", "404", 1, KPISet.ERRTYPE_ERROR, Counter(), None))
+        self.assertEqual([1, 3, 1], [item['cnt'] for item in errors])
+        self.assertEqual(Counter({"url": 2}), errors[1]['urls'])
+
+        copied = copy.deepcopy(kpiset)[KPISet.ERRORS]
+        copied.inc(KPISet.error_item_skel("first", "500", 1, KPISet.ERRTYPE_ERROR, Counter(), None))
+        self.assertEqual([2, 3, 1], [item['cnt'] for item in copied])
+        self.assertEqual([1, 3, 1], [item['cnt'] for item in errors])
+
+        # same-length modifications must not leave index stale
+        errors[0] = KPISet.error_item_skel("fourth", "500", 1, KPISet.ERRTYPE_ERROR, Counter(), None)
+        errors.inc(KPISet.error_item_skel("first", "500", 1, KPISet.ERRTYPE_ERROR, Counter(), None))
+        self.assertEqual(["fourth", "second", "third", "first"], [item['msg'] for item in errors])
+        errors.remove(errors[-1])
+        errors.insert(0, KPISet.error_item_skel("first", "500", 5, KPISet.ERRTYPE_ERROR, Counter(), None))
+        errors.inc(KPISet.error_item_skel("first", "500", 1, KPISet.ERRTYPE_ERROR, Counter(), None))
+        self.assertEqual([6, 1, 3, 1], [item['cnt'] for item in errors])
+
+        pickled = pickle.loads(pickle.dumps(errors))
+        pickled.inc(KPISet.error_item_skel("third", "500", 1, KPISet.ERRTYPE_ERROR, Counter(), None))
+        self.assertEqual([6, 1, 3, 2], [item['cnt'] for item in pickled])
+
+    def test_incremental_percentiles(self):
+        levels = [0.0, 50.0, 90.0, 99.0, 100.0]
+        incremental = KPISet(levels)
+        incremental[KPISet.RESP_TIMES].track_incrementally()
+        walked = KPISet(levels)
+        snapshots = []
+
+        for second in range(100):
+            current = KPISet(levels)
+            for _ in range(20):
+                r_time = r(second % 10 + 1) if second != 50 else r(7000)  # grows histogram
+                current[KPISet.SAMPLE_COUNT] += 1
+                current.sum_rt += r_time
+                current[KPISet.RESP_TIMES].add(r_time)
+            current.recalculate()
+
+            incremental.merge_kpis(current)
+            incremental.recalculate()
+            walked.merge_kpis(current)
+            walked.recalculate()
+
+            self.assertEqual(walked[KPISet.PERCENTILES], incremental[KPISet.PERCENTILES])
+            self.assertAlmostEqual(walked[KPISet.STDEV_RESP_TIME], incremental[KPISet.STDEV_RESP_TIME], places=12)
+            snapshots.append((incremental.snapshot(), copy.deepcopy(walked[KPISet.PERCENTILES])))
+
+        for snapshot, percentiles in snapshots:
+            self.assertEqual(percentiles, snapshot[KPISet.PERCENTILES])
+
+    def test_speed_percentiles(self):
+        levels = [0.0, 50.0, 90.0, 95.0, 99.0, 99.9, 100.0]
+        currents = []
+        for second in range(50):
+            current = KPISet(levels)
+            for _ in range(100):
+                r_time = r(4000 if second % 10 else 5)
+                current[KPISet.SAMPLE_COUNT] += 1
+                current.sum_rt += r_time
+                current[KPISet.RESP_TIMES].add(r_time)
+            currents.append(current.recalculate())
+
+        timings = []
+        for incremental in (False, True):
+            cumulative = KPISet(levels)
+            if incremental:
+                cumulative[KPISet.RESP_TIMES].track_incrementally()
+
+            before = time.time()
+            for current in currents:
+                cumulative.merge_kpis(current)
+                cumulative.recalculate()
+                self.assertTrue(cumulative[KPISet.PERCENTILES])
+                self.assertTrue(cumulative[KPISet.STDEV_RESP_TIME])
+            timings.append(time.time() - before)
+
+        ROOT_LOGGER.info("Cumulative percentiles time (full walk, incremental): %s", timings)
@@ -3,16 +3,19 @@ import logging
 import math
 import os
 import shutil
+import threading
 import time
+import zlib
 from io import BytesIO
 
 from bzt import TaurusException
 from bzt.bza import Master, Session
 from bzt.modules.aggregator import DataPoint, KPISet
 from bzt.modules.blazemeter import BlazeMeterUploader
-from bzt.modules.blazemeter import MonitoringBuffer
+from bzt.modules.blazemeter import MonitoringBuffer, AsyncSender
 from bzt.six import HTTPError
 from bzt.six import iteritems, viewvalues
+from bzt.utils import to_json
 from tests import BZTestCase, random_datapoint, RESOURCES_DIR, ROOT_LOGGER
 from tests.mocks import EngineEmul, BZMock
 
@@ -246,6 +249,89 @@ class TestBlazeMeterUploader(BZTestCase):
         self.assertEquals('direct', obj._session['id'])
         self.assertEqual(9, len(mock.requests), "Requests were: %s" % mock.requests)
 
+    def test_async_sending(self):
+        kpi_url = 'https://data.blazemeter.com/submit.php?session_id=direct&signature=sign&test_id=None&user_id=None' \
+                  '&pq=0&target=labels_bulk&update=1'
+        obj = BlazeMeterUploader()
+        obj.engine = EngineEmul()
+        mock = BZMock(obj._user)
+        mock.mock_post.update({
+            kpi_url: [
+                IOError("kpi push expected fail"),
+                {},
+                {"result": {'session': {"statusCode": 140, 'status': 'ENDED'}}},
+                {},
+            ],
+            'https://data.blazemeter.com/api/v4/image/direct/files?signature=sign': {"result": True},
+            'https://data.blazemeter.com/submit.php?session_id=direct&signature=sign&test_id=None&user_id=None'
+            '&pq=0&target=engine_health&update=1': {'result': {'session': {}}},
+            'https://a.blazemeter.com/api/v4/sessions/direct/stop': {"result": True},
+        })
+        obj.parameters['session-id'] = 'direct'
+        obj.parameters['signature'] = 'sign'
+        obj.parameters['upload-artifacts'] = False
+        obj.settings['token'] = 'FakeToken'
+        obj.settings['send-async'] = True
+        obj.prepare()
+        obj._user.timeout = 0.1
+        obj.startup()
+
+        for x in range(10):
+            obj.aggregated_second(random_datapoint(x))
+        obj.check()  # returns immediately, failed sending is retried in background
+
+        deadline = time.time() + 10
+        while obj.sender.get_stats().get("sent", 0) < 10 and time.time() < deadline:
+            time.sleep(0.01)
+        stats = obj.sender.get_stats()
+        self.assertEqual(10, stats["sent"])
+        self.assertEqual(1, stats["requests"])  # coalesced into single request
+        self.assertEqual(1, stats["failures"])
+        self.assertEqual(0, stats["queued"])
+
+        obj.aggregated_second(random_datapoint(10))
+        obj.last_dispatch = 0
+        obj.check()
+        while obj.sender.thread.is_alive() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertRaises(KeyboardInterrupt, obj.check)  # test stopped from Web UI
+
+        obj.aggregated_second(random_datapoint(11))
+        obj.shutdown()
+        obj.post_process()
+        self.assertEqual(4, len([req for req in mock.requests if req['url'] == kpi_url]))
+
+    def test_async_sender_queue_limit(self):
+        sent = []
+        sender = AsyncSender(sent.append, sent.append, 5, 1, ROOT_LOGGER)
+        sender.put_kpi([random_datapoint(x) for x in range(4)])
+        sender.put_kpi([random_datapoint(x) for x in range(4, 8)])
+        self.assertEqual({"dropped": 3, "queued": 5, "backoff": 0}, sender.get_stats())
+        unsent = sender.stop()
+        self.assertEqual(list(range(3, 8)), [point[DataPoint.TIMESTAMP] for point in unsent])
+        self.assertEqual([], sent)
+
+    def test_async_sender_stop_in_flight(self):
+        started = threading.Event()
+
+        def send_kpi(datapoints):
+            started.set()
+            time.sleep(0.3)  # longer than max backoff
+            raise IOError("sending failed")
+
+        sender = AsyncSender(send_kpi, lambda data: None, 10, 0.1, ROOT_LOGGER)
+        sender.start()
+        points = [random_datapoint(x) for x in range(3)]
+        sender.put_kpi(points)
+        self.assertTrue(started.wait(5))
+        points[0][DataPoint.CURRENT][''][KPISet.ERRORS].append({})  # sender keeps own copies
+
+        unsent = sender.stop()
+        self.assertFalse(sender.thread.is_alive())
+        self.assertEqual([0, 1, 2], [point[DataPoint.TIMESTAMP] for point in unsent])
+        self.assertIsNot(points[0][DataPoint.CURRENT][''], unsent[0][DataPoint.CURRENT][''])
+        self.assertNotIn({}, unsent[0][DataPoint.CURRENT][''][KPISet.ERRORS])
+
     def test_anonymous_feeding(self):
         obj = BlazeMeterUploader()
         obj.engine = EngineEmul()
@@ -408,6 +494,44 @@ class TestBlazeMeterUploader(BZTestCase):
         self.assertEquals('https://a.blazemeter.com/api/v4/tests', mock.requests[6]['url'])
         self.assertEquals('POST', mock.requests[6]['method'])
 
+    def test_compressed_kpi_data(self):
+        session = Session(data={'id': 1, 'testId': 1, 'userId': 1})
+        mock = BZMock(session)
+        mock.mock_post['https://data.blazemeter.com/submit.php?session_id=1&signature=None&test_id=1&user_id=1'
+                       '&pq=0&target=labels_bulk&update=1'] = {}
+        session.send_kpi_data(u'{"labels": []}', compress=True)
+        self.assertEqual(b'{"labels": []}', zlib.decompress(mock.requests[0]['data'], 16 + zlib.MAX_WBITS))
+
+
+class TestDatapointSerializer(BZTestCase):
+    def test_incremental_kpi_body(self):
+        def get_point(ts, labels):
+            point = random_datapoint(ts)
+            for label in labels:
+                point[DataPoint.CURRENT][label] = point[DataPoint.CURRENT]['']
+            for label in "abc":
+                point[DataPoint.CUMULATIVE][label] = point[DataPoint.CUMULATIVE]['']
+            return point
+
+        def get_labels(body):
+            self.assertNotIn("\n", body)  # compact JSON
+            return [item['name'] for item in json.loads(body)['labels']]
+
+        obj = BlazeMeterUploader()
+        serializer = obj._dpoint_serializer
+        serializer.incremental = serializer.compact = True
+        self.assertEqual(['ALL', 'a', 'b'], get_labels(serializer.get_kpi_body([get_point(1, "ab"), get_point(2, "a")],
+                                                                               False)))
+        self.assertEqual(['ALL', 'c'], get_labels(serializer.get_kpi_body([get_point(3, "c")], False)))
+        self.assertEqual(['ALL', 'a', 'b', 'c'], get_labels(serializer.get_kpi_body([get_point(4, "")], True)))
+        self.assertEqual(3, serializer.stats["payloads"])
+        self.assertEqual(9, serializer.stats["labels"])
+
+    def test_default_kpi_body(self):
+        obj = BlazeMeterUploader()
+        body = obj._dpoint_serializer.get_kpi_body([random_datapoint(1)], False)
+        self.assertEqual(to_json(json.loads(body)), body)  # indented as before
+
 
 class TestBlazeMeterClientUnicode(BZTestCase):
     def test_unicode_request(self):
@@ -427,6 +551,16 @@ class TestBlazeMeterClientUnicode(BZTestCase):
             zip_content = fds.read()
         session.upload_file("jtls_and_more.zip", zip_content)
 
+    def test_upload_file_streamed(self):
+        session = Session(data={'id': 1})
+        mock = BZMock(session)
+        mock.mock_post['https://data.blazemeter.com/api/v4/image/1/files?signature=None'] = {"result": 1}
+        session.upload_file("artifacts.zip", path=RESOURCES_DIR + "jmeter/jmeter-dist-2.13.zip")
+        body = mock.requests[0]['data'].read()
+        self.assertIn(b'filename="artifacts.zip"', body)
+        with open(RESOURCES_DIR + "jmeter/jmeter-dist-2.13.zip", 'rb') as fds:
+            self.assertIn(fds.read(), body)
+
 
 class DummyHttpResponse(object):
     def __init__(self):
@@ -491,3 +625,35 @@ class TestMonitoringBuffer(BZTestCase):
             mon_buffer.record_data(mon)
         unpacked = sum(item['interval'] for item in viewvalues(mon_buffer.data['local']))
         self.assertEqual(unpacked, ITERATIONS)
+
+    def test_merge_order(self):
+        mon_buffer = MonitoringBuffer(10, ROOT_LOGGER)
+        for i in range(1000):
+            mon_buffer.record_data([{"ts": i, "source": "local", "cpu": i}])
+            if i % 7 == 0:  # data from another client with same timestamp
+                mon_buffer.record_data([{"ts": i, "source": "local", "mem": 1}])
+
+        buff = mon_buffer.data['local']
+        timestamps = list(buff)
+        self.assertEqual(sorted(timestamps), timestamps)
+        sizes = [item['interval'] for item in viewvalues(buff)]
+        self.assertEqual(sorted(sizes, reverse=True), sizes)
+        self.assertLess(max(sizes), 2 * 1000 / 10)  # resolution is uniform
+        self.assertEqual(1000, sum(sizes))
+        self.assertAlmostEqual(999 * 1000 / 2, sum(item['cpu'] * item['interval'] for item in viewvalues(buff)))
+
+    def test_soak_benchmark(self):
+        hosts = 50
+        duration = 24 * 3600
+        step = 30
+        mon_buffer = MonitoringBuffer(500, ROOT_LOGGER)
+        start = time.time()
+        for timestamp in range(0, duration, step):
+            mon_buffer.record_data([{"ts": timestamp, "source": "host%s" % host, "cpu": 1, "mem": 2, "conn-all": 3}
+                                    for host in range(hosts)])
+        ROOT_LOGGER.info("Recorded %s hours of %s hosts in %.2fs", duration / 3600, hosts, time.time() - start)
+
+        self.assertEqual(hosts, len(mon_buffer.data))
+        for buff in viewvalues(mon_buffer.data):
+            self.assertEqual(500, len(buff))
+            self.assertEqual(duration / step, sum(item['interval'] for item in viewvalues(buff)))
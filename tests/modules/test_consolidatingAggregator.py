@@ -1,6 +1,11 @@
+import json
+import os
+import tempfile
+import time
 from random import random, choice
 
 from apiritif import random_string
+from bzt import TaurusInternalException
 from bzt.modules.aggregator import ConsolidatingAggregator, DataPoint, KPISet, AggregatorListener
 from bzt.utils import to_json
 from tests import BZTestCase
@@ -138,6 +143,81 @@ class TestConsolidatingAggregator(BZTestCase):
 
         self.assertEquals(2, cnt)
 
+    def test_parallel_reading(self):
+        readers = [get_success_reader(), get_success_reader(offset=1), get_fail_reader()]
+        results = []
+        for parallel in (False, True):
+            obj = ConsolidatingAggregator()
+            obj.settings["parallel-reading"] = parallel
+            obj.prepare()
+            listener = MockListener()
+            obj.add_listener(listener)
+            for reader in readers:
+                underling = MockReader()
+                underling.data = list(reader.data)
+                obj.add_underling(underling)
+
+            obj.check()
+            self.assertEqual(len(readers) if parallel else 0, len(obj._workers))
+            obj.shutdown()
+            obj.post_process()
+            points = [(x[DataPoint.TIMESTAMP], x[DataPoint.CURRENT]) for x in listener.results]
+            results.append(to_json((points, obj.cumulative)))
+            self.assertTrue(all(underling.results for underling in obj.underlings))
+
+        self.assertEqual(results[0], results[1])
+
+    def test_parallel_reading_state(self):
+        results = []
+        for parallel in (False, True):
+            obj = ConsolidatingAggregator()
+            obj.settings["parallel-reading"] = parallel
+            obj.settings["generalize-labels"] = 8
+            obj.settings["max-error-variety"] = 4
+            obj.prepare()
+            listener = MockListener()
+            obj.add_listener(listener)
+            files = []
+            for _ in range(2):
+                handle, filename = tempfile.mkstemp()
+                os.close(handle)
+                files.append(filename)
+                obj.add_underling(FileMockReader(filename))
+
+            emitted = []
+            for chunk in range(4):
+                for idx, filename in enumerate(files):
+                    with open(filename, 'a') as fds:
+                        for second in range(chunk * 10, chunk * 10 + 10):
+                            error = "Error #%s" % (second % 7) if second % 3 else None
+                            sample = (second + 1, "/page/%s" % (second % 12 + idx), 1, 5.0, 0.1, 0.1, 200, error, '', 0)
+                            fds.write(json.dumps(sample) + "\n")
+                obj.check()
+                emitted.append(len(listener.results))  # buffer length grows with response time
+
+            obj.shutdown()
+            obj.post_process()
+            for filename in files:
+                os.remove(filename)
+
+            points = [(x[DataPoint.TIMESTAMP], x[DataPoint.CURRENT]) for x in listener.results]
+            results.append((emitted, to_json(points), to_json(obj.cumulative)))
+
+        self.assertEqual([6, 8, 18, 28], results[0][0])
+        self.assertEqual(results[0], results[1])
+
+    def test_parallel_reading_stuck(self):
+        obj = ConsolidatingAggregator()
+        obj.settings["parallel-reading"] = True
+        obj.settings["worker-timeout"] = 0.5
+        obj.prepare()
+        obj.add_underling(StuckMockReader())
+        workers = list(obj._workers.values())
+        self.assertRaises(TaurusInternalException, obj.check)
+        obj.shutdown()
+        self.assertRaises(TaurusInternalException, obj.post_process)
+        self.assertFalse(any(worker.process.is_alive() for worker in workers))
+
     def test_errors_cumulative(self):
         self.obj.track_percentiles = [50]
         self.obj.prepare()
@@ -245,6 +325,19 @@ class TestConsolidatingAggregator(BZTestCase):
         cum_dict = self.obj.cumulative
         self.assertEqual(len(cum_dict['']['errors']), 3)
 
+    def test_folding_memo(self):
+        self.obj.prepare()
+        self.obj.max_error_count = 50
+        errors = [random_string(10) for _ in range(20)]
+        folded = [self.obj._fold_error(error) for error in errors]
+        self.assertEqual(20, self.obj.known_errors.misses)
+        self.assertEqual(folded, [self.obj._fold_error(error) for error in errors])
+        self.assertEqual(20, self.obj.known_errors.hits)
+
+        self.obj.known_errors.memo_size = 5
+        self.obj._fold_error("another error")
+        self.assertEqual(5, len(self.obj.known_errors.memo))
+
     def test_set_rtimes_len(self):
         self.obj.settings['histogram-initial'] = 10.0
         self.obj.prepare()
@@ -303,3 +396,29 @@ class MockListener(AggregatorListener):
 
     def aggregated_second(self, data):
         self.results.append(data)
+
+
+class FileMockReader(MockReader):
+    """
+    Reads samples appended to file, so data is visible to reader's worker process too
+    """
+
+    def __init__(self, filename):
+        super(FileMockReader, self).__init__()
+        self.filename = filename
+        self.offset = 0
+
+    def _read(self, final_pass=False):
+        with open(self.filename) as fds:
+            fds.seek(self.offset)
+            lines = fds.readlines()
+            self.offset = fds.tell()
+
+        for line in lines:
+            yield tuple(json.loads(line))
+
+
+class StuckMockReader(MockReader):
+    def _read(self, final_pass=False):
+        time.sleep(10)
+        return iter(())
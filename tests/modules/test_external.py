@@ -1,4 +1,8 @@
-from bzt.modules.aggregator import DataPoint, KPISet, ConsolidatingAggregator
+import os
+import time
+import unittest
+
+from bzt.modules.aggregator import DataPoint, KPISet, ConsolidatingAggregator, ChunkedResultsReader
 from bzt.modules.external import ExternalResultsLoader
 from bzt.modules.jmeter import FuncJTLReader, JTLReader
 from bzt.modules.ab import TSVDataReader
@@ -6,7 +10,8 @@ from bzt.modules.pbench import PBenchKPIReader
 from bzt.modules.gatling import DataLogReader as GatlingLogReader
 from bzt.modules.grinder import DataLogReader as GrinderLogReader
 
-from tests import RESOURCES_DIR, close_reader_file, ExecutorTestCase
+from bzt.utils import to_json
+from tests import RESOURCES_DIR, ROOT_LOGGER, close_reader_file, ExecutorTestCase
 from tests.mocks import MockReader
 
 
@@ -14,6 +19,8 @@ class TestExternalResultsLoader(ExecutorTestCase):
     EXECUTOR = ExternalResultsLoader
 
     def tearDown(self):
+        if isinstance(self.obj.reader, ChunkedResultsReader):
+            self.obj.reader.stop()
         if self.obj.reader:
             if isinstance(self.obj.reader, FuncJTLReader):
                 close_reader_file(self.obj.reader)
@@ -151,3 +158,109 @@ class TestExternalResultsLoader(ExecutorTestCase):
         last_dp = results[-1]
         cumulative_kpis = last_dp[DataPoint.CUMULATIVE]['']
         self.assertEqual(50, cumulative_kpis[KPISet.SUCCESSES])
+
+    def _read_results(self, execution, is_read=lambda: True, **aggregator_attrs):
+        self.setUp()
+        self.configure({"execution": [execution]})
+        for name, value in aggregator_attrs.items():
+            setattr(self.obj.engine.aggregator, name, value)
+        self.obj.prepare()
+        self.obj.startup()
+        checks = 1
+        while not self.obj.check() and not is_read():
+            self.obj.engine.aggregator.check()
+            checks += 1
+            time.sleep(0.01)
+        self.obj.shutdown()
+        self.obj.post_process()
+        self.obj.engine.aggregator.post_process()
+        self.points = self.results_listener.results
+        points = [(point[DataPoint.TIMESTAMP], point[DataPoint.CURRENT]['']) for point in self.points]
+        return points, checks
+
+    def test_bulk(self):
+        files = ["/jmeter/jtl/simple.kpi.jtl", "/ab/ab.tsv"]
+        for data_file in files:
+            execution = {"data-file": RESOURCES_DIR + data_file, "results-timeout": 0}
+            expected, _ = self._read_results(execution)
+
+            execution.update({"bulk": True, "bulk-chunk-size": 100, "bulk-processes": 3})
+            actual, _ = self._read_results(execution, is_read=lambda: False)
+            self.assertIsInstance(self.obj.reader, ChunkedResultsReader)
+            self.assertGreater(len(self.obj.reader.chunks), 3)
+            self.assertEqual([(tstamp, kpis[KPISet.SAMPLE_COUNT], kpis[KPISet.RESP_CODES]) for tstamp, kpis in expected],
+                             [(tstamp, kpis[KPISet.SAMPLE_COUNT], kpis[KPISet.RESP_CODES]) for tstamp, kpis in actual])
+            self.assertEqual(to_json(expected[-1][1][KPISet.PERCENTILES]), to_json(actual[-1][1][KPISet.PERCENTILES]))
+            self.tearDown()
+
+    def test_bulk_stateful_format(self):
+        execution = {"data-file": RESOURCES_DIR + "/gatling/gatling-3-000/simulation.log", "results-timeout": 0,
+                     "bulk": True, "bulk-chunk-size": 100}
+        self._read_results(execution)
+        self.assertIsInstance(self.obj.reader, GatlingLogReader)  # users are tracked across lines
+
+    def test_bulk_folding(self):
+        data_file = self.obj.engine.create_artifact("kpi", ".jtl")
+        with open(RESOURCES_DIR + "/jmeter/jtl/simple.kpi.jtl") as src, open(data_file, "w") as fds:
+            lines = src.readlines()
+            fds.write(lines[0])
+            for num in range(300):
+                fields = lines[2].split(",")
+                fields[0] = str(1535636052585 + num * 100)
+                fields[2] = "http://blazedemo.com/item/%s" % (num * 37 % 100)
+                fields[4] = "Not Found item %s" % (num * 37 % 100)
+                fds.write(",".join(fields))
+
+        def labels_and_errors():
+            result = {}
+            for point in self.points:
+                for label, kpis in point[DataPoint.CURRENT].items():
+                    counts = result.setdefault(label, {})
+                    for error in kpis[KPISet.ERRORS]:
+                        counts[error['msg']] = counts.get(error['msg'], 0) + error['cnt']
+            return result
+
+        execution = {"data-file": data_file, "results-timeout": 0}
+        self._read_results(execution, generalize_labels=20, max_error_count=10)
+        expected = labels_and_errors()
+        self.assertLess(len(expected), 100)
+
+        execution.update({"bulk": True, "bulk-chunk-size": 1000, "bulk-processes": 3})
+        self._read_results(execution, is_read=lambda: False, generalize_labels=20, max_error_count=10)
+        self.assertIsInstance(self.obj.reader, ChunkedResultsReader)
+        self.assertEqual(expected, labels_and_errors())
+        self.tearDown()
+
+    def _write_jtl(self, samples):
+        data_file = self.obj.engine.create_artifact("kpi", ".jtl")
+        with open(RESOURCES_DIR + "/jmeter/jtl/simple.kpi.jtl") as src, open(data_file, "w") as fds:
+            lines = src.readlines()
+            fds.write(lines[0])
+            for num in range(samples):
+                fields = lines[1 + num % (len(lines) - 1)].split(",", 1)
+                fds.write("%s,%s" % (1535636052585 + num * 10, fields[1]))
+        return data_file
+
+    def test_bulk_sample_count(self):
+        samples = 3000
+        data_file = self._write_jtl(samples)
+        for execution in ({}, {"bulk": True, "bulk-chunk-size": 16 * 1024}):
+            execution.update({"data-file": data_file, "results-timeout": 0})
+            points, _ = self._read_results(execution, is_read=lambda: self.obj.reader.read_records >= samples)
+            self.assertEqual(samples, sum(kpis[KPISet.SAMPLE_COUNT] for _, kpis in points))
+            self.tearDown()
+
+    @unittest.skipUnless(os.environ.get("TAURUS_BENCHMARK"), "set TAURUS_BENCHMARK=1 to run benchmarks")
+    def test_bulk_benchmark(self):
+        samples = 200000
+        data_file = self._write_jtl(samples)
+
+        # sequential reader is checked until it reads all samples, each check takes check-interval in real run
+        for execution in ({}, {"bulk": True}):
+            execution.update({"data-file": data_file, "results-timeout": 0})
+            start = time.time()
+            points, checks = self._read_results(execution, is_read=lambda: self.obj.reader.read_records >= samples)
+            duration = time.time() - start
+            ROOT_LOGGER.info("%s: %s samples in %.2fs (%d samples/s), %s checks",
+                             type(self.obj.reader).__name__, samples, duration, samples / duration, checks)
+            self.tearDown()
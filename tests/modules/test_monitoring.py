@@ -1,8 +1,13 @@
+import os
 import random
+import socket
 import time
 import unittest
+from collections import deque
 
-from bzt.modules.monitoring import Monitoring, MonitoringListener, MonitoringCriteria
+import psutil
+
+from bzt.modules.monitoring import Monitoring, MonitoringListener, MonitoringCriteria, ClientPoller
 from bzt.modules.monitoring import ServerAgentClient, GraphiteClient, LocalClient, LocalMonitor
 from bzt.six import PY3, b
 from bzt.utils import BetterDict
@@ -91,6 +96,51 @@ class TestMonitoring(BZTestCase):
         obj.shutdown()
         obj.post_process()
 
+    def test_background_polling(self):
+        obj = Monitoring()
+        obj.engine = EngineEmul()
+        obj.parameters.merge({
+            "background": True,
+            "graphite": [{
+                "address": "people.com:1066",
+                "interval": "1s",
+                "metrics": ["body", "brain"]}]
+        })
+        listener = RecordingMonListener()
+        obj.add_listener(listener)
+        obj.client_classes = {'graphite': SlowGraphiteClientEmul}
+        obj.prepare()
+        obj.startup()
+
+        start = time.time()
+        obj.check()
+        self.assertLess(time.time() - start, SlowGraphiteClientEmul.delay)
+
+        time.sleep(SlowGraphiteClientEmul.delay * 2)
+        obj.check()
+        obj.shutdown()
+        obj.post_process()
+
+        self.assertEqual([{'source': 'people.com:1066', 'usability': 2}],
+                         [{key: val for key, val in item.items() if key != 'ts'} for item in listener.data])
+        stats = obj.get_client_stats()
+        self.assertEqual(1, len(stats))
+        self.assertEqual(1, stats[0]['polls'])
+        self.assertEqual(0, stats[0]['errors'])
+        self.assertGreaterEqual(stats[0]['latency'], SlowGraphiteClientEmul.delay)
+        self.assertGreaterEqual(stats[0]['staleness'], 0)
+
+    def test_poller_stop_timeout(self):
+        poller = ClientPoller(HangingClientEmul(), deque(), 1, ROOT_LOGGER)
+        poller.STOP_TIMEOUT = 0.1
+        poller.start()
+        time.sleep(0.05)
+
+        start = time.time()
+        poller.stop()
+        self.assertLess(time.time() - start, HangingClientEmul.delay)
+        self.assertTrue(poller.thread.is_alive())
+
     def test_local_with_engine(self):
         config = {'interval': '5m', 'metrics': ['cpu', 'engine-loop']}
         obj = LocalClient(ROOT_LOGGER, 'label', config, EngineEmul())
@@ -189,6 +239,38 @@ class TestMonitoring(BZTestCase):
 
         self.assertEquals(b("test\n"), obj.clients[0].socket.sent_data)
 
+    def test_connections_breakdown(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(5)
+        port = server.getsockname()[1]
+        client = socket.create_connection(('127.0.0.1', port))
+        accepted, _ = server.accept()
+        try:
+            conf = {'metrics': ['conn-all'], 'conn-by-remote-port': True}
+            obj = LocalClient(ROOT_LOGGER, 'label', conf, EngineEmul())
+            obj.connect()
+            data = obj.get_data()
+            values = {key: val for item in data for key, val in item.items() if key not in ('ts', 'source')}
+            self.assertGreaterEqual(values['conn-all'], 2)
+            self.assertEqual(1, values['conn/port-%s' % port])
+
+            obj.monitor.conn_by_process = True
+            stats = obj.monitor.resource_stats()
+            self.assertEqual(1, stats['conn/port-%s' % port])
+            own = "conn/%s" % psutil.Process().name()
+            self.assertGreaterEqual(stats[own], 2)
+            self.assertFalse([key for key in stats if key.endswith('-%s' % os.getpid())])  # no per-pid series
+            self.assertIn(os.getpid(), obj.monitor._process_names)
+
+            obj.monitor._process_names[os.getpid()] = (0, "reused-pid")  # other process had this pid
+            stats = obj.monitor.resource_stats()
+            self.assertNotIn("conn/reused-pid", stats)
+            self.assertIn(own, stats)
+        finally:
+            for sock in (client, accepted, server):
+                sock.close()
+
     def test_psutil_potential_bugs(self):
         conf = {'metrics': ['cpu', 'mem', 'disks', 'conn-all']}
         client = LocalClient(ROOT_LOGGER, 'label', conf, EngineEmul())
@@ -213,6 +295,14 @@ class LoggingMonListener(MonitoringListener):
         ROOT_LOGGER.debug("Data: %s", data)
 
 
+class RecordingMonListener(MonitoringListener):
+    def __init__(self):
+        self.data = []
+
+    def monitoring_data(self, data):
+        self.data.extend(data)
+
+
 class ServerAgentClientEmul(ServerAgentClient):
     def __init__(self, parent_logger, label, config, engine):
         super(ServerAgentClientEmul, self).__init__(parent_logger, label, config, engine)
@@ -229,3 +319,19 @@ class GraphiteClientEmul(GraphiteClient):
 
     def _data_transfer(self):
         return self.prepared_data
+
+
+class SlowGraphiteClientEmul(GraphiteClientEmul):
+    delay = 0.5
+
+    def _data_transfer(self):
+        time.sleep(self.delay)
+        return super(SlowGraphiteClientEmul, self)._data_transfer()
+
+
+class HangingClientEmul(object):
+    delay = 1
+
+    def get_data(self):
+        time.sleep(self.delay)
+        return []
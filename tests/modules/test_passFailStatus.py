@@ -2,7 +2,7 @@ import json
 import time
 
 from bzt import AutomatedShutdown
-from bzt.modules.aggregator import DataPoint, KPISet
+from bzt.modules.aggregator import DataPoint, KPISet, RespTimesCounter
 from bzt.modules.passfail import PassFailStatus, DataCriterion, CriteriaProcessor
 from tests import BZTestCase, random_datapoint, RESOURCES_DIR, ROOT_LOGGER
 from tests.mocks import EngineEmul, ModuleMock
@@ -287,6 +287,108 @@ class TestPassFailStatus(BZTestCase):
         self.obj.shutdown()
         self.obj.post_process()
 
+    def test_window_sums(self):
+        self.configure({"criteria": [
+            "rc4?? of first>8 within 5s",
+            "rc4?? of second>20 within 5s",
+            "avg-rt of first>1s within 3s",
+            "rc5*>50% within 4s",
+        ]})
+        self.obj.prepare()
+        self.assertEqual(2, len(self.obj.processors[0]._build_plan()[0][1]))
+
+        rc_counts, times, fail_shares = [], [], []
+        for n in range(0, 20):
+            point = random_datapoint(n)
+            for label in ('first', 'second'):
+                point[DataPoint.CURRENT][label] = point[DataPoint.CURRENT]['']
+            kpiset = point[DataPoint.CURRENT]['']
+            kpiset[KPISet.RESP_CODES] = {'200': n, '404': n % 3, '413': 1, '503': n % 2, '5xx': 1}
+            kpiset[KPISet.SAMPLE_COUNT] = 10
+            kpiset[KPISet.AVG_RESP_TIME] = n / 10.0
+            rc_counts.append(n % 3 + 1)
+            times.append(n / 10.0)
+            fail_shares.append(100.0 * (n % 2 + 1) / 10)
+
+            self.obj.aggregated_second(point)
+            crits = self.obj.criteria
+            self.assertEqual(sum(rc_counts[-5:]), crits[0].agg_sum)
+            self.assertEqual(sum(rc_counts[-5:]), crits[1].agg_sum)
+            self.assertAlmostEqual(sum(times[-3:]), crits[2].agg_sum)
+            self.assertEqual(min(n + 1, 3), len(crits[2].agg_buffer))
+            self.assertAlmostEqual(sum(fail_shares[-4:]), crits[3].agg_sum)
+
+        self.assertTrue(self.obj.criteria[0].is_triggered)
+        self.assertFalse(self.obj.criteria[1].is_triggered)
+        self.assertTrue(self.obj.criteria[2].is_triggered)
+        self.assertFalse(self.obj.criteria[3].is_triggered)
+
+    def test_window_percentile(self):
+        self.configure({"criteria": ["p90>1s within 3s", "p90>1s for 3s"]})
+        self.obj.prepare()
+        windowed = self.obj.criteria[0]
+
+        seconds = []
+        for n in range(0, 10):
+            r_times = [0.1] * 100
+            if n == 5:
+                r_times[:40] = [2.0] * 40
+            seconds.append(r_times)
+
+            point = DataPoint(n)
+            kpiset = KPISet()
+            kpiset[KPISet.RESP_TIMES].add_values(r_times)
+            point[DataPoint.CURRENT][''] = kpiset
+            self.obj.aggregated_second(point)
+
+            expected = RespTimesCounter(1, 1000, 3)
+            expected.add_values(sum(seconds[-3:], []))
+            self.assertEqual(len(expected), len(windowed.agg_hist))
+            self.assertEqual(expected.get_percentile(90.0) / 1000.0, windowed.agg_logic(n, kpiset))
+            self.assertEqual(n in (5, 6, 7), windowed.is_triggered and windowed._end == n)
+
+        self.assertTrue(windowed.is_triggered)
+        self.assertFalse(self.obj.criteria[1].is_triggered)
+
+    def test_window_percentile_no_histogram(self):
+        self.configure({"criteria": ["p90>1s within 3s", "p95>2s over 3s"]})
+        self.obj.prepare()
+        windowed = self.obj.criteria[0]
+
+        values = []
+        for n in range(0, 10):
+            value = 3.5 if n == 5 else 0.1
+            values.append(value)
+
+            point = DataPoint(n)
+            kpiset = KPISet()  # as filled from cloud results: percentiles without histogram
+            kpiset[KPISet.SAMPLE_COUNT] = 100
+            kpiset[KPISet.PERCENTILES]["90.0"] = value
+            kpiset[KPISet.PERCENTILES]["95.0"] = value
+            point[DataPoint.CURRENT][''] = kpiset
+            self.obj.aggregated_second(point)
+
+            self.assertFalse(windowed.hist_percentile)
+            self.assertIsNone(windowed.agg_hist)
+            self.assertAlmostEqual(sum(values[-3:]), windowed.agg_sum)
+            self.assertEqual(n in (5, 6, 7), windowed.is_triggered and windowed._end == n)
+
+        self.assertTrue(windowed.is_triggered)
+        self.assertFalse(self.obj.criteria[1].is_triggered)
+
+    def test_custom_aggregated_second(self):
+        self.configure({"criteria": [
+            {"class": SkippingCriterion.__module__ + "." + SkippingCriterion.__name__, "subject": "avg-rt",
+             "condition": ">", "threshold": "10ms", "timeframe": "1s"},
+            "avg-rt>10ms for 1s"]})
+        self.obj.prepare()
+        for n in range(0, 10):
+            self.obj.aggregated_second(random_datapoint(n))
+
+        self.assertEqual(10, self.obj.criteria[0].seen)
+        self.assertFalse(self.obj.criteria[0].is_triggered)
+        self.assertTrue(self.obj.criteria[1].is_triggered)
+
     def test_executor_level(self):
         executor = ModuleMock()
         executor.engine = self.obj.engine
@@ -306,3 +408,12 @@ class TestPassFailStatus(BZTestCase):
             self.fail()
         except AutomatedShutdown:
             pass
+
+
+class SkippingCriterion(DataCriterion):
+    def __init__(self, config, owner):
+        super(SkippingCriterion, self).__init__(config, owner)
+        self.seen = 0
+
+    def aggregated_second(self, data):
+        self.seen += 1
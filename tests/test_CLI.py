@@ -20,6 +20,7 @@ class TestCLI(BZTestCase):
         self.verbose = False
         self.quiet = False
         self.no_system_configs = True
+        self.recheck_tools = False
         self.option = []
         self.datadir = os.path.join(os.path.dirname(__file__), "..", "build", "acli")
         self.obj = CLI(self)
@@ -1,7 +1,7 @@
 import logging
 import os
 
-from bzt.utils import MultiPartForm
+from bzt.utils import MultiPartForm, temp_file
 from tests import BZTestCase, RESOURCES_DIR
 
 
@@ -23,4 +23,39 @@ class TestMultiPartForm(BZTestCase):
             body.add_file_as_string(encoded, fname, file_data)
 
         txt = body.form_as_bytes()
-        logging.debug("%s", len(txt))
\ No newline at end of file
+        logging.debug("%s", len(txt))
+
+    def test_form_as_stream(self):
+        body = MultiPartForm()
+        body.add_field("name", "value")
+        body.add_file_by_path("file", RESOURCES_DIR + "jmeter/jmeter-dist-2.13.zip")
+        body.add_file_as_string("other", "other.txt", u"other contents")
+        body.add_file_by_path("unicode", RESOURCES_DIR + "jmeter/unicode_file", filename="renamed")
+        expected = body.form_as_bytes()
+        self.assertIn(b'filename="renamed"', expected)
+
+        stream = body.form_as_stream()
+        self.assertEqual(len(expected), len(stream))
+        chunks = []
+        for size in (1, 10, 1000, 100 * 1000):
+            chunks.append(stream.read(size))
+        chunks.append(stream.read())
+        self.assertEqual(expected, b"".join(chunks))
+        self.assertEqual(b"", stream.read())
+
+        self.assertEqual(expected, b"".join(body.form_as_stream()))
+
+    def test_form_as_stream_growing_file(self):
+        fname = temp_file()
+        with open(fname, "wb") as fds:
+            fds.write(b"line\n")
+
+        body = MultiPartForm()
+        body.add_file_by_path("file", fname)
+        with open(fname, "ab") as fds:
+            fds.write(b"written after\n")
+
+        stream = body.form_as_stream()
+        data = stream.read()
+        self.assertEqual(len(stream), len(data))
+        self.assertNotIn(b"written after", data)
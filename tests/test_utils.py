@@ -3,6 +3,8 @@
 import os
 import sys
 import logging
+import tempfile
+import time
 
 from psutil import Popen
 from os.path import join
@@ -10,7 +12,7 @@ from os.path import join
 from bzt import TaurusNetworkError
 from bzt.six import PY2, communicate
 from bzt.utils import log_std_streams, get_uniq_name, JavaVM, ToolError, is_windows, HTTPClient, BetterDict
-from bzt.utils import ensure_is_dict, Environment, temp_file
+from bzt.utils import ensure_is_dict, Environment, temp_file, FileWatcher, RequiredTool, ToolChecksCache, FilesCache
 from tests import BZTestCase, RESOURCES_DIR
 from tests.mocks import MockFileReader
 
@@ -215,6 +217,86 @@ class TestJavaVM(BZTestCase):
         self.assertEqual("8", self.obj._get_version(out2))
 
 
+class CountingTool(RequiredTool):
+    def __init__(self, **kwargs):
+        super(CountingTool, self).__init__(installable=False, **kwargs)
+        self.checks = 0
+
+    def check_if_installed(self):
+        self.checks += 1
+        self.version = "1.0"
+        return os.path.exists(self.tool_path)
+
+
+class TestToolChecksCache(BZTestCase):
+    def setUp(self):
+        super(TestToolChecksCache, self).setUp()
+        self.tool_file = temp_file()
+        with open(self.tool_file, "w") as fds:
+            fds.write("tool")
+        self.obj = RequiredTool.checks_cache = ToolChecksCache(temp_file(), self.log)
+
+    def tearDown(self):
+        RequiredTool.checks_cache = None
+        RequiredTool.recheck = False
+        super(TestToolChecksCache, self).tearDown()
+
+    def check_tool(self, path):
+        tool = CountingTool(tool_path=path)
+        self.assertTrue(tool.is_installed())
+        return tool
+
+    def test_reuse(self):
+        self.assertEqual(1, self.check_tool(self.tool_file).checks)
+
+        self.obj = RequiredTool.checks_cache = ToolChecksCache(self.obj.filename, self.log)  # next run
+        tool = self.check_tool(self.tool_file)
+        self.assertEqual(0, tool.checks)
+        self.assertEqual("1.0", tool.version)
+
+        with open(self.tool_file, "a") as fds:
+            fds.write(" update")
+        self.assertEqual(1, self.check_tool(self.tool_file).checks)
+        self.assertEqual(0, self.check_tool(self.tool_file).checks)
+
+        RequiredTool.recheck = True
+        self.assertEqual(1, self.check_tool(self.tool_file).checks)
+
+    def test_direct_check(self):
+        self.check_tool(self.tool_file)
+        tool = CountingTool(tool_path=self.tool_file)
+        self.assertTrue(tool.check_if_installed())  # explicit check isn't replaced by recorded one
+        self.assertEqual(1, tool.checks)
+
+    def test_not_found(self):
+        tool = CountingTool(tool_path=self.tool_file + "-not-found")
+        self.assertFalse(tool.is_installed())
+        self.assertFalse(tool.is_installed())
+        self.assertEqual(2, tool.checks)
+        self.assertEqual({}, self.obj.entries or {})
+
+
+class TestFilesCache(BZTestCase):
+    def test_eviction(self):
+        obj = FilesCache(tempfile.mkdtemp(), max_size=10, max_age=60, parent_logger=self.log)
+        self.assertEqual(obj.get_key({"a": 1, "b": [2]}), obj.get_key({"b": [2], "a": 1}))
+        self.assertIsNone(obj.get("absent"))
+
+        obj.put("first", {"file": b"12345"})
+        obj.put("second", {"file": b"12345"})
+        for name in ("first", "second"):
+            os.utime(join(obj.dirname, name), (0, time.time() - 10))
+        self.assertEqual(b"12345", open(join(obj.get("first"), "file"), "rb").read())
+
+        obj.put("third", {"file": b"12345"})  # least recently used is evicted
+        self.assertIsNone(obj.get("second"))
+        self.assertIsNotNone(obj.get("first"))
+
+        obj.max_age = 0
+        obj.evict()
+        self.assertEqual([], os.listdir(obj.dirname))
+
+
 class TestLogStreams(BZTestCase):
     def test_streams(self):
         self.sniff_log()
@@ -267,8 +349,58 @@ class TestFileReader(BZTestCase):
     def tearDown(self):
         if self.obj and self.obj.fds:
             self.obj.fds.close()
+        if MockFileReader.watcher:
+            MockFileReader.watcher.close()
+            MockFileReader.watcher = None
         super(TestFileReader, self).tearDown()
 
+    def _check_following(self):
+        directory = tempfile.mkdtemp()
+        filename = join(directory, "results.csv")
+        self.configure(filename)
+
+        self.assertIsNone(self.obj.get_bytes())
+        with open(filename, 'w') as fds:
+            fds.write("first\n")
+        self.assertEqual("first\n", self.obj.get_bytes(size=3) + self.obj.get_bytes())
+        self.assertEqual("", self.obj.get_bytes() or "")
+
+        with open(filename, 'a') as fds:
+            fds.write("second\n")
+        self.assertEqual("second\n", self.obj.get_bytes())
+        return filename
+
+    def _check_rotation(self, filename):
+        with open(filename, 'w') as fds:  # truncated
+            fds.write("third\n")
+        self.assertEqual("", self.obj.get_bytes() or "")
+        self.assertEqual("third\n", self.obj.get_bytes())
+
+        with open(filename, 'a') as fds:
+            fds.write("fourth\n")
+        os.rename(filename, filename + ".1")
+        with open(filename, 'w') as fds:
+            fds.write("fifth\n")
+        read = [self.obj.get_bytes() or "" for _ in range(4)]
+        self.assertEqual("fourth\nfifth\n", "".join(read))
+
+    def test_following_polling(self):
+        filename = self._check_following()
+        with open(filename, 'w') as fds:  # polling reader doesn't stat file on each read, as before
+            fds.write("truncated\n")
+        self.assertIsNone(self.obj.get_bytes() or None)
+
+    def test_following_events(self):
+        MockFileReader.watcher = FileWatcher()
+        if MockFileReader.watcher.fd is None:
+            self.skipTest("No inotify available")
+        MockFileReader.watcher.READ_INTERVAL = 0
+
+        self._check_rotation(self._check_following())
+        self.assertEqual({self.obj.name}, MockFileReader.watcher.files)
+        self.obj.get_bytes()  # consume events of writes that were already read
+        self.assertIsNone(self.obj.get_bytes())  # file isn't touched until it changes
+
     def test_file_len(self):
         self.configure(join(RESOURCES_DIR, 'jmeter', 'jtl', 'file.notfound'))
         self.sniff_log(self.obj.log)